@@ -1,23 +1,34 @@
-from collections import defaultdict
+from collections import OrderedDict, defaultdict
 from pathlib import Path
 import io
 import os
 import re
-import tempfile
-import uuid
+import threading
 
-import openpyxl
 import urllib.parse
-import xlwt
-from fastapi import APIRouter, File, Form, HTTPException, UploadFile
+from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile
 from fastapi.responses import Response
 
-router = APIRouter()
+import readers
+import text_norm
+from profiler import ProfiledRoute
+from uploads import ingest_upload
+
+router = APIRouter(route_class=ProfiledRoute)
 
 AMOOD_HAPBAE_ALLOWED_EXCEL = {".xlsx", ".xlsm"}
 AMOOD_HAPBAE_COST_BASE_PATH = Path(
     os.environ.get("AMOOD_HAPBAE_COST_BASE_PATH", r"C:\Users\ksh29\OneDrive\Desktop\원베\원가베이스유.xlsx")
 )
+# 분석 결과 캐시 (업로드 sha256, skip_header) → _AhAnalysis
+AMOOD_HAPBAE_CACHE_SIZE = max(1, int(os.environ.get("AMOOD_HAPBAE_CACHE_SIZE", "8")))
+_AH_CACHE: OrderedDict = OrderedDict()
+_AH_CACHE_LOCK = threading.Lock()
+
+
+def upload_target() -> dict:
+    """업로드를 받을 위치/최대 크기 (ingest_upload 인자). main.py가 사용자별 scratch로 바꿔 끼운다."""
+    return {}
 
 
 def _content_disposition(filename: str) -> str:
@@ -46,91 +57,62 @@ def _ah_remove_leading_bracket_tag(text: str) -> str:
     s = _ah_normalize(text)
     if not s:
         return ""
-
-    lead_patterns = [
-        r"^\[[^\]]*\]\s*",
-        r"^\([^\)]*\)\s*",
-        r"^\{[^}]*\}\s*",
-    ]
-    tail_patterns = [
-        r"\s*\[[^\]]*\]$",
-        r"\s*\([^\)]*\)$",
-        r"\s*\{[^}]*\}$",
-    ]
-
-    changed = True
-    while changed:
-        changed = False
-        for pat in lead_patterns:
-            new_s = re.sub(pat, "", s)
-            if new_s != s:
-                s = new_s.strip()
-                changed = True
-
-        for pat in tail_patterns:
-            new_s = re.sub(pat, "", s)
-            if new_s != s:
-                s = new_s.strip()
-                changed = True
-
-    return s.strip()
+    return text_norm.strip_edge_tags(s)
 
 
 def _ah_merge_j_by_slash(text: str) -> str:
     s = _ah_normalize(text)
     if not s:
         return ""
-    parts = [p.strip() for p in s.split("/") if p.strip() != ""]
-    parts = ["".join(p.split()) for p in parts]
-    return " ".join(parts).strip()
+    return text_norm.merge_slash_parts(s)
 
 
-def _ah_get_second_sheet(path: Path):
-    wb = openpyxl.load_workbook(path, data_only=True)
-    if len(wb.worksheets) < 2:
-        raise ValueError("엑셀에 두 번째 시트가 없습니다.")
-    return wb.worksheets[1]
+class _AhAnalysis:
+    """두 번째 시트를 한 번 훑은 결과. /conflicts와 /export가 같이 쓴다."""
+
+    def __init__(self, sheet: str, conflicts: list[tuple[str, set[str]]], rows: list[tuple[str, object]]):
+        self.sheet = sheet
+        self.conflicts = conflicts
+        self.rows = rows
+
+
+def _ah_value(values, col: int):
+    return values[col - 1] if len(values) >= col else None
 
 
-def _ah_find_conflicts_xlsx(path: Path, skip_header: bool = True):
-    ws = _ah_get_second_sheet(path)
-    start_row = 2 if skip_header else 1
+def _ah_analyze(path: Path, skip_header: bool = True) -> _AhAnalysis:
+    try:
+        sheet, rows_iter = readers.iter_sheet_rows(path, "amood_hapbae", sheet_index=1, data_only=True)
+    except IndexError:
+        raise ValueError("엑셀에 두 번째 시트가 없습니다.")
+
+    # C열 개수, C→D 집합, H/J 후보를 한 번에 모은다. 출력은 C가 2번 이상 나온 행만이라 끝난 뒤에 거른다.
+    c_counts = defaultdict(int)
     c_to_dset: dict[str, set[str]] = defaultdict(set)
-    for r in range(start_row, ws.max_row + 1):
-        c_val = _ah_normalize(ws.cell(row=r, column=3).value)
-        d_val = _ah_normalize(ws.cell(row=r, column=4).value)
+    candidates: list[tuple[str, str, str, object]] = []
+    for i, values in enumerate(rows_iter):
+        if skip_header and i == 0:
+            continue
+        c_val = _ah_normalize(_ah_value(values, 3))
         if c_val == "":
             continue
-        c_to_dset[c_val].add(d_val)
+        c_counts[c_val] += 1
+        c_to_dset[c_val].add(_ah_normalize(_ah_value(values, 4)))
+        h_val = _ah_normalize(_ah_value(values, 8))
+        j_val = _ah_normalize(_ah_value(values, 10))
+        if h_val == "" and j_val == "":
+            continue
+        candidates.append((c_val, h_val, j_val, _ah_value(values, 11)))
 
     conflicts: list[tuple[str, set[str]]] = []
     for c_val, d_set in c_to_dset.items():
         if len(d_set) >= 2:
             conflicts.append((c_val, d_set))
     conflicts.sort(key=lambda x: str(x[0]))
-    return ws.title, conflicts
-
-
-def _ah_build_output_rows_from_hj(path: Path, skip_header: bool = True):
-    ws = _ah_get_second_sheet(path)
-    start_row = 2 if skip_header else 1
-    c_counts = defaultdict(int)
-    for r in range(start_row, ws.max_row + 1):
-        c_val = _ah_normalize(ws.cell(row=r, column=3).value)
-        if c_val != "":
-            c_counts[c_val] += 1
 
     out: list[tuple[str, object]] = []
-    for r in range(start_row, ws.max_row + 1):
-        c_val = _ah_normalize(ws.cell(row=r, column=3).value)
-        if c_val == "" or c_counts.get(c_val, 0) < 2:
-            continue
-
-        h_val = _ah_normalize(ws.cell(row=r, column=8).value)
-        j_val = _ah_normalize(ws.cell(row=r, column=10).value)
-        k_qty = ws.cell(row=r, column=11).value
-
-        if h_val == "" and j_val == "":
+    for c_val, h_val, j_val, k_qty in candidates:
+        if c_counts[c_val] < 2:
             continue
 
         h_clean = _ah_remove_leading_bracket_tag(h_val)
@@ -147,16 +129,30 @@ def _ah_build_output_rows_from_hj(path: Path, skip_header: bool = True):
         if result:
             out.append((result, k_qty))
 
-    return ws.title, out
+    return _AhAnalysis(sheet, conflicts, out)
+
+
+def _ah_analysis_for(upload, skip_header: bool) -> _AhAnalysis:
+    """업로드 해시 기준 캐시. UI가 같은 파일로 /conflicts 다음 /export를 부르므로 두 번째는 파싱하지 않는다."""
+    key = (upload.sha256, bool(skip_header))
+    with _AH_CACHE_LOCK:
+        if key in _AH_CACHE:
+            _AH_CACHE.move_to_end(key)
+            return _AH_CACHE[key]
+    analysis = _ah_analyze(upload.path, skip_header=skip_header)
+    with _AH_CACHE_LOCK:
+        _AH_CACHE[key] = analysis
+        while len(_AH_CACHE) > AMOOD_HAPBAE_CACHE_SIZE:
+            _AH_CACHE.popitem(last=False)
+    return analysis
 
 
 def _ah_load_base_cost_map(path: Path):
-    wb = openpyxl.load_workbook(path, data_only=True)
-    ws = wb.active
+    ws = readers.read_sheet(path, "amood_hapbae", data_only=True)
     cost_map: dict[str, object] = {}
     for r in range(1, ws.max_row + 1):
-        key = _ah_normalize_match_key(ws.cell(row=r, column=1).value)
-        val = ws.cell(row=r, column=2).value
+        key = _ah_normalize_match_key(ws.value(r, 1))
+        val = ws.value(r, 2)
         if key == "":
             continue
         if key not in cost_map:
@@ -175,6 +171,8 @@ def _ah_build_xls_bytes(
     headers: list[str],
     include_cols: list[int],
 ) -> bytes:
+    import xlwt
+
     book = xlwt.Workbook()
     sheet = book.add_sheet("결과")
 
@@ -204,34 +202,27 @@ def _ah_build_xls_bytes(
 async def amood_hapbae_conflicts(
     file: UploadFile = File(...),
     skip_header: bool = Form(True),
+    target: dict = Depends(upload_target),
 ):
     name = file.filename or ""
     ext = Path(name).suffix.lower()
     if ext not in AMOOD_HAPBAE_ALLOWED_EXCEL:
         raise HTTPException(status_code=400, detail="xlsx/xlsm 파일만 업로드 가능합니다.")
 
-    tmp_path = Path(tempfile.gettempdir()) / f"amood_hapbae_conflicts_{uuid.uuid4().hex}{ext}"
-    data = await file.read()
-    tmp_path.write_bytes(data)
-
-    try:
-        sheet, conflicts = _ah_find_conflicts_xlsx(tmp_path, skip_header=skip_header)
-        return {
-            "ok": True,
-            "sheet": sheet,
-            "conflict_count": len(conflicts),
-            "conflicts": [
-                {"c": c_val, "d_values": sorted(list(d_set), key=lambda x: str(x))}
-                for c_val, d_set in conflicts
-            ],
-        }
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
-    finally:
+    async with ingest_upload(file, "amood_hapbae_conflicts", ext, **target) as upload:
         try:
-            tmp_path.unlink(missing_ok=True)
-        except Exception:
-            pass
+            analysis = _ah_analysis_for(upload, skip_header)
+            return {
+                "ok": True,
+                "sheet": analysis.sheet,
+                "conflict_count": len(analysis.conflicts),
+                "conflicts": [
+                    {"c": c_val, "d_values": sorted(list(d_set), key=lambda x: str(x))}
+                    for c_val, d_set in analysis.conflicts
+                ],
+            }
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.post("/amood-hapbae/export")
@@ -244,6 +235,7 @@ async def amood_hapbae_export(
     include_col1: bool = Form(True),
     include_col2: bool = Form(True),
     include_col3: bool = Form(True),
+    target: dict = Depends(upload_target),
 ):
     name = file.filename or "amood_hapbae.xlsx"
     ext = Path(name).suffix.lower()
@@ -256,46 +248,38 @@ async def amood_hapbae_export(
             detail=f"원가베이스 파일을 읽을 수 없습니다: {AMOOD_HAPBAE_COST_BASE_PATH}",
         )
 
-    tmp_path = Path(tempfile.gettempdir()) / f"amood_hapbae_export_{uuid.uuid4().hex}{ext}"
-    data = await file.read()
-    tmp_path.write_bytes(data)
-
-    try:
-        _, rows = _ah_build_output_rows_from_hj(tmp_path, skip_header=skip_header)
-        if not rows:
-            raise HTTPException(status_code=400, detail="가공할 데이터(H/J)가 없습니다.")
-
-        cost_map = _ah_load_base_cost_map(AMOOD_HAPBAE_COST_BASE_PATH)
-
-        headers = [
-            _ah_pick_header(header_col1, "가공결과"),
-            _ah_pick_header(header_col2, "원가베이스유_B"),
-            _ah_pick_header(header_col3, "수량(K)"),
-        ]
-        include_cols: list[int] = []
-        if include_col1:
-            include_cols.append(1)
-        if include_col2:
-            include_cols.append(2)
-        if include_col3:
-            include_cols.append(3)
-        if not include_cols:
-            raise HTTPException(status_code=400, detail="다운로드할 열을 최소 1개 선택하세요.")
-
-        content = _ah_build_xls_bytes(rows, cost_map, headers, include_cols)
-        filename = f"{Path(name).stem}_가공본.xls"
-        headers = {"Content-Disposition": _content_disposition(filename)}
-        return Response(
-            content=content,
-            media_type="application/vnd.ms-excel",
-            headers=headers,
-        )
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
-    finally:
+    async with ingest_upload(file, "amood_hapbae_export", ext, **target) as upload:
         try:
-            tmp_path.unlink(missing_ok=True)
-        except Exception:
-            pass
+            rows = _ah_analysis_for(upload, skip_header).rows
+            if not rows:
+                raise HTTPException(status_code=400, detail="가공할 데이터(H/J)가 없습니다.")
+
+            cost_map = _ah_load_base_cost_map(AMOOD_HAPBAE_COST_BASE_PATH)
+
+            headers = [
+                _ah_pick_header(header_col1, "가공결과"),
+                _ah_pick_header(header_col2, "원가베이스유_B"),
+                _ah_pick_header(header_col3, "수량(K)"),
+            ]
+            include_cols: list[int] = []
+            if include_col1:
+                include_cols.append(1)
+            if include_col2:
+                include_cols.append(2)
+            if include_col3:
+                include_cols.append(3)
+            if not include_cols:
+                raise HTTPException(status_code=400, detail="다운로드할 열을 최소 1개 선택하세요.")
+
+            content = _ah_build_xls_bytes(rows, cost_map, headers, include_cols)
+            filename = f"{Path(name).stem}_가공본.xls"
+            headers = {"Content-Disposition": _content_disposition(filename)}
+            return Response(
+                content=content,
+                media_type="application/vnd.ms-excel",
+                headers=headers,
+            )
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
@@ -1,14 +1,13 @@
 # backend/barcode_core.py
 import re
 import sys
-import tempfile
 from pathlib import Path
 from collections import Counter, defaultdict
 from datetime import datetime
 
-import pandas as pd
-import openpyxl
-from openpyxl import Workbook
+import metrics
+from readers import read_sheet
+from sheets import load_rows_any, sniff_format
 
 QTY_COL = 11
 
@@ -49,129 +48,66 @@ def _bytes_head(path: Path, n=4096) -> bytes:
         return f.read(n)
 
 
-def _excel_com_convert_to_xlsx(path: Path) -> Path:
-    # Excel 설치된 윈도우에서만 동작(로컬 PC면 OK)
-    import win32com.client as win32  # pip install pywin32
-
-    # Use a new Excel instance so we don't close the user's existing Excel
-    excel = win32.DispatchEx("Excel.Application")
-    excel.Visible = False
-    excel.DisplayAlerts = False
-    wb = excel.Workbooks.Open(str(path))
-    tmp = Path(tempfile.gettempdir()) / (path.stem + "_auto_tmp.xlsx")
-    wb.SaveAs(str(tmp), FileFormat=51)  # 51 = xlsx
-    wb.Close(False)
-    excel.Quit()
-    return tmp
-
-
-def _df_to_ws(df: "pd.DataFrame"):
-    wb = Workbook()
-    ws = wb.active
-    for r_idx, row in enumerate(df.fillna("").values.tolist(), start=1):
-        for c_idx, val in enumerate(row, start=1):
-            ws.cell(row=r_idx, column=c_idx, value=val)
-    return wb, ws
-
-
 def load_excel_any(path: Path):
-    suf = path.suffix.lower()
+    """(wb, ws). xlsx는 openpyxl 워크북, 그 외(BIFF .xls, HTML/CSV로 된 가짜 .xls)는 wb 없이 RowSheet."""
     head = _bytes_head(path)
+    if sniff_format(head, path.suffix) == "xlsx":
+        import openpyxl
 
-    # .xlsx
-    if suf == ".xlsx" or head[:2] == b"PK":
         wb = openpyxl.load_workbook(path)
         return wb, wb.active
+    return None, load_rows_any(path, head)
 
-    # .xls
-    if suf == ".xls":
-        # 진짜 BIFF
-        if head.startswith(b"\xD0\xCF\x11\xE0"):
-            df = pd.read_excel(path, header=None, engine="xlrd")  # xlrd 필요
-            return _df_to_ws(df)
 
-        # 가짜 .xls (html 등) -> Excel COM 변환 시도
-        try:
-            tmp_xlsx = _excel_com_convert_to_xlsx(path)
-            wb = openpyxl.load_workbook(tmp_xlsx)
-            return wb, wb.active
-        except Exception:
-            # html table
-            text = head.lstrip(b"\xef\xbb\xbf")
-            if text[:10].lower().startswith(b"<html") or b"<table" in text.lower():
-                dfs = pd.read_html(path, header=None)
-                return _df_to_ws(dfs[0])
-            # csv fallback
-            df = pd.read_csv(path, header=None, encoding="utf-8-sig")
-            return _df_to_ws(df)
-
-    raise ValueError("지원 확장자: .xls / .xlsx")
-
-
-def fill_merged_in_column(ws, col_idx=13, header_row=1):
-    targets = []
-    for mr in list(ws.merged_cells.ranges):
-        if mr.min_col <= col_idx <= mr.max_col:
-            top_val = ws.cell(mr.min_row, mr.min_col).value
-            targets.append({"ref": str(mr), "min_row": mr.min_row, "max_row": mr.max_row, "top_val": top_val})
-    for t in targets:
-        ws.unmerge_cells(t["ref"])
-    for t in targets:
-        for r in range(t["min_row"], t["max_row"] + 1):
-            ws.cell(r, col_idx).value = t["top_val"]
+def fill_merged_in_column(rows: list[list], merged_ranges, col_idx=13, header_row=1):
+    """rows(0부터)에서 col_idx열(1부터)의 병합 칸을 윗값으로 채우고, 빈 칸은 바로 위 값으로 채운다."""
+    c = col_idx - 1
+    for min_row, min_col, max_row, max_col in merged_ranges:
+        if min_col <= col_idx <= max_col:
+            top_val = rows[min_row - 1][min_col - 1] if min_row <= len(rows) else None
+            for r in range(min_row - 1, min(max_row, len(rows))):
+                rows[r][c] = top_val
 
     last = None
-    for r in range(header_row + 1, ws.max_row + 1):
-        val = ws.cell(r, col_idx).value
+    for values in rows[header_row:]:
+        val = values[c]
         if (val is None or val == "") and last:
-            ws.cell(r, col_idx).value = last
+            values[c] = last
         else:
             last = val
 
 
-def process_and_load_any(path: Path):
-    wb, ws = load_excel_any(path)
-    fill_merged_in_column(ws, col_idx=13, header_row=1)
+def _parse_time(v):
+    if isinstance(v, datetime):
+        return v
+    if v is None:
+        return datetime.max
+    s = str(v).strip()
+    try:
+        return datetime.fromisoformat(s)
+    except Exception:
+        try:
+            return datetime.strptime(s, "%Y-%m-%d %H:%M:%S")
+        except Exception:
+            return datetime.max
 
-    # H열 코드 정규화
-    for row in ws.iter_rows(min_row=2, min_col=8, max_col=8):
-        cell = row[0]
-        cell.value = normalize_to_yusas(cell.value)
 
-    # N열 기준 정렬
-    rows = []
-    for r in range(2, ws.max_row + 1):
-        nval = ws.cell(r, 14).value  # N
-        row_values = [ws.cell(r, c).value for c in range(1, ws.max_column + 1)]
-        rows.append([nval, row_values])
+def process_and_load_any(path: Path):
+    sheet = read_sheet(path, "orders", merged=True)
+    # 워크북에 옮겨 담지 않고 행 리스트로 바로 처리한다. O열(15)까지는 항상 있도록 채운다.
+    width = max(sheet.max_column, 15)
+    with metrics.span("normalize", "orders"):
+        rows = [list(values) for values in sheet.iter_rows(max_col=width)]
+        fill_merged_in_column(rows, sheet.merged_ranges, col_idx=13, header_row=1)
+
+        body = rows[1:]
+        # H열 코드 정규화
+        for values in body:
+            values[7] = normalize_to_yusas(values[7])
 
-    def parse_time(v):
-        if isinstance(v, datetime):
-            return v
-        if v is None:
-            return datetime.max
-        s = str(v).strip()
-        try:
-            return datetime.fromisoformat(s)
-        except Exception:
-            try:
-                return datetime.strptime(s, "%Y-%m-%d %H:%M:%S")
-            except Exception:
-                return datetime.max
-
-    rows.sort(key=lambda x: parse_time(x[0]))
-
-    header = [ws.cell(1, c).value for c in range(1, ws.max_column + 1)]
-    for r in range(1, ws.max_row + 1):
-        for c in range(1, ws.max_column + 1):
-            ws.cell(r, c).value = None
-    for c, v in enumerate(header, start=1):
-        ws.cell(1, c).value = v
-    row_idx = 2
-    for _, row_vals in rows:
-        for c, v in enumerate(row_vals, start=1):
-            ws.cell(row_idx, c).value = v
-        row_idx += 1
+    # N열 기준 정렬
+    with metrics.span("sort", "orders"):
+        body.sort(key=lambda values: _parse_time(values[13]))
 
     mapping_counts = defaultdict(Counter)
     mapping_details = defaultdict(dict)
@@ -210,61 +146,63 @@ def process_and_load_any(path: Path):
         cur_run_len_code[code] = 0
         cur_run_members[code] = []
 
-    for r in range(2, ws.max_row + 1):
-        code = _to_str(ws.cell(r, 8).value)     # H
-        name = _to_str(ws.cell(r, 9).value)     # I
-        option = _to_str(ws.cell(r, 10).value)  # J
-        inv = _to_str(ws.cell(r, 13).value)     # M
-        t = _parse_dt(ws.cell(r, 14).value)           # N
-        qty = _to_int(ws.cell(r, QTY_COL).value, default=1)
-        o_val = ws.cell(r, 15).value                  # O
-
-        if not (inv and code) or qty <= 0:
-            prev_code_row = code
-            continue
-
-        if code not in code_o_text and o_val is not None:
-            code_o_text[code] = _to_str(o_val)
-
-        if inv not in seen_invoice:
-            seen_invoice.add(inv)
-            invoice_seq.append(inv)
-
-        if code not in invoice_order[inv]:
-            invoice_order[inv].append(code)
-
-        mapping_counts[inv][code] += qty
-        if code not in mapping_details[inv]:
-            mapping_details[inv][code] = {"name": name, "option": option}
-
-        same_run = False
-        if prev_code_row == code:
-            same_run = True
-        else:
-            lt = last_time_code.get(code)
-            if lt and t and abs((t - lt).total_seconds()) <= 2:
+    # 송장별 묶기 + 연속 스캔(run) 계산
+    with metrics.span("run_detection", "orders"):
+        for values in body:
+            code = _to_str(values[7])     # H
+            name = _to_str(values[8])     # I
+            option = _to_str(values[9])   # J
+            inv = _to_str(values[12])     # M
+            t = _parse_dt(values[13])     # N
+            qty = _to_int(values[QTY_COL - 1], default=1)
+            o_val = values[14]            # O
+
+            if not (inv and code) or qty <= 0:
+                prev_code_row = code
+                continue
+
+            if code not in code_o_text and o_val is not None:
+                code_o_text[code] = _to_str(o_val)
+
+            if inv not in seen_invoice:
+                seen_invoice.add(inv)
+                invoice_seq.append(inv)
+
+            if code not in invoice_order[inv]:
+                invoice_order[inv].append(code)
+
+            mapping_counts[inv][code] += qty
+            if code not in mapping_details[inv]:
+                mapping_details[inv][code] = {"name": name, "option": option}
+
+            same_run = False
+            if prev_code_row == code:
                 same_run = True
+            else:
+                lt = last_time_code.get(code)
+                if lt and t and abs((t - lt).total_seconds()) <= 2:
+                    same_run = True
+
+            if same_run:
+                cur_run_len_code[code] += 1
+                cur_run_members[code].append((inv, code))
+            else:
+                if cur_run_len_code[code] > 0:
+                    flush_run(code)
+                cur_run_len_code[code] = 1
+                cur_run_members[code] = [(inv, code)]
+
+            if t:
+                last_time_code[code] = t
+            prev_code_row = code
 
-        if same_run:
-            cur_run_len_code[code] += 1
-            cur_run_members[code].append((inv, code))
-        else:
+        for code in list(cur_run_len_code.keys()):
             if cur_run_len_code[code] > 0:
                 flush_run(code)
-            cur_run_len_code[code] = 1
-            cur_run_members[code] = [(inv, code)]
-
-        if t:
-            last_time_code[code] = t
-        prev_code_row = code
-
-    for code in list(cur_run_len_code.keys()):
-        if cur_run_len_code[code] > 0:
-            flush_run(code)
 
-    mapping_runs = defaultdict(lambda: defaultdict(int))
-    for (inv, code), L in run_len_per_invcode.items():
-        if L > 1:
-            mapping_runs[inv][code] = L
+        mapping_runs = defaultdict(lambda: defaultdict(int))
+        for (inv, code), L in run_len_per_invcode.items():
+            if L > 1:
+                mapping_runs[inv][code] = L
 
     return mapping_counts, mapping_details, mapping_runs, invoice_order, invoice_seq, code_o_text
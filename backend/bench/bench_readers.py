@@ -0,0 +1,103 @@
+# backend/bench/bench_readers.py
+# 엑셀 읽기 엔진 비교 (openpyxl vs calamine).
+#   cd backend && python bench/bench_readers.py [--rows 20000] [--repeat 3] [--endpoint orders 파일.xlsx ...]
+#   - 파일을 주지 않으면 bench/generators.py로 실제 업로드 모양의 xlsx를 임시 폴더에 만든다.
+#     주문서(15열, M열 송장 병합), 반품 엑셀(13열), 원가베이스(2열), 합배(두 번째 시트)
+#   - 같은 파일을 엔진별로 readers.read_sheet / read_frame으로 읽어서 걸린 시간과 결과가 같은지 출력한다.
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pandas as pd  # noqa: E402
+
+import readers  # noqa: E402
+from bench import generators  # noqa: E402
+
+# 이름 → (엔드포인트, generators 모양, 읽는 방법)
+SHAPES = {
+    "orders": ("orders", "order_export", lambda p: readers.read_sheet(p, "orders", merged=True)),
+    "returns": (
+        "returns", "returns_excel2", lambda p: readers.read_frame(p, "returns", dtype=str, engine="openpyxl")
+    ),
+    "cost_base": ("cost_base", "cost_base", lambda p: readers.read_frame(p, "cost_base", dtype=str)),
+    "amood_hapbae": (
+        "amood_hapbae", "amood_hapbae",
+        lambda p: readers.read_sheet(p, "amood_hapbae", sheet_index=1, data_only=True),
+    ),
+}
+
+
+def _fingerprint(result):
+    if isinstance(result, pd.DataFrame):
+        return result.fillna("").astype(str).values.tolist(), [str(c) for c in result.columns]
+    rows = [list(r) for r in result.iter_rows()]
+    while rows and not any(v not in (None, "") for v in rows[-1]):
+        rows.pop()
+    return [[("" if v is None else v) for v in r] for r in rows], sorted(result.merged_ranges)
+
+
+def _run(read, path: Path, endpoint: str, engine: str, repeat: int):
+    key = f"READER_ENGINE_{endpoint.upper()}"
+    old = os.environ.get(key)
+    os.environ[key] = engine
+    try:
+        times = []
+        result = None
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            result = read(path)
+            times.append(time.perf_counter() - t0)
+        return min(times), result
+    finally:
+        if old is None:
+            os.environ.pop(key, None)
+        else:
+            os.environ[key] = old
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="엑셀 읽기 엔진 비교")
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--endpoint", choices=sorted(SHAPES), help="파일을 줄 때 읽는 방법 (기본: orders)")
+    parser.add_argument("files", nargs="*", type=Path)
+    args = parser.parse_args(argv)
+
+    engines = ["openpyxl"] + (["calamine"] if readers.calamine_available() else [])
+    if len(engines) == 1:
+        print("python-calamine이 설치되어 있지 않아 openpyxl만 측정합니다.")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cases = []
+        if args.files:
+            name = args.endpoint or "orders"
+            cases = [(name, f) for f in args.files]
+        else:
+            for name, (_, shape, _) in SHAPES.items():
+                cases.append((name, generators.ensure(Path(tmp), shape, args.rows)))
+
+        print(f"{'shape':<14}{'file':<22}{'MB':>7}" + "".join(f"{e:>12}" for e in engines) + "  same")
+        for name, path in cases:
+            endpoint, _, read = SHAPES[name]
+            timings = []
+            prints = []
+            for engine in engines:
+                seconds, result = _run(read, path, endpoint, engine, args.repeat)
+                timings.append(seconds)
+                prints.append(_fingerprint(result))
+            same = all(p == prints[0] for p in prints[1:])
+            size = path.stat().st_size / 1024 / 1024
+            print(
+                f"{name:<14}{path.name[:21]:<22}{size:>7.2f}"
+                + "".join(f"{t * 1000:>10.0f}ms" for t in timings)
+                + f"  {'yes' if same else 'NO'}"
+            )
+
+
+if __name__ == "__main__":
+    main()
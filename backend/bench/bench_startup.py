@@ -0,0 +1,115 @@
+# backend/bench/bench_startup.py
+# 워커 기동 시간 벤치마크.
+#   cd backend && python bench/bench_startup.py [--runs 5] [--importtime 15] [--json out.json]
+#   - 매번 새 파이썬 프로세스에서 잰다: 인터프리터 시작 → import main → lifespan(DB 준비, 저널 재생) → 첫 요청.
+#     두 번째 실행부터는 app.db가 이미 준비된 상태(재기동)라서 첫 번째(빈 DB)와 따로 적는다.
+#   - 자식은 run_bench와 같이 임시 app.db/스캔 저널/scratch를 쓴다.
+#   - --importtime N: python -X importtime 결과에서 누적 시간이 큰 모듈 N개, import 뒤에 올라와 있는 무거운 라이브러리도 출력.
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from bench.run_bench import percentile  # noqa: E402
+
+HEAVY_MODULES = ("pandas", "numpy", "openpyxl", "xlwt", "xlrd", "passlib", "pyarrow", "PIL", "lxml")
+
+CHILD = """
+import json, os, sys, time
+t0 = time.perf_counter()
+sys.path.insert(0, {backend!r})
+os.chdir({backend!r})
+import main
+t1 = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(main.app) as client:
+    t2 = time.perf_counter()
+    client.get("/metrics")
+    t3 = time.perf_counter()
+loaded = [m for m in {heavy!r} if m in sys.modules]
+print("BENCH " + json.dumps({{"import_s": t1 - t0, "lifespan_s": t2 - t1, "first_request_s": t3 - t2, "loaded": loaded}}))
+"""
+
+
+def _env(work: Path) -> dict:
+    env = dict(os.environ)
+    env.update({
+        "APP_DB_PATH": str(work / "app.db"),
+        "SCAN_JOURNAL_PATH": str(work / "scan_journal.db"),
+        "SCRATCH_DIR": str(work / "scratch"),
+        "SCRATCH_SWEEP_INTERVAL": "0",
+        # 첫 요청으로 /metrics를 부르므로 인증 없이 연다
+        "METRICS_PUBLIC": "1",
+    })
+    return env
+
+
+def _run_once(work: Path) -> dict:
+    code = CHILD.format(backend=str(BACKEND_DIR), heavy=HEAVY_MODULES)
+    t0 = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=_env(work))
+    wall = time.perf_counter() - t0
+    lines = [line for line in proc.stdout.splitlines() if line.startswith("BENCH ")]
+    if proc.returncode != 0 or not lines:
+        raise RuntimeError(proc.stderr[-2000:])
+    result = json.loads(lines[-1][len("BENCH "):])
+    result["wall_s"] = wall
+    return result
+
+
+def _importtime(work: Path, top: int) -> list[tuple[str, int, int]]:
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        capture_output=True, text=True, env=_env(work), cwd=BACKEND_DIR,
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        try:
+            self_us, cumulative_us = int(parts[0]), int(parts[1])
+        except ValueError:
+            continue
+        rows.append((parts[2].strip(), self_us, cumulative_us))
+    # 같은 트리 안에서 부모가 자식을 포함하므로 최상위(들여쓰기 없는) 모듈 위주로 보인다
+    rows.sort(key=lambda r: r[2], reverse=True)
+    return rows[:top]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="워커 기동 시간 벤치마크")
+    parser.add_argument("--runs", type=int, default=5, help="재기동 측정 횟수 (빈 DB 한 번은 따로)")
+    parser.add_argument("--importtime", type=int, default=0, metavar="N", help="누적 import 시간 상위 N개 모듈 출력")
+    parser.add_argument("--json", type=Path, help="결과를 JSON으로 저장")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="yusaek_startup_") as tmp:
+        work = Path(tmp)
+        cold = _run_once(work)
+        warm = [_run_once(work) for _ in range(max(1, args.runs))]
+        top = _importtime(work, args.importtime) if args.importtime else []
+
+    keys = ("wall_s", "import_s", "lifespan_s", "first_request_s")
+    print(f"{'':<14}" + "".join(f"{k[:-2]:>16}" for k in keys))
+    print(f"{'empty db':<14}" + "".join(f"{cold[k] * 1000:>14.0f}ms" for k in keys))
+    for name, p in (("restart p50", 50), ("restart max", 100)):
+        print(f"{name:<14}" + "".join(f"{percentile([r[k] for r in warm], p) * 1000:>14.0f}ms" for k in keys))
+    print("heavy modules loaded after startup: " + (", ".join(warm[-1]["loaded"]) or "-"))
+    if top:
+        print(f"\n{'module':<48}{'self':>10}{'cumulative':>12}")
+        for name, self_us, cumulative_us in top:
+            print(f"{name[:47]:<48}{self_us / 1000:>8.1f}ms{cumulative_us / 1000:>10.1f}ms")
+    if args.json:
+        args.json.write_text(json.dumps({"empty_db": cold, "restarts": warm}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+# backend/bench/bench_text_norm.py
+# text_norm 마이크로 벤치마크: 예전 구현(매번 re.sub 여러 번) vs text_norm(미리 컴파일 + LRU).
+#   cd backend && python bench/bench_text_norm.py [--repeat 20] [--cols I,J] [엑셀/CSV 파일 ...]
+#   - 파일을 주지 않으면 uploads/shared_files의 엑셀에서 한글이 들어간 텍스트 칸을 모두 모아 말뭉치로 쓴다.
+#     (그래도 비어 있으면 고정 시드로 만든 상품명)
+#   - 말뭉치를 repeat번 섞어서 이어 붙인다. 실제 주문서처럼 같은 상품명이 반복되는 상황이다.
+#   - nocache: 정규식만 바뀐 효과(LRU 없이), cold: 캐시를 비운 뒤 한 번, warm: 캐시가 찬 상태.
+#     speedup은 legacy / cold. 결과가 예전 구현과 같은지도 확인한다.
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+import readers  # noqa: E402
+import text_norm  # noqa: E402
+from openpyxl.utils.cell import column_index_from_string  # noqa: E402
+
+SEED = 7
+HANGUL = re.compile(r"[가-힣]")
+
+
+# ---------- 예전 구현 (비교용) ----------
+def _legacy_strip_edge_tags(s):
+    lead_patterns = [r"^\[[^\]]*\]\s*", r"^\([^\)]*\)\s*", r"^\{[^}]*\}\s*"]
+    tail_patterns = [r"\s*\[[^\]]*\]$", r"\s*\([^\)]*\)$", r"\s*\{[^}]*\}$"]
+    s = s.strip()
+    changed = True
+    while changed:
+        changed = False
+        for pat in lead_patterns:
+            new_s = re.sub(pat, "", s)
+            if new_s != s:
+                s = new_s.strip()
+                changed = True
+        for pat in tail_patterns:
+            new_s = re.sub(pat, "", s)
+            if new_s != s:
+                s = new_s.strip()
+                changed = True
+    return s.strip()
+
+
+def _legacy_strip_brackets(s):
+    for pat in (r"\[[^\]]*\]", r"\([^)]*\)", r"\{[^}]*\}"):
+        s = re.sub(pat, "", s)
+    return re.sub(r"\s+", " ", s).strip()
+
+
+def _legacy_clean_product_name(s):
+    s = re.sub(r"\[[^\]]*\]", " ", s)
+    s = re.sub(r"\([^)]*\)", " ", s)
+    return re.sub(r"\s+", " ", s).strip()
+
+
+def _legacy_lowercase_size_words(s):
+    for w in ["FREE", "XS", "S", "M", "L", "XL", "XXL", "XXXL", "SHORT", "LONG"]:
+        s = re.sub(rf"\b{w}\b", w.lower(), s, flags=re.IGNORECASE)
+    return s
+
+
+def _legacy_merge_slash_parts(s):
+    parts = [p.strip() for p in s.split("/") if p.strip() != ""]
+    parts = ["".join(p.split()) for p in parts]
+    return " ".join(parts).strip()
+
+
+CASES = [
+    ("strip_edge_tags", _legacy_strip_edge_tags, text_norm.strip_edge_tags),
+    ("merge_slash_parts", _legacy_merge_slash_parts, text_norm.merge_slash_parts),
+    ("strip_brackets", _legacy_strip_brackets, text_norm.strip_brackets),
+    ("clean_product_name", _legacy_clean_product_name, text_norm.clean_product_name),
+    ("lowercase_size_words", _legacy_lowercase_size_words, text_norm.lowercase_size_words),
+]
+
+
+# ---------- 말뭉치 ----------
+def _texts_from_file(path: Path, cols: list[int] | None) -> list[str]:
+    sheet = readers.read_sheet(path, "orders")
+    out = []
+    for values in sheet.iter_rows():
+        picked = [values[c - 1] for c in cols if c <= len(values)] if cols else values
+        for v in picked:
+            if isinstance(v, str) and HANGUL.search(v):
+                out.append(v)
+    return out
+
+
+def _synthetic(count: int) -> list[str]:
+    rnd = random.Random(SEED)
+    tags = ["[특가]", "[당일출고]", "(재입고)", "{한정}", ""]
+    words = ["포린", "브이넥", "소매", "버튼", "긴팔", "티셔츠", "플리츠", "스커트", "모직", "미디", "니트", "가디건"]
+    colors = ["블랙", "아이보리", "퍼플", "네이비", "베이지"]
+    sizes = ["S", "M", "L", "XL", "FREE", "short", "long"]
+    out = []
+    for _ in range(count):
+        name = " ".join(rnd.sample(words, rnd.randint(2, 5)))
+        out.append(f"{rnd.choice(tags)} {name} {rnd.choice(tags)}".strip())
+        out.append(f"{rnd.choice(colors)} / {rnd.choice(sizes)}")
+    return out
+
+
+def load_corpus(files: list[Path], cols: list[int] | None) -> tuple[list[str], str]:
+    if not files:
+        files = sorted(p for p in (BACKEND_DIR / "uploads" / "shared_files").glob("*") if p.suffix in (".xls", ".xlsx"))
+    texts = []
+    for path in files:
+        try:
+            texts.extend(_texts_from_file(path, cols))
+        except Exception as e:
+            print(f"skip {path.name}: {e}")
+    if texts:
+        return texts, f"{len(files)} file(s)"
+    return _synthetic(500), "synthetic"
+
+
+def _time(func, workload) -> float:
+    t0 = time.perf_counter()
+    for s in workload:
+        func(s)
+    return time.perf_counter() - t0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="text_norm 마이크로 벤치마크")
+    parser.add_argument("--repeat", type=int, default=20, help="말뭉치를 몇 번 반복할지")
+    parser.add_argument("--cols", help="읽을 열 (예: I,J). 없으면 모든 열")
+    parser.add_argument("files", nargs="*", type=Path)
+    args = parser.parse_args(argv)
+
+    cols = [column_index_from_string(c.strip().upper()) for c in args.cols.split(",")] if args.cols else None
+    corpus, source = load_corpus(args.files, cols)
+    workload = corpus * args.repeat
+    random.Random(SEED).shuffle(workload)
+    print(f"corpus: {len(corpus)} texts ({len(set(corpus))} unique) from {source}, workload {len(workload)} calls")
+    print(f"{'function':<22}{'legacy':>10}{'nocache':>10}{'cold':>10}{'warm':>10}{'speedup':>9}  same")
+    for name, legacy, new in CASES:
+        new.cache_clear()
+        legacy_s = _time(legacy, workload)
+        nocache_s = _time(new.__wrapped__, workload)
+        new.cache_clear()
+        cold_s = _time(new, workload)
+        warm_s = _time(new, workload)
+        same = all(legacy(s) == new(s) for s in set(corpus))
+        per_call = lambda sec: f"{sec / len(workload) * 1e9:>8.0f}ns"  # noqa: E731
+        print(
+            f"{name:<22}{per_call(legacy_s)}{per_call(nocache_s)}{per_call(cold_s)}{per_call(warm_s)}"
+            f"{legacy_s / cold_s:>8.1f}x  {'yes' if same else 'NO'}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+# backend/bench/generators.py
+# 벤치마크용 입력 파일 생성기. 같은 (rows, seed)면 항상 같은 파일이 나온다.
+#   - 실제 업로드 모양을 흉내 낸다: 열 위치, 병합(M열 송장, AMOOD excel2 E열), 반복되는 상품명/옵션.
+#   - 병합이 있는 모양만 일반 워크북으로 만들고, 나머지는 write-only로 빠르게 쓴다.
+#   - 스캔할 값은 파일을 다시 읽지 않고 order_invoices()/returns_scan_codes()/amood_invoices()로 얻는다.
+import random
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import openpyxl
+
+SEED = 20240101
+
+RETURN_SCAN_BASE = 500000000000  # 반품 1번 엑셀 D열 (스캔하는 반품 송장)
+RETURN_ORIGINAL_BASE = 700000000000  # 1번 E열 = 2번 M열 (원 송장)
+ORDER_INVOICE_BASE = 600000000000
+AMOOD_ORDER_BASE = 100000
+
+_BRANDS = ["유색", "델유", "포린", "루든", "히피스"]
+_WORDS = [
+    "브이넥", "소매", "버튼", "긴팔", "티셔츠", "플리츠", "레이어드", "스커트", "모직", "미디",
+    "드레이프", "니트", "가디건", "와이드", "슬랙스", "아일렛", "셔츠", "원피스", "자켓", "코트",
+]
+_COLORS = ["블랙", "아이보리", "퍼플", "네이비", "베이지", "그레이", "화이트"]
+_SIZES = ["S", "M", "L", "XL", "FREE", "short", "long"]
+_REASONS = ["판매자(불량)", "판매자(오배송)", "고객(단순변심)", "고객(사이즈)", "기타"]
+_TAGS = ["[특가]", "[당일출고]", "(재입고)", "{한정}", "", "", ""]
+
+
+def _catalog(rnd: random.Random, count: int) -> list[str]:
+    # 상품명은 몇백 개에서 반복해서 뽑힌다 (실제 주문서처럼)
+    return [f"{rnd.choice(_BRANDS)} {' '.join(rnd.sample(_WORDS, rnd.randint(2, 4)))}" for _ in range(count)]
+
+
+def _group_sizes(rnd: random.Random, rows: int, sizes=(1, 1, 1, 2, 3)) -> list[int]:
+    out = []
+    left = rows
+    while left > 0:
+        n = min(rnd.choice(sizes), left)
+        out.append(n)
+        left -= n
+    return out
+
+
+def order_export(path: Path, rows: int, seed: int = SEED):
+    """바코드 주문서: 15열, H 코드 / I 상품명 / J 옵션 / K 수량 / M 송장(병합) / N 시각 / O 메모."""
+    rnd = random.Random(seed)
+    catalog = _catalog(rnd, 300)
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append(["", "주문번호", "주문일", "판매처", "주문코드", "수령인", "주소", "상품코드", "상품명", "옵션", "수량",
+               "택배사", "송장번호", "스캔시각", "메모"])
+    start = datetime(2024, 1, 1, 9, 0, 0)
+    r = 2
+    for invoice, size in enumerate(_group_sizes(rnd, rows)):
+        for k in range(size):
+            ws.append([
+                None, 390000 + r, "2024-01-01", "에이블리(유색)", f"{1770000000000 + r}", "홍*동", "서울 ***",
+                f"S{rnd.randint(10000, 19999)}", rnd.choice(catalog),
+                f"[{rnd.choice(_COLORS)}-{rnd.choice(_SIZES)}]", rnd.choice((1, 1, 1, 2)), "CJ대한통운",
+                f"{ORDER_INVOICE_BASE + invoice}" if k == 0 else None,
+                (start + timedelta(seconds=r * 3)).strftime("%Y-%m-%d %H:%M:%S"), rnd.choice(("", "", "문앞")),
+            ])
+            r += 1
+        if size > 1:
+            ws.merge_cells(start_row=r - size, start_column=13, end_row=r - 1, end_column=13)
+    wb.save(path)
+
+
+def order_invoices(rows: int, seed: int = SEED) -> list[str]:
+    """order_export M열 송장 번호 (order_export와 같은 난수 순서로 묶음 수를 구한다)."""
+    rnd = random.Random(seed)
+    _catalog(rnd, 300)
+    return [str(ORDER_INVOICE_BASE + i) for i in range(len(_group_sizes(rnd, rows)))]
+
+
+def incoming(path: Path, rows: int, seed: int = SEED):
+    """입고 파일: A 코드, B 수량."""
+    rnd = random.Random(seed)
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("입고")
+    for _ in range(rows):
+        ws.append([f"S{rnd.randint(10000, 19999)}", rnd.randint(1, 20)])
+    wb.save(path)
+
+
+def returns_scan_codes(rows: int) -> list[str]:
+    return [str(RETURN_SCAN_BASE + i) for i in range(rows)]
+
+
+def returns_excel1(path: Path, rows: int, seed: int = SEED):
+    """반품 1번: D 반품 송장(스캔) → E 원 송장."""
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("반품접수")
+    ws.append(["번호", "접수일", "고객", "반품송장", "원송장"])
+    for i in range(rows):
+        ws.append([i + 1, "2024-01-02", f"고객{i % 997}", str(RETURN_SCAN_BASE + i), str(RETURN_ORIGINAL_BASE + i)])
+    wb.save(path)
+
+
+def returns_excel2(path: Path, rows: int, seed: int = SEED):
+    """반품 2번: 13열, F 상품명 / G 옵션 / H 수량 / K 사유 / M 원 송장 (한 송장에 1~3행)."""
+    rnd = random.Random(seed)
+    catalog = _catalog(rnd, 300)
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("주문")
+    ws.append([f"열{i}" for i in range(1, 14)])
+    written = 0
+    for invoice, size in enumerate(_group_sizes(rnd, rows, sizes=(1, 1, 2, 3))):
+        for _ in range(size):
+            ws.append([
+                written + 1, "", "", "", "", f"{rnd.choice(_TAGS)} {rnd.choice(catalog)} {rnd.choice(_TAGS)}".strip(),
+                f"{rnd.choice(_COLORS)}/{rnd.choice(_SIZES)}", str(rnd.choice((1, 1, 2))), "", "",
+                rnd.choice(_REASONS), "", str(RETURN_ORIGINAL_BASE + invoice),
+            ])
+            written += 1
+    wb.save(path)
+
+
+def cost_base(path: Path, rows: int, seed: int = SEED):
+    """원가베이스: A 상품명+옵션 키, B 값."""
+    rnd = random.Random(seed)
+    catalog = _catalog(rnd, 300)
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("원가")
+    ws.append(["상품", "원가"])
+    for i in range(rows):
+        ws.append([f"{catalog[i % len(catalog)]} {rnd.choice(_COLORS)} {rnd.choice(_SIZES).lower()} {i}",
+                   rnd.randint(1000, 90000)])
+    wb.save(path)
+
+
+def _amood_groups(rows: int, seed: int) -> list[int]:
+    return _group_sizes(random.Random(seed + 17), rows, sizes=(1, 2, 2, 3))
+
+
+def amood_invoices(rows: int, seed: int = SEED) -> list[str]:
+    """AMOOD excel1 D열 스캔 바코드 (excel2 rows 기준 주문 수만큼)."""
+    return [f"BX{i:07d}" for i in range(len(_amood_groups(rows, seed)))]
+
+
+def amood_excel1(path: Path, rows: int, seed: int = SEED):
+    """AMOOD excel1: 두 번째 시트에 B 번호 / C 주문키 / D 스캔 바코드 / H 원래 상품명. rows는 excel2 행 수."""
+    rnd = random.Random(seed)
+    catalog = _catalog(rnd, 300)
+    wb = openpyxl.Workbook(write_only=True)
+    wb.create_sheet("요약").append(["AMOOD"])
+    ws = wb.create_sheet("주문")
+    ws.append(["", "번호", "주문키", "바코드", "", "", "", "상품명"])
+    for i, code in enumerate(amood_invoices(rows, seed)):
+        ws.append(["", i + 1, AMOOD_ORDER_BASE + i, code, "", "", "",
+                   f"{rnd.choice(_TAGS)} {rnd.choice(catalog)} {rnd.choice(_TAGS)}".strip()])
+    wb.save(path)
+
+
+def amood_excel2(path: Path, rows: int, seed: int = SEED):
+    """AMOOD excel2: 14열, E 주문키(병합) / H 상품 바코드 / I 상품명 / J 옵션 / K 수량 / N 출력(비움)."""
+    rnd = random.Random(seed + 1)
+    catalog = _catalog(rnd, 300)
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append([f"열{i}" for i in range(1, 15)])
+    r = 2
+    for order, size in enumerate(_amood_groups(rows, seed)):
+        for k in range(size):
+            ws.append(["", "", "", "", AMOOD_ORDER_BASE + order if k == 0 else None, "", "",
+                       f"88{rnd.randint(10000000, 99999999)}", rnd.choice(catalog),
+                       f"{rnd.choice(_COLORS)}-{rnd.choice(_SIZES)}", rnd.choice((1, 1, 2)), "", "", ""])
+            r += 1
+        if size > 1:
+            ws.merge_cells(start_row=r - size, start_column=5, end_row=r - 1, end_column=5)
+    wb.save(path)
+
+
+def amood_hapbae(path: Path, rows: int, seed: int = SEED):
+    """합배: 두 번째 시트에 C 묶음키 / D 비교값 / H 상품명 / J 옵션(슬래시) / K 수량."""
+    rnd = random.Random(seed + 3)
+    wb = openpyxl.Workbook(write_only=True)
+    wb.create_sheet("요약").append(["합배"])
+    ws = wb.create_sheet("주문")
+    ws.append([f"열{i}" for i in range(1, 12)])
+    for i in range(rows):
+        ws.append([
+            i, None, f"C{rnd.randint(0, max(1, rows // 3))}", f"D{rnd.randint(0, 1)}", None, None, None,
+            f"[특가] 상품 {rnd.randint(1, 300)}", None, f"색상/{rnd.choice('SML')}", rnd.randint(1, 2),
+        ])
+    wb.save(path)
+
+
+def easyadmin_products(path: Path, rows: int, seed: int = SEED):
+    """이지어드민 상품 원본: B "상품명 색상 원가" / C 상품명 [태그] / H 코드 / L 옵션(쉼표)."""
+    rnd = random.Random(seed + 5)
+    catalog = _catalog(rnd, 300)
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("상품")
+    ws.append([f"열{i}" for i in range(1, 13)])
+    for i in range(rows):
+        name = rnd.choice(catalog).replace(" ", "")
+        ws.append([
+            i + 1, f"{name} {rnd.choice(_COLORS)} {rnd.randint(5000, 50000)}", f"[신상] {name} [{rnd.choice(_BRANDS)}]",
+            "", "", "", "", f"S{10000 + i}", "", "", "", ",".join(rnd.sample(_SIZES, 3)),
+        ])
+    wb.save(path)
+
+
+# 이름 → 생성 함수. 파일 이름은 <이름>_<rows>_<seed>.xlsx
+SHAPES = {
+    "order_export": order_export,
+    "incoming": incoming,
+    "returns_excel1": returns_excel1,
+    "returns_excel2": returns_excel2,
+    "cost_base": cost_base,
+    "amood_excel1": amood_excel1,
+    "amood_excel2": amood_excel2,
+    "amood_hapbae": amood_hapbae,
+    "easyadmin_products": easyadmin_products,
+}
+
+
+def ensure(data_dir: Path, shape: str, rows: int, seed: int = SEED) -> Path:
+    """data_dir에 없으면 만들고 경로를 돌려준다 (같은 이름이면 다시 만들지 않는다)."""
+    data_dir = Path(data_dir)
+    data_dir.mkdir(parents=True, exist_ok=True)
+    path = data_dir / f"{shape}_{rows}_{seed}.xlsx"
+    if not path.exists():
+        tmp = path.with_name(f".{path.name}.tmp.xlsx")
+        SHAPES[shape](tmp, rows, seed)
+        tmp.replace(path)
+    return path
@@ -0,0 +1,251 @@
+# backend/bench/load_test.py
+# 스캔 스테이션 동시 접속 부하 테스트.
+#   cd backend && python bench/load_test.py [--stations 1,4,16] [--duration 20] [--rate 2] [--mix barcode,amood,returns]
+#   - 기본은 앱을 같은 프로세스에서 httpx ASGI transport로 부른다 (임시 app.db/스캔 저널/scratch, backend/app.db는 그대로).
+#     --url http://127.0.0.1:8000 을 주면 떠 있는 uvicorn에 보낸다. 그 서버 DB에 loadtest-N 계정이 생기고 스캔 상태가 바뀐다.
+#   - 스테이션 하나 = 사용자 한 명. 각자 로그인해서 AMOOD/반품 파일을 올리고, 송장 → 상품 순서로 스캔을 되풀이한다.
+#     바코드 주문서 상태는 서버 전역 하나라서 한 번만 올리고 모든 스테이션이 같이 쓴다 (현장과 같다).
+#   - 스테이션은 응답을 받은 뒤 평균 1/--rate초(지수분포) 쉬고 다음 스캔을 보낸다.
+#   - N마다 엔드포인트별 요청 수, 처리량, 오류율(HTTP 4xx/5xx, 연결 오류), miss율(ok=false/NOT_FOUND/FALSE), p50/p95/p99와
+#     지연 히스토그램을 출력한다. miss는 스테이션끼리 바코드 현재 송장을 덮어쓰는 경합도 포함한다.
+import argparse
+import asyncio
+import json
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+import httpx  # noqa: E402
+
+from bench import generators  # noqa: E402
+from bench.run_bench import isolate_app_state, percentile  # noqa: E402
+
+WORKFLOWS = ("barcode", "amood", "returns")
+PASSWORD = "loadtest-pw"
+# 히스토그램 경계(ms). 마지막 칸은 그 이상
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+
+class Recorder:
+    """엔드포인트별 지연/오류/miss 기록."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.misses = defaultdict(int)
+
+    def add(self, endpoint: str, seconds: float, error: bool = False, miss: bool = False):
+        self.latencies[endpoint].append(seconds)
+        if error:
+            self.errors[endpoint] += 1
+        elif miss:
+            self.misses[endpoint] += 1
+
+    def rows(self, elapsed: float) -> list[dict]:
+        out = []
+        for endpoint in sorted(self.latencies):
+            lat = self.latencies[endpoint]
+            out.append({
+                "endpoint": endpoint,
+                "requests": len(lat),
+                "req_s": round(len(lat) / elapsed, 1) if elapsed else 0.0,
+                "error_pct": round(100 * self.errors[endpoint] / len(lat), 2),
+                "miss_pct": round(100 * self.misses[endpoint] / len(lat), 2),
+                "p50_ms": round(percentile(lat, 50) * 1000, 2),
+                "p95_ms": round(percentile(lat, 95) * 1000, 2),
+                "p99_ms": round(percentile(lat, 99) * 1000, 2),
+                "max_ms": round(max(lat) * 1000, 2),
+            })
+        return out
+
+    def histogram(self) -> list[int]:
+        counts = [0] * (len(BUCKETS_MS) + 1)
+        for lat in self.latencies.values():
+            for s in lat:
+                ms = s * 1000
+                i = next((i for i, edge in enumerate(BUCKETS_MS) if ms <= edge), len(BUCKETS_MS))
+                counts[i] += 1
+        return counts
+
+
+class Station:
+    """로그인한 스캐너 한 대."""
+
+    def __init__(self, client: httpx.AsyncClient, index: int, rnd: random.Random):
+        self.client = client
+        self.username = f"loadtest-{index}"
+        self.rnd = rnd
+        self.headers = {}
+
+    async def login(self):
+        await self.client.post(
+            "/auth/register", json={"username": self.username, "password": PASSWORD, "display_name": self.username}
+        )
+        r = await self.client.post("/auth/login", json={"username": self.username, "password": PASSWORD})
+        r.raise_for_status()
+        self.headers = {"Authorization": f"Bearer {r.json()['token']}"}
+
+    async def upload(self, url: str, path: Path):
+        with open(path, "rb") as f:
+            r = await self.client.post(url, headers=self.headers, files={"file": (path.name, f.read())})
+        if r.status_code != 200:
+            raise RuntimeError(f"{self.username} {url} -> {r.status_code}: {r.text[:300]}")
+
+    async def call(self, rec: Recorder, endpoint: str, payload: dict) -> dict | None:
+        t0 = time.perf_counter()
+        try:
+            r = await self.client.post(endpoint, headers=self.headers, json=payload)
+        except httpx.HTTPError:
+            rec.add(endpoint, time.perf_counter() - t0, error=True)
+            return None
+        seconds = time.perf_counter() - t0
+        if r.status_code >= 400:
+            rec.add(endpoint, seconds, error=True)
+            return None
+        body = r.json()
+        miss = body.get("ok") is False or body.get("result") in ("NOT_FOUND", "FALSE")
+        rec.add(endpoint, seconds, miss=miss)
+        return body
+
+    # ---------- 작업 흐름: 송장 한 건 처리 ----------
+    async def barcode(self, rec: Recorder, values: dict, pause):
+        body = await self.call(rec, "/barcode/scan/invoice", {"invoice": self.rnd.choice(values["barcode"])})
+        for code in _remaining_codes(body):
+            await pause()
+            await self.call(rec, "/barcode/scan/item", {"code": code})
+
+    async def amood(self, rec: Recorder, values: dict, pause):
+        body = await self.call(rec, "/amood/scan/invoice", {"invoice": self.rnd.choice(values["amood"])})
+        for code in _remaining_codes(body):
+            await pause()
+            await self.call(rec, "/amood/scan/item", {"code": code})
+
+    async def returns(self, rec: Recorder, values: dict, pause):
+        await self.call(rec, "/returns/scan", {"barcode": self.rnd.choice(values["returns"])})
+
+
+def _remaining_codes(body: dict | None) -> list[str]:
+    # 응답의 상품 목록을 보고 남은 수량만큼 상품 바코드를 찍는다
+    if not body or body.get("result") != "SET":
+        return []
+    return [it["code"] for it in body.get("items") or [] for _ in range(int(it.get("remain") or 0)) if it.get("code")]
+
+
+async def prepare(client: httpx.AsyncClient, count: int, mix: list[str], inputs: dict[str, Path], seed: int):
+    stations = [Station(client, i, random.Random(seed + i)) for i in range(count)]
+    for st in stations:
+        await st.login()
+    if "barcode" in mix:
+        await stations[0].upload("/barcode/upload", inputs["order_export"])
+    for st in stations:
+        if "amood" in mix:
+            await st.upload("/amood/excel1", inputs["amood_excel1"])
+            await st.upload("/amood/excel2", inputs["amood_excel2"])
+            r = await st.client.post("/amood/preprocess", headers=st.headers)
+            r.raise_for_status()
+        if "returns" in mix:
+            await st.upload("/returns/excel1", inputs["returns_excel1"])
+            await st.upload("/returns/excel2", inputs["returns_excel2"])
+    return stations
+
+
+async def run_level(stations: list[Station], mix: list[str], values: dict, duration: float, rate: float) -> dict:
+    rec = Recorder()
+    deadline = time.perf_counter() + duration
+
+    async def station_loop(st: Station):
+        async def pause():
+            if rate > 0:
+                await asyncio.sleep(st.rnd.expovariate(rate))
+
+        while time.perf_counter() < deadline:
+            await getattr(st, st.rnd.choice(mix))(rec, values, pause)
+            await pause()
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(station_loop(st) for st in stations))
+    elapsed = time.perf_counter() - t0
+    return {"stations": len(stations), "elapsed_s": round(elapsed, 2), "endpoints": rec.rows(elapsed),
+            "histogram": rec.histogram()}
+
+
+def _print_level(level: dict):
+    print(f"\n== stations={level['stations']}  elapsed={level['elapsed_s']:.1f}s")
+    print(f"{'endpoint':<24}{'reqs':>7}{'req/s':>8}{'err%':>7}{'miss%':>7}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}")
+    for e in level["endpoints"]:
+        print(
+            f"{e['endpoint']:<24}{e['requests']:>7}{e['req_s']:>8.1f}{e['error_pct']:>7.1f}{e['miss_pct']:>7.1f}"
+            f"{e['p50_ms']:>8.1f}ms{e['p95_ms']:>8.1f}ms{e['p99_ms']:>8.1f}ms{e['max_ms']:>8.1f}ms"
+        )
+    labels = [f"<={b}" for b in BUCKETS_MS] + [f">{BUCKETS_MS[-1]}"]
+    print("hist(ms) " + "  ".join(f"{label}:{n}" for label, n in zip(labels, level["histogram"]) if n))
+
+
+async def amain(args) -> list[dict]:
+    mix = [w.strip() for w in args.mix.split(",") if w.strip()]
+    levels = [int(n) for n in args.stations.split(",") if n.strip()]
+    shapes = {"barcode": ["order_export"], "amood": ["amood_excel1", "amood_excel2"],
+              "returns": ["returns_excel1", "returns_excel2", "cost_base"]}
+    inputs = {s: generators.ensure(args.data_dir, s, args.rows) for w in mix for s in shapes[w]}
+    values = {
+        "barcode": generators.order_invoices(args.rows),
+        "amood": generators.amood_invoices(args.rows),
+        "returns": generators.returns_scan_codes(args.rows),
+    }
+
+    if args.url:
+        return await _run(args, mix, levels, inputs, values, None, args.url.rstrip("/"))
+    isolate_app_state(prefix="yusaek_load_", cost_base=inputs.get("cost_base"))
+    import main
+
+    # ASGITransport는 lifespan을 보내지 않으므로 DB 준비/저널 재생은 직접 돌린다
+    async with main.app.router.lifespan_context(main.app):
+        return await _run(args, mix, levels, inputs, values, httpx.ASGITransport(app=main.app), "http://loadtest")
+
+
+async def _run(args, mix, levels, inputs, values, transport, base_url) -> list[dict]:
+    async with httpx.AsyncClient(transport=transport, base_url=base_url, timeout=args.request_timeout) as client:
+        t0 = time.perf_counter()
+        stations = await prepare(client, max(levels), mix, inputs, args.seed)
+        print(f"setup: {len(stations)} station(s), {args.rows} rows, mix={','.join(mix)} "
+              f"({time.perf_counter() - t0:.1f}s)", flush=True)
+        results = []
+        for n in levels:
+            level = await run_level(stations[:n], mix, values, args.duration, args.rate)
+            _print_level(level)
+            results.append(level)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="스캔 스테이션 동시 접속 부하 테스트")
+    parser.add_argument("--stations", default="1,4,16", help="동시 스테이션 수 목록 (쉼표)")
+    parser.add_argument("--duration", type=float, default=20, help="단계마다 몇 초 돌릴지")
+    parser.add_argument("--rate", type=float, default=2, help="스테이션당 초당 스캔 수 (0이면 쉬지 않음)")
+    parser.add_argument("--mix", default=",".join(WORKFLOWS), help="작업 흐름 (쉼표): " + ", ".join(WORKFLOWS))
+    parser.add_argument("--rows", type=int, default=2000, help="생성할 주문서/반품/AMOOD 행 수")
+    parser.add_argument("--url", help="떠 있는 서버 주소. 없으면 같은 프로세스에서 실행")
+    parser.add_argument("--request-timeout", type=float, default=60)
+    parser.add_argument("--seed", type=int, default=generators.SEED)
+    parser.add_argument("--data-dir", type=Path, default=Path(tempfile.gettempdir()) / "yusaek_bench_data")
+    parser.add_argument("--json", type=Path, help="결과를 JSON으로 저장")
+    args = parser.parse_args(argv)
+
+    unknown = [w for w in args.mix.split(",") if w.strip() and w.strip() not in WORKFLOWS]
+    if unknown:
+        parser.error(f"unknown workflow: {', '.join(unknown)}")
+
+    results = asyncio.run(amain(args))
+    if args.json:
+        args.json.write_text(json.dumps({"args": {k: str(v) for k, v in vars(args).items()}, "levels": results},
+                                        ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
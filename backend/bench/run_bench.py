@@ -0,0 +1,242 @@
+# backend/bench/run_bench.py
+# 업로드/스캔 경로 벤치마크.
+#   cd backend && python bench/run_bench.py [--sizes 1000,10000,100000] [--cases orders,returns_scan] [--json out.json]
+#   - 입력은 bench/generators.py가 만든다 (같은 rows/seed면 같은 파일, --data-dir에 캐시).
+#   - 케이스마다 자식 프로세스를 새로 띄워서 잰다. 최대 RSS가 케이스별로 나오고, 앞 케이스의 캐시가 섞이지 않는다.
+#     자식은 임시 폴더의 app.db/스캔 저널/scratch를 쓰므로 backend/app.db는 건드리지 않는다.
+#   - 출력: 호출 수, 처리량(행/초 또는 요청/초), p50/p99 지연, 최대 RSS.
+#     준비 단계(업로드, 전처리)는 setup 열에 따로 적고 지연 통계에는 넣지 않는다.
+#   - 케이스가 --timeout(초)을 넘으면 자식을 끝내고 timeout으로 적는다.
+import argparse
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from bench import generators  # noqa: E402
+
+DEFAULT_SIZES = "1000,10000,100000"
+# 케이스 → (필요한 입력 모양, 처리량 단위)
+CASES = {
+    "orders": (("order_export",), "rows/s"),
+    "returns_scan": (("returns_excel1", "returns_excel2", "cost_base"), "req/s"),
+    "amood_scan": (("amood_excel1", "amood_excel2"), "req/s"),
+    "amood_preprocess": (("amood_excel1", "amood_excel2"), "rows/s"),
+    "amood_export": (("amood_excel1", "amood_excel2"), "rows/s"),
+    "easyadmin": (("easyadmin_products",), "rows/s"),
+}
+
+
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def peak_rss_mb() -> float | None:
+    try:
+        import resource
+    except ImportError:  # Windows
+        try:
+            import psutil
+
+            return psutil.Process().memory_info().peak_wset / 1024 / 1024
+        except Exception:
+            return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux는 KB, macOS는 바이트
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+# ---------- 자식 프로세스 ----------
+class _Client:
+    """TestClient + 로그인 토큰. 요청마다 지연을 잰다."""
+
+    def __init__(self, app):
+        from fastapi.testclient import TestClient
+
+        self.client = TestClient(app)
+        self.client.__enter__()
+        self.client.post("/auth/register", json={"username": "bench", "password": "bench-pw", "display_name": "bench"})
+        r = self.client.post("/auth/login", json={"username": "bench", "password": "bench-pw"})
+        r.raise_for_status()
+        self.headers = {"Authorization": f"Bearer {r.json()['token']}"}
+
+    def call(self, method: str, url: str, **kwargs):
+        r = self.client.request(method, url, headers=self.headers, **kwargs)
+        if r.status_code != 200:
+            raise RuntimeError(f"{method} {url} -> {r.status_code}: {r.text[:300]}")
+        return r
+
+    def upload(self, url: str, path: Path):
+        with open(path, "rb") as f:
+            return self.call("POST", url, files={"file": (path.name, f)})
+
+    def close(self):
+        self.client.__exit__(None, None, None)
+
+
+def _timed(func) -> float:
+    t0 = time.perf_counter()
+    func()
+    return time.perf_counter() - t0
+
+
+def isolate_app_state(prefix: str = "yusaek_bench_", cost_base: Path | None = None) -> Path:
+    """main을 import하기 전에 부른다. app.db/스캔 저널/scratch를 임시 폴더로 돌린다."""
+    work = Path(tempfile.mkdtemp(prefix=prefix))
+    os.environ.update({
+        "APP_DB_PATH": str(work / "app.db"),
+        "SCAN_JOURNAL_PATH": str(work / "scan_journal.db"),
+        "SCRATCH_DIR": str(work / "scratch"),
+        "SCRATCH_SWEEP_INTERVAL": "0",
+    })
+    if cost_base is not None:
+        os.environ["RETURN_COST_BASE_PATH"] = str(cost_base)
+    os.chdir(BACKEND_DIR)
+    return work
+
+
+def _child(case: str, rows: int, inputs: dict[str, Path], repeat: int, scans: int) -> dict:
+    isolate_app_state(cost_base=inputs.get("cost_base"))
+
+    import main
+
+    latencies: list[float] = []
+    setup = 0.0
+    units = rows
+    if case == "orders":
+        from barcode_core import process_and_load_any
+
+        for _ in range(repeat):
+            latencies.append(_timed(lambda: process_and_load_any(inputs["order_export"])))
+        return {"latencies": latencies, "units": units, "setup": setup}
+
+    client = _Client(main.app)
+    try:
+        if case == "returns_scan":
+            setup += _timed(lambda: client.upload("/returns/excel1", inputs["returns_excel1"]))
+            setup += _timed(lambda: client.upload("/returns/excel2", inputs["returns_excel2"]))
+            codes = generators.returns_scan_codes(rows)
+            step = max(1, len(codes) // scans)
+            for code in codes[::step][:scans]:
+                latencies.append(_timed(lambda: client.call("POST", "/returns/scan", json={"barcode": code})))
+            units = len(latencies)
+        elif case == "amood_scan":
+            setup += _timed(lambda: client.upload("/amood/excel1", inputs["amood_excel1"]))
+            setup += _timed(lambda: client.upload("/amood/excel2", inputs["amood_excel2"]))
+            setup += _timed(lambda: client.call("POST", "/amood/preprocess"))
+            invoices = generators.amood_invoices(rows)
+            step = max(1, len(invoices) // scans)
+            for invoice in invoices[::step][:scans]:
+                latencies.append(_timed(lambda: client.call("POST", "/amood/scan/invoice", json={"invoice": invoice})))
+            units = len(latencies)
+        elif case in ("amood_preprocess", "amood_export"):
+            setup += _timed(lambda: client.upload("/amood/excel1", inputs["amood_excel1"]))
+            setup += _timed(lambda: client.upload("/amood/excel2", inputs["amood_excel2"]))
+            url = "/amood/preprocess" if case == "amood_preprocess" else "/amood/export-shipping"
+            if case == "amood_export":
+                setup += _timed(lambda: client.call("POST", "/amood/preprocess"))
+            for _ in range(repeat):
+                latencies.append(_timed(lambda: client.call("POST", url)))
+        elif case == "easyadmin":
+            for _ in range(repeat):
+                latencies.append(_timed(lambda: client.upload("/barcode/product/upload", inputs["easyadmin_products"])))
+        else:
+            raise ValueError(case)
+    finally:
+        client.close()
+    return {"latencies": latencies, "units": units, "setup": setup}
+
+
+# ---------- 부모 ----------
+def _run_case(case: str, rows: int, args) -> dict:
+    shapes, unit = CASES[case]
+    inputs = {shape: str(generators.ensure(args.data_dir, shape, rows)) for shape in shapes}
+    cmd = [
+        sys.executable, str(Path(__file__).resolve()), "--child", case, "--rows", str(rows),
+        "--repeat", str(args.repeat), "--scans", str(args.scans), "--inputs", json.dumps(inputs),
+    ]
+    try:
+        proc = subprocess.run(cmd, capture_output=True, text=True, cwd=BACKEND_DIR, timeout=args.timeout or None)
+    except subprocess.TimeoutExpired:
+        return {"case": case, "rows": rows, "unit": unit, "timeout": args.timeout}
+    lines = [line for line in proc.stdout.splitlines() if line.startswith("BENCH ")]
+    if proc.returncode != 0 or not lines:
+        raise RuntimeError(f"{case} rows={rows} failed:\n{proc.stderr[-2000:]}")
+    result = json.loads(lines[-1][len("BENCH "):])
+    latencies = result["latencies"]
+    # 행 단위 케이스는 호출 한 번에 rows행을 처리하므로 p50 기준 행/초, 요청 케이스는 전체 요청/초
+    if unit == "rows/s":
+        throughput = rows / percentile(latencies, 50) if latencies else 0.0
+    else:
+        throughput = len(latencies) / sum(latencies) if latencies else 0.0
+    return {
+        "case": case,
+        "rows": rows,
+        "calls": len(latencies),
+        "setup_s": round(result["setup"], 3),
+        "throughput": round(throughput, 1),
+        "unit": unit,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "peak_rss_mb": round(result["peak_rss_mb"], 1) if result.get("peak_rss_mb") else None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="업로드/스캔 경로 벤치마크")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="행 수 목록 (쉼표)")
+    parser.add_argument("--cases", default=",".join(CASES), help="케이스 목록 (쉼표): " + ", ".join(CASES))
+    parser.add_argument("--repeat", type=int, default=3, help="파일 단위 케이스 반복 횟수")
+    parser.add_argument("--scans", type=int, default=200, help="스캔 케이스 요청 수")
+    parser.add_argument("--data-dir", type=Path, default=Path(tempfile.gettempdir()) / "yusaek_bench_data")
+    parser.add_argument("--timeout", type=float, default=600, help="케이스 하나의 최대 시간(초). 넘으면 timeout으로 적고 넘어간다")
+    parser.add_argument("--json", type=Path, help="결과를 JSON으로 저장 (커밋 간 비교용)")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--rows", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--inputs", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        inputs = {k: Path(v) for k, v in json.loads(args.inputs).items()}
+        result = _child(args.child, args.rows, inputs, args.repeat, args.scans)
+        result["peak_rss_mb"] = peak_rss_mb()
+        print("BENCH " + json.dumps(result))
+        return
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    cases = [c.strip() for c in args.cases.split(",") if c.strip()]
+    unknown = [c for c in cases if c not in CASES]
+    if unknown:
+        parser.error(f"unknown case: {', '.join(unknown)}")
+
+    print(f"{'case':<18}{'rows':>8}{'calls':>7}{'setup':>9}{'throughput':>18}{'p50':>11}{'p99':>11}{'peak RSS':>11}")
+    results = []
+    for rows in sizes:
+        for case in cases:
+            r = _run_case(case, rows, args)
+            results.append(r)
+            if "timeout" in r:
+                print(f"{case:<18}{rows:>8}  timeout after {r['timeout']:.0f}s", flush=True)
+                continue
+            rss = f"{r['peak_rss_mb']:.0f}MB" if r["peak_rss_mb"] is not None else "-"
+            print(
+                f"{case:<18}{rows:>8}{r['calls']:>7}{r['setup_s']:>8.2f}s{r['throughput']:>12.1f} {r['unit']:<5}"
+                f"{r['p50_ms']:>9.1f}ms{r['p99_ms']:>9.1f}ms{rss:>11}",
+                flush=True,
+            )
+    if args.json:
+        args.json.write_text(json.dumps({"sizes": sizes, "results": results}, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# backend/blobs.py
+# 내용 주소(sha256) 기반 파일 저장소. 공유 파일/요청 첨부가 같이 쓴다.
+#   - 경로: <root>/<sha[:2]>/<sha[2:4]>/<sha>. 같은 내용은 한 번만 저장한다.
+#   - app.db의 blobs 테이블에 참조 수를 두고, 0이 되면 행과 파일을 같이 지운다.
+#   - put/release는 호출한 쪽 트랜잭션 안에서 DB를 먼저 바꾼다(쓰기 잠금). 커밋은 호출한 쪽.
+#     put은 잠금을 잡은 채로 파일을 옮긴다. release는 행만 지우고, 파일은 커밋한 뒤 discard_unreferenced로 지운다
+#     (롤백되면 행이 되살아나므로 파일도 남아 있어야 한다).
+import os
+import shutil
+import sqlite3
+from datetime import datetime, timezone
+from pathlib import Path
+
+
+class BlobStore:
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        # 업로드를 먼저 받는 곳. blob과 같은 파일시스템이라 os.replace로 옮길 수 있다.
+        self.staging_dir = self.root / "tmp"
+
+    def path_for(self, sha256: str) -> Path:
+        return self.root / sha256[:2] / sha256[2:4] / sha256
+
+    def put(self, conn: sqlite3.Connection, staged_path: Path, sha256: str, size: int) -> bool:
+        """staged_path의 파일을 blob으로 넣고 참조를 하나 늘린다. 새로 파일을 만들었으면 True.
+        이미 같은 내용이 있으면 staged_path만 지운다."""
+        conn.execute(
+            """
+            INSERT INTO blobs (sha256, size, refcount, created_at) VALUES (?, ?, 1, ?)
+            ON CONFLICT(sha256) DO UPDATE SET refcount = refcount + 1
+            """,
+            (sha256, size, datetime.now(timezone.utc).isoformat()),
+        )
+        target = self.path_for(sha256)
+        if target.exists():
+            staged_path.unlink(missing_ok=True)
+            return False
+        target.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.replace(staged_path, target)
+        except OSError:
+            shutil.move(str(staged_path), str(target))
+        return True
+
+    def release(self, conn: sqlite3.Connection, sha256: str) -> bool:
+        """참조를 하나 줄이고, 0이 되면 행을 지운다. 지웠으면 True (파일은 커밋한 뒤 discard_unreferenced로)."""
+        conn.execute("UPDATE blobs SET refcount = refcount - 1 WHERE sha256 = ?", (sha256,))
+        row = conn.execute("SELECT refcount FROM blobs WHERE sha256 = ?", (sha256,)).fetchone()
+        if row is None or row[0] > 0:
+            return False
+        conn.execute("DELETE FROM blobs WHERE sha256 = ?", (sha256,))
+        return True
+
+    def discard_unreferenced(self, conn: sqlite3.Connection, shas: list[str]) -> list[str]:
+        """release가 행을 지운 blob의 파일을 지운다. 호출한 쪽이 커밋한 뒤에 부른다.
+        그 사이 같은 내용이 다시 put됐으면(행이 있으면) 남긴다. 실제로 지운 해시 목록을 돌려준다."""
+        if not shas:
+            return []
+        discarded = []
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for sha256 in dict.fromkeys(shas):
+                if conn.execute("SELECT 1 FROM blobs WHERE sha256 = ?", (sha256,)).fetchone() is None:
+                    self.discard(sha256)
+                    discarded.append(sha256)
+        finally:
+            conn.commit()
+        return discarded
+
+    def discard(self, sha256: str):
+        """blob 파일과 옆에 만든 파생 파일(<sha>.*, 축소본 등)을 지운다. put을 롤백할 때도 쓴다."""
+        path = self.path_for(sha256)
+        for p in [path, *path.parent.glob(f"{sha256}.*")]:
+            try:
+                p.unlink(missing_ok=True)
+            except OSError:
+                pass
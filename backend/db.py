@@ -0,0 +1,150 @@
+# backend/db.py
+# app.db 커넥션 풀.
+#   - 커넥션은 WAL 모드로 열어서 쓰기 중에도 읽기가 막히지 않게 한다.
+#   - conn.close()는 실제로 닫지 않고 풀에 반납한다 (기존 `conn = _get_db() ... conn.close()` 코드 그대로 사용).
+#   - 요청 단위 범위를 열어 두면(bind) 그 요청 안의 _get_db() 호출은 같은 커넥션을 재사용한다.
+#     커넥션은 처음 _get_db()를 부를 때 빌리므로 DB를 안 쓰는 요청(SSE 스트림 등)은 커넥션을 잡지 않는다.
+#   - on_query(sql, 초)를 주면 conn.execute/executemany/executescript마다 걸린 시간을 넘긴다 (계측용).
+import contextvars
+import queue
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+BUSY_TIMEOUT_MS = 5000
+CACHE_SIZE_KIB = 8 * 1024
+MMAP_SIZE = 64 * 1024 * 1024
+
+class RequestScope:
+    __slots__ = ("conn",)
+
+    def __init__(self):
+        self.conn: "PooledConnection | None" = None
+
+
+_REQUEST_SCOPE: contextvars.ContextVar[RequestScope | None] = contextvars.ContextVar(
+    "request_db_scope", default=None
+)
+
+
+class PooledConnection(sqlite3.Connection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._pool: "ConnectionPool | None" = None
+        self._refs = 0
+        self._on_query = None
+
+    def _timed(self, method, sql, *args):
+        if self._on_query is None:
+            return method(sql, *args)
+        t0 = time.perf_counter()
+        try:
+            return method(sql, *args)
+        finally:
+            self._on_query(sql, time.perf_counter() - t0)
+
+    def execute(self, sql, *args):
+        return self._timed(super().execute, sql, *args)
+
+    def executemany(self, sql, *args):
+        return self._timed(super().executemany, sql, *args)
+
+    def executescript(self, sql):
+        return self._timed(super().executescript, sql)
+
+    def close(self):
+        pool = self._pool
+        if pool is None:
+            super().close()
+            return
+        self._refs -= 1
+        pool._release(self)
+
+    def _close_for_real(self):
+        self._pool = None
+        super().close()
+
+
+class ConnectionPool:
+    def __init__(self, path: Path, size: int = 8, on_query=None):
+        self.path = Path(path)
+        self.size = max(1, size)
+        self.on_query = on_query
+        self._idle: queue.LifoQueue[PooledConnection] = queue.LifoQueue(maxsize=self.size)
+        self._wal_lock = threading.Lock()
+        self._wal_ready = False
+
+    def _connect(self) -> PooledConnection:
+        conn = sqlite3.connect(
+            self.path,
+            timeout=BUSY_TIMEOUT_MS / 1000,
+            check_same_thread=False,
+            factory=PooledConnection,
+        )
+        conn.row_factory = sqlite3.Row
+        if not self._wal_ready:
+            # journal_mode는 DB 파일에 저장되므로 처음 한 번만 바꾸면 된다
+            with self._wal_lock:
+                if not self._wal_ready:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    self._wal_ready = True
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        conn.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KIB}")
+        conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn._pool = self
+        conn._on_query = self.on_query
+        return conn
+
+    def _checkout(self) -> PooledConnection:
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        conn._refs = 1
+        return conn
+
+    def acquire(self) -> PooledConnection:
+        scope = _REQUEST_SCOPE.get()
+        if scope is None:
+            return self._checkout()
+        if scope.conn is None:
+            # 범위가 참조 하나를 들고 있어서 요청이 끝날 때까지 반납되지 않는다
+            scope.conn = self._checkout()
+        scope.conn._refs += 1
+        return scope.conn
+
+    def _release(self, conn: PooledConnection):
+        if conn._refs > 0:
+            return
+        try:
+            if conn.in_transaction:
+                # 커밋하지 않고 반납된 변경은 기존 close()와 마찬가지로 버린다
+                conn.rollback()
+            self._idle.put_nowait(conn)
+        except (queue.Full, sqlite3.Error):
+            conn._close_for_real()
+
+    def bind(self) -> RequestScope:
+        """현재 요청(컨텍스트)에 커넥션 범위를 연다."""
+        scope = RequestScope()
+        _REQUEST_SCOPE.set(scope)
+        return scope
+
+    def unbind(self, scope: RequestScope):
+        if _REQUEST_SCOPE.get() is scope:
+            _REQUEST_SCOPE.set(None)
+        conn, scope.conn = scope.conn, None
+        if conn is not None:
+            conn._refs -= 1
+            self._release(conn)
+
+    def close_all(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn._close_for_real()
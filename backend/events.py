@@ -0,0 +1,67 @@
+# backend/events.py
+# 프로세스 내 pub/sub.
+#   - 요청/스캔 상태가 바뀌면 작은 이벤트(종류 + id 정도)만 발행하고, 클라이언트는 받은 뒤 필요한 목록만 다시 읽는다.
+#   - publish는 동기 엔드포인트(스레드풀)에서도 불리므로 구독자 이벤트 루프로 call_soon_threadsafe로 넘긴다.
+#   - 구독자 큐가 넘치면 쌓인 이벤트를 버리고 resync 하나만 남긴다 (클라이언트는 전체를 다시 읽으면 된다).
+import asyncio
+import itertools
+import json
+import threading
+
+
+class Subscription:
+    def __init__(self, user: str, loop: asyncio.AbstractEventLoop, max_queue: int):
+        self.user = user
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+
+    def _offer(self, event: tuple):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait((event[0], "resync", {}))
+
+
+class EventBus:
+    def __init__(self, max_queue: int = 256):
+        self.max_queue = max_queue
+        self._subs: set[Subscription] = set()
+        self._lock = threading.Lock()
+        self._seq = itertools.count(1)
+
+    def subscribe(self, user: str) -> Subscription:
+        """이벤트 루프 안(async 엔드포인트)에서 호출한다."""
+        sub = Subscription(user, asyncio.get_running_loop(), self.max_queue)
+        with self._lock:
+            self._subs.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        with self._lock:
+            self._subs.discard(sub)
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subs)
+
+    def publish(self, event_type: str, data: dict | None = None, users=None):
+        """users가 None이면 모든 구독자, 아니면 해당 사용자들에게만 보낸다."""
+        with self._lock:
+            if not self._subs:
+                return
+            targets = [s for s in self._subs if users is None or s.user in users]
+        event = (next(self._seq), event_type, data or {})
+        for sub in targets:
+            try:
+                sub.loop.call_soon_threadsafe(sub._offer, event)
+            except RuntimeError:
+                # 루프가 이미 닫힌 구독자
+                self.unsubscribe(sub)
+
+
+def format_sse(event: tuple) -> str:
+    seq, event_type, data = event
+    payload = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    return f"id: {seq}\nevent: {event_type}\ndata: {payload}\n\n"
@@ -0,0 +1,34 @@
+# backend/lazy.py
+# 무거운 모듈을 처음 쓸 때 import한다 (워커 기동 시간 줄이기).
+#   - pd = lazy_module("pandas")처럼 모듈 자리에 두면 속성을 처음 꺼낼 때 진짜 모듈을 불러온다.
+#   - 함수 정의 시점에 평가되는 타입 힌트/기본값에서 꺼내면 그때 불러오므로, 힌트는 문자열("pd.DataFrame")로 쓴다.
+#   - 몇 군데서만 쓰는 모듈(openpyxl, xlwt, xlrd)은 이것 대신 함수 안에서 import한다.
+import importlib
+
+
+class LazyModule:
+    def __init__(self, name: str):
+        self.__dict__["_name"] = name
+        self.__dict__["_module"] = None
+
+    def _load(self):
+        module = self.__dict__["_module"]
+        if module is None:
+            # import 잠금이 있어서 여러 스레드가 동시에 불러도 한 번만 실행된다
+            module = importlib.import_module(self.__dict__["_name"])
+            self.__dict__["_module"] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self.__dict__["_module"] is not None else "not loaded"
+        return f"<lazy module {self.__dict__['_name']!r} ({state})>"
+
+
+def lazy_module(name: str) -> LazyModule:
+    return LazyModule(name)
@@ -1,35 +1,65 @@
 from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Body, Header, Depends, Response, Request
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pathlib import Path
+import asyncio
 import tempfile
 import uuid
 import traceback
 import os
 import sqlite3
+import hashlib
+import hmac
 import io
+import itertools
+import json
 import re
 import shutil
 import mimetypes
+import time
 import urllib.parse
 from collections import Counter
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta, timezone
 
 from barcode_core import process_and_load_any, normalize_to_yusas, load_excel_any
-
-import barcode_core
-import pandas as pd
-import xlwt
-import openpyxl
-from openpyxl.utils.cell import column_index_from_string
-
-from passlib.context import CryptContext
-from jose import jwt, JWTError
-from api.amood_hapbae import router as amood_hapbae_router
-
-print("### barcode_core file =", barcode_core.__file__)
-
-app = FastAPI()
+import readers
+import text_norm
+import metrics
+import passwords
+from profiler import Profiler, ProfiledRoute, ProfilerMiddleware, PROFILER_INTERVAL_MS
+from state_store import create_state_store
+from db import ConnectionPool
+from schema import apply_pending as apply_migrations
+from events import EventBus, format_sse
+from uploads import UPLOAD_MAX_BYTES, ingest_upload, ingest_upload_sync, save_upload_sync
+from scratch import ScratchSpace
+from blobs import BlobStore
+import thumbnails
+from previews import PreviewCache
+
+from lazy import lazy_module
+from sheets import column_index
+
+from api.amood_hapbae import router as amood_hapbae_router, upload_target as amood_hapbae_upload_target
+
+# pandas/jose는 처음 쓸 때 불러온다. openpyxl/xlwt/passlib은 쓰는 함수 안에서 import한다.
+pd = lazy_module("pandas")
+jwt = lazy_module("jose.jwt")
+
+
+@asynccontextmanager
+async def _lifespan(app: FastAPI):
+    # import 시점이 아니라 워커가 뜰 때 한 번: DB 준비, 스캔 저널 재생, scratch 청소 스레드
+    _bootstrap()
+    yield
+    SCRATCH.stop_sweeper()
+    HASH_POOL.shutdown()
+
+
+app = FastAPI(lifespan=_lifespan)
+# 동기 엔드포인트가 도는 스레드를 프로파일러가 알 수 있게 감싼다
+app.router.route_class = ProfiledRoute
 
 app.add_middleware(
     CORSMiddleware,
@@ -38,6 +68,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# 라우트별 요청 수/지연/크기 → GET /metrics
+app.add_middleware(metrics.MetricsMiddleware)
 
 STATE = {
     "loaded": False,
@@ -53,9 +85,17 @@ STATE = {
     "defect_counts": None,
     "incoming_counts": None,
 }
+_BARCODE_INITIAL_STATE = dict(STATE)
 
 UPLOAD_BASE = Path(__file__).resolve().parent / "uploads" / "requests"
 SHARED_UPLOAD_BASE = Path(__file__).resolve().parent / "uploads" / "shared_files"
+# 새 공유 파일/첨부는 내용 해시로 한 번만 저장한다 (예전 파일은 위 두 폴더에 그대로 남아 있다)
+BLOBS = BlobStore(Path(__file__).resolve().parent / "uploads" / "blobs")
+# 이미지 첨부 축소본(WebP)을 원본 옆에 만드는 백그라운드 작업자 (Pillow가 없으면 원본을 그대로 보낸다)
+THUMBNAILS = thumbnails.ThumbnailWorker()
+# 공유 파일 미리보기(시트별 열 단위 캐시). 내용 해시(없으면 파일 id)로 구분한다.
+SHARED_PREVIEWS = PreviewCache(Path(__file__).resolve().parent / "uploads" / "previews")
+SHARED_PREVIEW_LIMIT_MAX = 1000
 ALLOWED_REQUEST_EXTS = {
     ".xlsx",
     ".xls",
@@ -76,6 +116,23 @@ RETURN_COST_BASE_PATH = Path(
 RETURN_STATES: dict[str, "ReturnState"] = {}
 AMOOD_STATES: dict[str, "AmoodState"] = {}
 RETURN_COST_BASE_CACHE: dict[str, object] = {"df": None, "mtime": None, "path": None}
+# 빈 문자열로 설정하면 스캔 저널을 끈다 (memory 백엔드에서만 가능)
+SCAN_JOURNAL_PATH = os.environ.get("SCAN_JOURNAL_PATH", str(Path(__file__).with_name("scan_journal.db")))
+# memory: 단일 워커 / sqlite: 여러 uvicorn 워커가 SCAN_JOURNAL_PATH를 공유
+STATE_STORE_BACKEND = os.environ.get("STATE_STORE_BACKEND", "memory")
+
+# /events(SSE) 구독자에게 상태 변경을 알리는 프로세스 내 버스
+EVENT_BUS = EventBus()
+SSE_HEARTBEAT_SECONDS = float(os.environ.get("SSE_HEARTBEAT_SECONDS", "15"))
+
+# 업로드/가공 임시 파일은 사용자별 scratch 폴더에 둔다 (시스템 임시 폴더에 쌓이지 않도록)
+SCRATCH = ScratchSpace(
+    Path(os.environ.get("SCRATCH_DIR") or Path(tempfile.gettempdir()) / "yusaek_scratch"),
+    session_quota=int(os.environ.get("SCRATCH_SESSION_QUOTA_BYTES", str(500 * 1024 * 1024))),
+    max_bytes=int(os.environ.get("SCRATCH_MAX_BYTES", str(5 * 1024 * 1024 * 1024))),
+    max_age=float(os.environ.get("SCRATCH_MAX_AGE_SECONDS", str(24 * 3600))),
+)
+SCRATCH_SWEEP_INTERVAL = float(os.environ.get("SCRATCH_SWEEP_INTERVAL", "600"))
 
 # ---------- EasyAdmin product upload helpers ----------
 HEADER_LIST = [
@@ -156,7 +213,9 @@ def _pos0(col: str) -> int:
     return _col_to_num(col) - 1
 
 
-def _save_as_xls_bytes(df: pd.DataFrame) -> bytes:
+def _save_as_xls_bytes(df: "pd.DataFrame") -> bytes:
+    import xlwt
+
     book = xlwt.Workbook()
     sheet = book.add_sheet("Sheet1")
     for j, col in enumerate(df.columns):
@@ -175,9 +234,9 @@ def _save_as_xls_bytes(df: pd.DataFrame) -> bytes:
 def _process_easyadmin_product_upload(path: Path) -> bytes:
     ext = path.suffix.lower()
     if ext == ".xlsx":
-        df = pd.read_excel(path, engine="openpyxl")
+        df = readers.read_frame(path, "easyadmin", engine="openpyxl")
     elif ext == ".xls":
-        df = pd.read_excel(path)
+        df = readers.read_frame(path, "easyadmin")
     elif ext == ".csv":
         try:
             df = pd.read_csv(path, encoding="utf-8")
@@ -214,13 +273,13 @@ def _process_easyadmin_product_upload(path: Path) -> bytes:
 
 
 # ---------- Return (반품) helpers ----------
-def _read_return_excel(path: Path) -> pd.DataFrame:
+def _read_return_excel(path: Path) -> "pd.DataFrame":
     ext = path.suffix.lower()
     if ext in (".xlsx", ".xlsm"):
-        return pd.read_excel(path, dtype=str, engine="openpyxl")
+        return readers.read_frame(path, "returns", dtype=str, engine="openpyxl")
     if ext == ".xls":
         try:
-            return pd.read_excel(path, dtype=str, engine="xlrd")
+            return readers.read_frame(path, "returns", dtype=str, engine="xlrd")
         except Exception:
             return pd.read_excel(path, dtype=str)
     # 확장자가 없거나 판별 실패 시: openpyxl -> xlrd 순으로 시도
@@ -233,13 +292,13 @@ def _read_return_excel(path: Path) -> pd.DataFrame:
             raise ValueError(f"지원 형식: xlsx, xls, xlsm (읽기 실패: {e})")
 
 
-def _read_return_excel_with_header(path: Path, header):
+def _read_return_excel_with_header(path: Path, header, endpoint: str = "returns"):
     ext = path.suffix.lower()
     if ext in (".xlsx", ".xlsm"):
-        return pd.read_excel(path, dtype=str, engine="openpyxl", header=header)
+        return readers.read_frame(path, endpoint, dtype=str, engine="openpyxl", header=header)
     if ext == ".xls":
         try:
-            return pd.read_excel(path, dtype=str, engine="xlrd", header=header)
+            return readers.read_frame(path, endpoint, dtype=str, engine="xlrd", header=header)
         except Exception:
             return pd.read_excel(path, dtype=str, header=header)
     try:
@@ -260,11 +319,7 @@ def _clean_invoice(value: str) -> str:
 def _clean_product_name(text: str) -> str:
     if text is None:
         return ""
-    s = str(text)
-    s = re.sub(r"\[[^\]]*\]", " ", s)
-    s = re.sub(r"\([^)]*\)", " ", s)
-    s = re.sub(r"\s+", " ", s).strip()
-    return s
+    return text_norm.clean_product_name(str(text))
 
 
 def _option_slash_to_space(opt: str) -> str:
@@ -314,11 +369,7 @@ def _clean_qty(x) -> str:
 def _lowercase_size_words(text: str) -> str:
     if text is None:
         return ""
-    s = str(text)
-    size_words = ["FREE", "XS", "S", "M", "L", "XL", "XXL", "XXXL", "SHORT", "LONG"]
-    for w in size_words:
-        s = re.sub(rf"\b{w}\b", w.lower(), s, flags=re.IGNORECASE)
-    return s
+    return text_norm.lowercase_size_words(str(text))
 
 
 class ReturnState:
@@ -357,6 +408,8 @@ class AmoodState:
         self.waiting_for_items: bool = False
         self.completed_mgmt_numbers: set[str] = set()
         self.incoming_counts: dict[str, int] = {}
+        # 스캔으로 줄어든 excel2 K열 수량 (재로드/재시작 후 다시 반영)
+        self.qty_overrides: dict[int, int] = {}
 
 
 def _get_return_state(user: str) -> ReturnState:
@@ -412,7 +465,7 @@ def _return_status(state: ReturnState) -> dict:
     }
 
 
-def _return_rows(df: pd.DataFrame) -> list[dict]:
+def _return_rows(df: "pd.DataFrame") -> list[dict]:
     if df is None or df.empty:
         return []
     rows = []
@@ -431,7 +484,7 @@ def _load_return_cost_base(state: ReturnState):
     path = state.cost_base_path
     if not path.exists():
         raise FileNotFoundError(f"원가베이스 파일을 찾지 못했습니다: {path}")
-    cost_df = pd.read_excel(path, dtype=str)
+    cost_df = readers.read_frame(path, "cost_base", dtype=str)
     if cost_df.shape[1] < 2:
         raise ValueError("원가베이스는 최소 A,B열이 필요합니다.")
     amap: dict[str, str] = {}
@@ -454,9 +507,9 @@ def _load_cost_base_df():
     cached_mtime = RETURN_COST_BASE_CACHE.get("mtime")
     if RETURN_COST_BASE_CACHE.get("df") is not None and cached_path == str(path) and cached_mtime == mtime:
         return RETURN_COST_BASE_CACHE["df"]
-    df = _read_return_excel_with_header(path, header=0)
+    df = _read_return_excel_with_header(path, header=0, endpoint="cost_base")
     if df.shape[0] == 0:
-        df_raw = _read_return_excel_with_header(path, header=None)
+        df_raw = _read_return_excel_with_header(path, header=None, endpoint="cost_base")
         if df_raw.shape[0] >= 2:
             new_cols = df_raw.iloc[0].fillna("").astype(str).tolist()
             df_raw = df_raw.iloc[1:].reset_index(drop=True)
@@ -468,7 +521,7 @@ def _load_cost_base_df():
     return df
 
 
-def _save_cost_base_df(df: pd.DataFrame):
+def _save_cost_base_df(df: "pd.DataFrame"):
     path = RETURN_COST_BASE_PATH
     path.parent.mkdir(parents=True, exist_ok=True)
     with pd.ExcelWriter(path, engine="openpyxl") as writer:
@@ -491,13 +544,6 @@ AMOOD_COL2_QTY = "K"
 AMOOD_COL2_BARCODE = "H"
 AMOOD_COL2_OUTPUT = "N"
 
-AMOOD_BRACKET_PATTERNS = [
-    r"\[[^\]]*\]",
-    r"\([^)]*\)",
-    r"\{[^}]*\}",
-]
-
-
 def _amood_norm_barcode(s: str | None) -> str:
     return re.sub(r"\s+", "", str(s or ""))
 
@@ -505,10 +551,7 @@ def _amood_norm_barcode(s: str | None) -> str:
 def _amood_strip_any_brackets(s: str | None) -> str:
     if s is None:
         return ""
-    text = str(s)
-    for pat in AMOOD_BRACKET_PATTERNS:
-        text = re.sub(pat, "", text)
-    return re.sub(r"\s+", " ", text).strip()
+    return text_norm.strip_brackets(str(s))
 
 
 def _amood_to_int_qty(v) -> int:
@@ -596,7 +639,7 @@ def _amood_collect_rows_by_value(ws, col_letter: str, value: str, start_row: int
 
 
 def _amood_fill_down_merged_column(ws, col_letter: str, start_row: int = 2):
-    col_idx = column_index_from_string(col_letter)
+    col_idx = column_index(col_letter)
     targets = []
     for merged in list(ws.merged_cells.ranges):
         if merged.min_col <= col_idx <= merged.max_col:
@@ -617,16 +660,30 @@ def _amood_fill_down_merged_column(ws, col_letter: str, start_row: int = 2):
             last = v
 
 
+def _amood_files(state: AmoodState) -> list[Path]:
+    return [p for p in (state.file1_path, state.file2_path, state.processed1_path, state.processed2_path) if p]
+
+
 def _amood_load_workbooks(state: AmoodState):
     if not state.file1_path or not state.file2_path:
         raise HTTPException(status_code=400, detail="excel1/excel2가 모두 필요합니다.")
+    # 다른 워커의 스위퍼는 pin을 모르므로 쓸 때마다 mtime을 갱신한다
+    SCRATCH.touch(_amood_files(state))
     if state.wb1 is None or state.ws1 is None:
+        import openpyxl
+
         state.wb1 = openpyxl.load_workbook(state.file1_path)
         if len(state.wb1.worksheets) < 2:
             raise HTTPException(status_code=400, detail="excel1에 두 번째 시트가 없습니다.")
         state.ws1 = state.wb1.worksheets[1]
-    if state.wb2 is None or state.ws2 is None:
+    if state.ws2 is None:
+        # xlsx가 아니면(HTML/CSV/BIFF) wb2 없이 RowSheet만 온다
         state.wb2, state.ws2 = load_excel_any(state.file2_path)
+        for row, remaining in state.qty_overrides.items():
+            try:
+                _amood_ws_cell(state.ws2, AMOOD_COL2_QTY, row).value = remaining
+            except Exception:
+                pass
 
 
 def _return_queue_payload(state: ReturnState) -> dict:
@@ -637,200 +694,455 @@ def _return_queue_payload(state: ReturnState) -> dict:
         "all": state.all_items,
     }
 
-DB_PATH = Path(__file__).with_name("app.db")
+
+# ---------- Scan journal ----------
+# 모든 스캔 상태 변경은 op 단위로 적용되고 저널에 남는다. 재시작 시(또는 다른 워커가) 같은 함수로 재생한다.
+_BARCODE_STATE_OPS = ("load", "invoice", "item", "defect_add", "defect_dec", "defect_remove")
+_RETURN_QUEUE_OPS = ("scan", "unmatched", "duplicate", "undo", "reset", "onebe", "onebe_edit")
+_AMOOD_ALL_OPS = ("excel1", "excel2", "preprocess", "incoming", "invoice", "item", "reset")
+
+# (workflow, op) -> 새 기록이 덮어써서 저널에서 지워도 되는 이전 op 목록
+_SCAN_JOURNAL_REPLACES: dict[tuple[str, str], tuple[str, ...]] = {
+    ("barcode", "load"): _BARCODE_STATE_OPS,
+    ("barcode", "incoming"): ("incoming",),
+    ("returns", "excel1"): ("excel1",),
+    ("returns", "excel2"): ("excel2",),
+    ("returns", "cost"): ("cost",),
+    ("returns", "reset"): _RETURN_QUEUE_OPS,
+    ("returns", "onebe"): ("onebe", "onebe_edit"),
+    ("amood", "excel1"): ("excel1", "preprocess"),
+    ("amood", "excel2"): ("excel2", "preprocess", "invoice", "item"),
+    ("amood", "preprocess"): ("preprocess",),
+    ("amood", "incoming"): ("incoming",),
+    ("amood", "reset"): _AMOOD_ALL_OPS,
+}
+
+
+def _apply_barcode_op(owner: str, op: str, payload: dict):
+    if op == "load":
+        STATE.update(
+            {
+                "loaded": True,
+                "processed_path": payload.get("processed_path"),
+                "mapping": payload["mapping"],
+                "details": payload["details"],
+                "runs": payload["runs"],
+                "invoice_order": payload["invoice_order"],
+                "invoice_seq": payload["invoice_seq"],
+                "code_o_text": payload["code_o_text"],
+                "current_invoice": None,
+                "last_scanned_code": None,
+                "defect_counts": {},
+            }
+        )
+    elif op == "incoming":
+        STATE["incoming_counts"] = payload["counts"]
+    elif op == "invoice":
+        STATE["current_invoice"] = payload["invoice"]
+        if payload.get("last_code"):
+            STATE["last_scanned_code"] = payload["last_code"]
+    elif op == "item":
+        codes = (STATE["mapping"] or {}).get(payload["invoice"])
+        code = payload["code"]
+        if codes is not None and codes.get(code, 0) > 0:
+            codes[code] -= 1
+        STATE["last_scanned_code"] = code
+    elif op in ("defect_add", "defect_dec", "defect_remove"):
+        code = payload["code"]
+        defect_counts = STATE.get("defect_counts") or {}
+        if op == "defect_add":
+            defect_counts[code] = defect_counts.get(code, 0) + 1
+        elif code in defect_counts:
+            defect_counts[code] = defect_counts[code] - 1 if op == "defect_dec" else 0
+            if defect_counts[code] <= 0:
+                del defect_counts[code]
+        STATE["defect_counts"] = defect_counts
+
+
+def _apply_return_op(owner: str, op: str, payload: dict):
+    state = _get_return_state(owner)
+    if op == "excel1":
+        mapping = payload["map"]
+        state.df1 = pd.DataFrame({"D_clean": list(mapping.keys()), "E_clean": list(mapping.values())})
+        state.map_d_to_e = mapping
+    elif op == "excel2":
+        state.df2 = pd.DataFrame(payload["rows"], columns=["ITEM_TEXT", "QTY", "REASON_TYPE"])
+        state.df2_index = payload["index"]
+    elif op == "scan":
+        state.last_added_ids = []
+        for item in payload["items"]:
+            if item["type"] == "판매자":
+                state.queue_seller.append(item)
+            elif item["type"] == "고객":
+                state.queue_customer.append(item)
+            else:
+                state.queue_unmatched.append(item)
+            state.all_items.append(item)
+            state.last_added_ids.append(item["id"])
+            state.next_id = max(state.next_id, item["id"] + 1)
+        state.last_type = payload["last_type"]
+        state.scanned_barcodes.add(payload["barcode"])
+    elif op == "unmatched":
+        item = payload["item"]
+        state.queue_unmatched.append(item)
+        state.next_id = max(state.next_id, item["id"] + 1)
+        state.last_type = "미매칭"
+    elif op == "duplicate":
+        state.last_type = "중복"
+    elif op == "undo":
+        remove_ids = set(state.last_added_ids)
+        state.queue_seller = [it for it in state.queue_seller if it.get("id") not in remove_ids]
+        state.queue_customer = [it for it in state.queue_customer if it.get("id") not in remove_ids]
+        state.queue_unmatched = [it for it in state.queue_unmatched if it.get("id") not in remove_ids]
+        state.all_items = [it for it in state.all_items if it.get("id") not in remove_ids]
+        state.last_added_ids = []
+        state.last_type = "-"
+    elif op == "reset":
+        state.queue_seller.clear()
+        state.queue_customer.clear()
+        state.queue_unmatched.clear()
+        state.all_items.clear()
+        state.last_added_ids.clear()
+        state.scanned_barcodes.clear()
+        state.customer_export_df = pd.DataFrame()
+        state.last_type = "-"
+    elif op == "cost":
+        state.cost_base_path = RETURN_COST_BASE_PATH
+        _load_return_cost_base(state)
+    elif op == "onebe":
+        state.customer_export_df = pd.DataFrame(payload["rows"], columns=payload["columns"])
+    elif op == "onebe_edit":
+        state.customer_export_df.at[payload["row_index"], payload["column"]] = payload["value"]
+
+
+def _existing_path(value: str | None) -> Path | None:
+    if not value:
+        return None
+    path = Path(value)
+    return path if path.exists() else None
+
+
+def _discard_scratch_file(path: Path | None, keep: Path | None = None):
+    if path is None or path == keep:
+        return
+    try:
+        path.unlink(missing_ok=True)
+    except Exception:
+        pass
+
+
+def _apply_amood_op(owner: str, op: str, payload: dict):
+    state = _get_amood_state(owner)
+    if op in ("excel1", "excel2"):
+        path = _existing_path(payload["path"])
+        # 다시 올리면 이전 원본/전처리 결과는 더 이상 쓰지 않는다
+        _discard_scratch_file(state.file1_path if op == "excel1" else state.file2_path, keep=path)
+        _discard_scratch_file(state.processed1_path)
+        _discard_scratch_file(state.processed2_path)
+        if op == "excel1":
+            state.file1_path = path
+            state.file1_name = payload["name"] if path else None
+            state.wb1 = None
+            state.ws1 = None
+        else:
+            state.file2_path = path
+            state.file2_name = payload["name"] if path else None
+            state.wb2 = None
+            state.ws2 = None
+            state.qty_overrides = {}
+        state.processed1_path = None
+        state.processed2_path = None
+        state.current_invoice = None
+        state.pending_items = []
+        state.waiting_for_items = False
+    elif op == "preprocess":
+        processed1 = _existing_path(payload["processed1"])
+        processed2 = _existing_path(payload["processed2"])
+        _discard_scratch_file(state.processed1_path, keep=processed1)
+        _discard_scratch_file(state.processed2_path, keep=processed2)
+        state.processed1_path = processed1
+        state.processed2_path = processed2
+    elif op == "incoming":
+        state.incoming_counts = payload["counts"]
+    elif op == "invoice":
+        state.current_invoice = payload["invoice"]
+        state.pending_items = payload["items"]
+        state.waiting_for_items = True
+    elif op == "item":
+        item = state.pending_items[payload["index"]]
+        item["remaining"] = payload["remaining"]
+        state.qty_overrides[item["row"]] = item["remaining"]
+        if state.ws2 is not None:
+            try:
+                _amood_ws_cell(state.ws2, AMOOD_COL2_QTY, item["row"]).value = item["remaining"]
+            except Exception:
+                pass
+        if all(it.get("remaining", 0) <= 0 for it in state.pending_items):
+            state.waiting_for_items = False
+    elif op == "reset":
+        _amood_reset_state(state)
+    # 상태가 가리키는 파일은 스위퍼가 지우지 않도록 (저널 재생 때도 여기를 지난다)
+    SCRATCH.pin(owner, _amood_files(state))
+
+
+# (workflow, owner)별 마지막 변경 번호. 다른 워커의 op를 따라잡을 때도 적용 함수를 거치므로 같이 올라간다.
+_SCAN_VERSIONS: dict[tuple[str, str], int] = {}
+_SCAN_VERSION_SEQ = itertools.count(1)
+
+
+def _versioned_applier(workflow: str, applier):
+    def apply(owner: str, op: str, payload: dict):
+        try:
+            applier(owner, op, payload)
+        finally:
+            _SCAN_VERSIONS[(workflow, owner or "")] = next(_SCAN_VERSION_SEQ)
+
+    return apply
+
+
+_SCAN_APPLIERS = {
+    "barcode": _versioned_applier("barcode", _apply_barcode_op),
+    "returns": _versioned_applier("returns", _apply_return_op),
+    "amood": _versioned_applier("amood", _apply_amood_op),
+}
+# 적용 중 실패했을 때 저널에서 다시 쌓기 전에 그 사용자 상태를 비운다
+_SCAN_RESETTERS = {
+    "barcode": lambda owner: STATE.update(_BARCODE_INITIAL_STATE),
+    "returns": lambda owner: RETURN_STATES.pop(owner, None),
+    "amood": lambda owner: AMOOD_STATES.pop(owner, None),
+}
+
+
+# _bootstrap()에서 만든다 (import만으로 저널 DB를 열거나 flush 스레드를 띄우지 않는다)
+STATE_STORE = None
+
+
+def _commit_scan_op(
+    workflow: str, owner: str, op: str | None = None, payload: dict | None = None, decide=None
+) -> tuple[str, dict] | None:
+    """op 하나를 적용하고 저널에 남긴다.
+
+    decide를 주면 저장소 잠금 안에서(다른 워커 op를 따라잡은 뒤) 불러서 (op, payload)를 정한다.
+    None을 돌려주면 아무것도 남기지 않고 None을 돌려준다. 현재 상태를 보고 결과가 갈리는 스캔은 이쪽으로 한다.
+    """
+    if decide is None:
+        decision = (op, payload or {})
+        decide = lambda: decision  # noqa: E731
+
+    def decide_with_replaces():
+        decided = decide()
+        if decided is None:
+            return None
+        return decided[0], decided[1], _SCAN_JOURNAL_REPLACES.get((workflow, decided[0]), ())
+
+    committed = STATE_STORE.commit_decided(workflow, owner, decide_with_replaces)
+    if committed is None:
+        return None
+    # 바코드 상태는 모든 사용자가 공유한다 (owner = "")
+    EVENT_BUS.publish("scan", {"workflow": workflow, "op": committed[0]}, users={owner} if owner else None)
+    return committed[0], committed[1]
+
+
+def _onebe_payload(df: "pd.DataFrame") -> dict:
+    return {"columns": [str(c) for c in df.columns], "rows": df.values.tolist()}
+
+
+DB_PATH = Path(os.environ.get("APP_DB_PATH") or Path(__file__).with_name("app.db"))
 JWT_SECRET = os.environ.get("JWT_SECRET", "dev-secret-change-me")
 JWT_ALG = "HS256"
-BOOT_ID = uuid.uuid4().hex
 TOKEN_EXPIRE_MINUTES = 60 * 24
+# 1이면 토큰에 role 클레임을 넣어 관리자 확인 시 DB 조회를 생략한다 (권한 변경은 재로그인 후 반영)
+TOKEN_ROLE_CLAIM = os.environ.get("TOKEN_ROLE_CLAIM", "0") == "1"
+
+
+# 비밀번호/PIN 해시는 전용 스레드풀에서 (passwords.py)
+HASH_POOL = passwords.HashPool()
+PIN_CACHE = passwords.PinCache()
+
 
-pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
+DB_POOL = ConnectionPool(DB_PATH, size=int(os.environ.get("DB_POOL_SIZE", "8")), on_query=metrics.observe_query)
 
 
 def _get_db():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    return DB_POOL.acquire()
 
 
-def _init_db():
-    conn = _get_db()
-    conn.execute(
-        """
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            password_hash TEXT NOT NULL,
-            display_name TEXT NOT NULL DEFAULT '',
-            role TEXT NOT NULL DEFAULT 'user',
-            created_at TEXT NOT NULL
-        )
-        """
-    )
-    conn.commit()
-    conn.close()
+async def _db():
+    # 요청마다 커넥션 하나를 잡아 두고, 그 안의 _get_db() 호출이 모두 같은 커넥션을 쓰게 한다
+    scope = DB_POOL.bind()
+    try:
+        yield scope
+    finally:
+        DB_POOL.unbind(scope)
 
 
-def _ensure_user_column(column: str, ddl: str):
-    conn = _get_db()
-    cols = [r["name"] for r in conn.execute("PRAGMA table_info(users)").fetchall()]
-    if column not in cols:
-        conn.execute(ddl)
-        conn.commit()
-    conn.close()
+app.router.dependencies.append(Depends(_db))
 
 
-_init_db()
-_ensure_user_column("display_name", "ALTER TABLE users ADD COLUMN display_name TEXT NOT NULL DEFAULT ''")
-_ensure_user_column("role", "ALTER TABLE users ADD COLUMN role TEXT NOT NULL DEFAULT 'user'")
+def _scratch_upload(session: str) -> dict:
+    """save_upload/ingest_upload에 넘길 저장 위치와 남은 quota."""
+    remaining = SCRATCH.remaining(session)
+    if remaining <= 0:
+        raise HTTPException(status_code=507, detail="임시 저장 공간이 가득 찼습니다. 초기화 후 다시 시도하세요.")
+    return {"directory": SCRATCH.session_dir(session), "max_bytes": min(remaining, UPLOAD_MAX_BYTES)}
 
 
-def _init_requests():
-    conn = _get_db()
+# ---------- ETag ----------
+# 상태/목록 GET은 버전으로 만든 ETag를 붙이고, If-None-Match가 같으면 본문을 만들지 않고 304로 끝낸다.
+#   - 스캔 상태: 프로세스 메모리 버전 + 프로세스 nonce (워커/재시작마다 달라서 잘못 일치할 일이 없다)
+#   - DB 목록: resource_versions 테이블 버전 (모든 워커가 공유)
+_ETAG_NONCE = uuid.uuid4().hex[:8]
+
+
+def _bump_resource_version(conn, name: str):
     conn.execute(
         """
-        CREATE TABLE IF NOT EXISTS requests (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            requester_username TEXT NOT NULL,
-            requester_display TEXT NOT NULL DEFAULT '',
-            assignee_username TEXT NOT NULL,
-            assignee_display TEXT NOT NULL DEFAULT '',
-            text TEXT NOT NULL,
-            status TEXT NOT NULL DEFAULT 'open',
-            created_at TEXT NOT NULL,
-            completed_at TEXT,
-            acknowledged_at TEXT
-        )
-        """
+        INSERT INTO resource_versions (name, version) VALUES (?, 1)
+        ON CONFLICT(name) DO UPDATE SET version = version + 1
+        """,
+        (name,),
     )
-    conn.commit()
-    conn.close()
 
 
-def _ensure_request_column(column: str, ddl: str):
+def _resource_etag(name: str, *extra) -> str:
     conn = _get_db()
-    cols = [r["name"] for r in conn.execute("PRAGMA table_info(requests)").fetchall()]
-    if column not in cols:
-        conn.execute(ddl)
-        conn.commit()
+    row = conn.execute("SELECT version FROM resource_versions WHERE name = ?", (name,)).fetchone()
     conn.close()
+    version = row["version"] if row else 0
+    tag = "-".join(str(x) for x in (name, TOKEN_EPOCH[:8], version, *extra))
+    return f'W/"{tag}"'
 
 
-_init_requests()
-_ensure_request_column(
-    "requester_display",
-    "ALTER TABLE requests ADD COLUMN requester_display TEXT NOT NULL DEFAULT ''",
-)
-_ensure_request_column(
-    "assignee_display",
-    "ALTER TABLE requests ADD COLUMN assignee_display TEXT NOT NULL DEFAULT ''",
-)
-_ensure_request_column(
-    "acknowledged_at",
-    "ALTER TABLE requests ADD COLUMN acknowledged_at TEXT",
-)
+def _scan_etag(workflow: str, owner: str, *extra) -> str:
+    version = _SCAN_VERSIONS.get((workflow, owner or ""), 0)
+    tag = "-".join(str(x) for x in (workflow, _ETAG_NONCE, version, *extra))
+    return f'W/"{tag}"'
 
 
-def _init_company_credentials():
-    conn = _get_db()
-    conn.execute(
-        """
-        CREATE TABLE IF NOT EXISTS company_credentials (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            label TEXT NOT NULL,
-            username TEXT,
-            password TEXT,
-            created_at TEXT NOT NULL,
-            updated_at TEXT
-        )
-        """
-    )
-    conn.commit()
-    conn.close()
+def _file_signature(path: Path) -> str:
+    try:
+        st = path.stat()
+    except OSError:
+        return "none"
+    return f"{st.st_mtime_ns:x}.{st.st_size:x}"
 
 
-_init_company_credentials()
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # 약한 비교: W/ 접두어는 무시한다
+    target = etag.removeprefix("W/")
+    return any(t.strip().removeprefix("W/") == target for t in header.split(","))
 
 
-def _init_app_settings():
-    conn = _get_db()
-    conn.execute(
-        """
-        CREATE TABLE IF NOT EXISTS app_settings (
-            key TEXT PRIMARY KEY,
-            value TEXT
-        )
-        """
-    )
-    conn.commit()
-    conn.close()
+def _conditional(request: Request, response: Response, etag: str) -> Response | None:
+    """일치하면 304 응답을 돌려주고, 아니면 응답에 ETag를 붙이고 None을 돌려준다."""
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
 
 
-_init_app_settings()
+def _serve_stored_file(
+    request: Request,
+    path: Path,
+    media_type: str,
+    filename: str,
+    sha256: str | None,
+    variant: str | None = None,
+):
+    """업로드 파일 다운로드 응답.
+    - ETag: 내용 해시(없으면 크기/수정시각)로 만든 강한 ETag. 축소본 등은 variant를 붙인다. If-None-Match가 같으면 304.
+    - Range/If-Range, Last-Modified, (서버가 지원하면) pathsend는 FileResponse가 처리한다.
+    - URL의 v가 내용 해시와 같으면 내용이 바뀔 수 없으므로 immutable로 오래 캐시한다.
+    """
+    try:
+        st = path.stat()
+    except OSError:
+        raise HTTPException(status_code=404, detail="file missing")
+    if sha256:
+        etag = f'"{sha256}.{variant}"' if variant else f'"{sha256}"'
+    else:
+        etag = f'"{st.st_mtime_ns:x}-{st.st_size:x}"'
+    if sha256 and request.query_params.get("v") == sha256:
+        cache_control = "private, max-age=31536000, immutable"
+    else:
+        cache_control = "private, no-cache"
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, media_type=media_type, filename=filename, stat_result=st, headers=headers)
 
 
-def _ensure_default_company_pin():
-    if not _get_setting("company_pin_hash"):
-        _set_setting("company_pin_hash", _hash_pin("0000"))
+def _file_url(base: str, sha256: str | None, **params) -> str:
+    if sha256:
+        params = {"v": sha256, **params}
+    return f"{base}?{urllib.parse.urlencode(params)}" if params else base
 
 
-def _init_request_attachments():
-    conn = _get_db()
+def _load_token_epoch(conn) -> str:
+    # 워커/재시작과 무관하게 같은 값을 써야 토큰이 모든 워커에서 유효하다.
+    # 전체 로그아웃이 필요하면 TOKEN_EPOCH를 바꾸거나 app_settings의 token_epoch를 지운다.
+    env_epoch = os.environ.get("TOKEN_EPOCH", "").strip()
+    if env_epoch:
+        return env_epoch
     conn.execute(
-        """
-        CREATE TABLE IF NOT EXISTS request_attachments (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            request_id INTEGER NOT NULL,
-            original_name TEXT NOT NULL,
-            stored_name TEXT NOT NULL,
-            mime_type TEXT NOT NULL,
-            size INTEGER NOT NULL,
-            created_at TEXT NOT NULL
-        )
-        """
+        "INSERT OR IGNORE INTO app_settings (key, value) VALUES ('token_epoch', ?)",
+        (uuid.uuid4().hex,),
     )
-    conn.commit()
-    conn.close()
+    row = conn.execute("SELECT value FROM app_settings WHERE key = 'token_epoch'").fetchone()
+    return row["value"]
 
 
-_init_request_attachments()
+# _bootstrap()에서 채운다
+TOKEN_EPOCH = ""
 
 
-def _init_shared_files():
-    conn = _get_db()
-    conn.execute(
-        """
-        CREATE TABLE IF NOT EXISTS shared_files (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            original_name TEXT NOT NULL,
-            stored_name TEXT NOT NULL,
-            mime_type TEXT NOT NULL,
-            size INTEGER NOT NULL,
-            uploader_username TEXT NOT NULL,
-            uploader_display TEXT NOT NULL DEFAULT '',
-            created_at TEXT NOT NULL
+def _ensure_default_company_pin(conn):
+    row = conn.execute("SELECT value FROM app_settings WHERE key = 'company_pin_hash'").fetchone()
+    if not row or not row["value"]:
+        conn.execute(
+            "INSERT INTO app_settings (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            ("company_pin_hash", passwords.hash_pin("0000")),
         )
-        """
-    )
-    conn.commit()
-    conn.close()
-
 
-_init_shared_files()
 
+# 사용자 표시 이름/권한 캐시. 변경 API에서 바로 무효화하고, 다른 워커의 변경은 TTL 안에 반영된다.
+USER_CACHE_TTL = float(os.environ.get("USER_CACHE_TTL", "30"))
+_USER_PROFILE_CACHE: dict[str, tuple[float, dict | None]] = {}
 
 
-def _get_user_display(username: str) -> str:
+def _get_user_profile(username: str) -> dict | None:
+    now = time.monotonic()
+    cached = _USER_PROFILE_CACHE.get(username)
+    if cached and cached[0] > now:
+        return cached[1]
     conn = _get_db()
-    row = conn.execute("SELECT display_name FROM users WHERE username = ?", (username,)).fetchone()
+    row = conn.execute("SELECT display_name, role FROM users WHERE username = ?", (username,)).fetchone()
     conn.close()
-    return row["display_name"] if row else ""
+    profile = None
+    if row:
+        profile = {"display_name": row["display_name"] or "", "role": row["role"] or "user"}
+    _USER_PROFILE_CACHE[username] = (now + USER_CACHE_TTL, profile)
+    return profile
+
+
+def _invalidate_user_profile(username: str):
+    _USER_PROFILE_CACHE.pop(username, None)
+
+
+def _get_user_display(username: str) -> str:
+    profile = _get_user_profile(username)
+    return profile["display_name"] if profile else ""
 
 
 def _get_user_role(username: str) -> str:
-    conn = _get_db()
-    row = conn.execute("SELECT role FROM users WHERE username = ?", (username,)).fetchone()
-    conn.close()
-    return row["role"] if row and row["role"] else "user"
+    profile = _get_user_profile(username)
+    return profile["role"] if profile else "user"
 
 
 def _is_admin(username: str) -> bool:
@@ -844,45 +1156,45 @@ def _count_admins() -> int:
     return int(row["cnt"]) if row else 0
 
 
-def _ensure_bootstrap_admin():
+def _ensure_bootstrap_admin(conn):
     username = (os.environ.get("BOOTSTRAP_ADMIN_USERNAME") or "ksh2932").strip()
     password = (os.environ.get("BOOTSTRAP_ADMIN_PASSWORD") or "").strip()
     display_name = (os.environ.get("BOOTSTRAP_ADMIN_DISPLAY_NAME") or "관리자").strip()
     if not password:
         return
-    conn = _get_db()
     row = conn.execute("SELECT username FROM users WHERE username = ?", (username,)).fetchone()
     if row:
         conn.execute("UPDATE users SET role = 'admin' WHERE username = ?", (username,))
-        conn.commit()
-        conn.close()
-        return
-    conn.execute(
-        "INSERT INTO users (username, password_hash, display_name, role, created_at) VALUES (?, ?, ?, ?, ?)",
-        (username, _hash_password(password), display_name, "admin", datetime.now(timezone.utc).isoformat()),
-    )
-    conn.commit()
-    conn.close()
+    else:
+        conn.execute(
+            "INSERT INTO users (username, password_hash, display_name, role, created_at) VALUES (?, ?, ?, ?, ?)",
+            (username, passwords.hash_password(password), display_name, "admin", datetime.now(timezone.utc).isoformat()),
+        )
+    _bump_resource_version(conn, "users")
 
 
+# limit을 주면 그만큼씩 페이지로 나눠 준다. 안 주면 예전처럼 전부 (대시보드가 그렇게 쓴다)
+REQUEST_PAGE_LIMIT_MAX = 500
 
+# 완료된 요청은 완료일이 오늘(UTC)인 것만 보여준다. completed_date가 없으면(파싱 불가 등) 보여준다.
+_VISIBLE_REQUEST_SQL = "(status != 'completed' OR completed_date IS NULL OR completed_date >= ?)"
 
-def _parse_iso_date(value: str | None):
-    if not value:
-        return None
-    try:
-        return datetime.fromisoformat(value).date()
-    except ValueError:
+
+def _today_utc() -> str:
+    return datetime.now(timezone.utc).date().isoformat()
+
+
+def _request_page_limit(limit: int | None) -> int | None:
+    if not limit or limit <= 0:
         return None
+    return min(limit, REQUEST_PAGE_LIMIT_MAX)
 
 
-def _is_visible_completed(completed_at: str | None) -> bool:
-    if not completed_at:
-        return True
-    completed_date = _parse_iso_date(completed_at)
-    if not completed_date:
-        return True
-    return completed_date >= datetime.now(timezone.utc).date()
+def _request_page_anchor(conn, before_id: int):
+    return conn.execute(
+        "SELECT id, status, completed_at, created_at FROM requests WHERE id = ?",
+        (before_id,),
+    ).fetchone()
 
 
 def _row_to_request(row) -> dict:
@@ -916,18 +1228,66 @@ def _get_request_attachments(request_ids: list[int]) -> dict[int, list[dict]]:
     conn.close()
     result: dict[int, list[dict]] = {}
     for row in rows:
+        base_url = f"/requests/{row['request_id']}/attachments/{row['id']}"
         item = {
             "id": row["id"],
             "filename": row["original_name"],
             "mime_type": row["mime_type"],
             "size": row["size"],
-            "url": f"/requests/{row['request_id']}/attachments/{row['id']}",
+            "url": _file_url(base_url, row["sha256"]),
             "is_image": _is_image_mime(row["mime_type"]),
         }
+        if item["is_image"]:
+            item["thumb_url"] = _file_url(base_url, row["sha256"], size="thumb")
+            item["preview_url"] = _file_url(base_url, row["sha256"], size="preview")
         result.setdefault(row["request_id"], []).append(item)
     return result
 
 
+def _stored_file_path(legacy_dir: Path, row) -> Path:
+    # stored_name이 내용 해시면 blob, 아니면 예전 방식(legacy_dir/uuid 이름)
+    if row["sha256"] and row["stored_name"] == row["sha256"]:
+        return BLOBS.path_for(row["sha256"])
+    return legacy_dir / row["stored_name"]
+
+
+def _release_stored_file(conn, legacy_dir: Path, row) -> str | Path | None:
+    """행을 지우는 트랜잭션 안에서 부른다. blob은 참조 수만 줄인다.
+    커밋한 뒤 _delete_released_files로 넘길 것(행을 지운 blob 해시, 또는 예전 파일 경로)을 돌려주고, 참조가 남았으면 None."""
+    if row["sha256"] and row["stored_name"] == row["sha256"]:
+        return row["sha256"] if BLOBS.release(conn, row["sha256"]) else None
+    return legacy_dir / row["stored_name"]
+
+
+def _delete_released_files(conn, released: list) -> int:
+    """커밋한 뒤에 부른다. 롤백되면 행이 남으므로 파일은 커밋 전에 지우지 않는다. 지운 개수를 돌려준다."""
+    removed = 0
+    for item in released:
+        if not isinstance(item, Path):
+            continue
+        for path in [item, *thumbnails.derived_files(item)]:
+            try:
+                path.unlink(missing_ok=True)
+            except Exception:
+                pass
+        removed += 1
+    removed += len(BLOBS.discard_unreferenced(conn, [item for item in released if isinstance(item, str)]))
+    return removed
+
+
+def _purge_request_attachments(conn, where_sql: str, params: tuple) -> list:
+    """DELETE FROM requests WHERE <where_sql> 직전에 불러서 해당 요청들의 첨부 행을 정리한다.
+    커밋한 뒤 _delete_released_files에 넘길 목록을 돌려준다."""
+    subquery = f"SELECT id FROM requests WHERE {where_sql}"
+    rows = conn.execute(
+        f"SELECT * FROM request_attachments WHERE request_id IN ({subquery})",
+        params,
+    ).fetchall()
+    released = [_release_stored_file(conn, UPLOAD_BASE / str(row["request_id"]), row) for row in rows]
+    conn.execute(f"DELETE FROM request_attachments WHERE request_id IN ({subquery})", params)
+    return [item for item in released if item is not None]
+
+
 def _get_current_user_optional(authorization: str | None, token: str | None):
     raw = None
     if authorization and authorization.startswith("Bearer "):
@@ -938,12 +1298,12 @@ def _get_current_user_optional(authorization: str | None, token: str | None):
         raise HTTPException(status_code=401, detail="Unauthorized")
     try:
         payload = jwt.decode(raw, JWT_SECRET, algorithms=[JWT_ALG])
-        if payload.get("boot_id") != BOOT_ID:
+        if payload.get("epoch") != TOKEN_EPOCH:
             raise HTTPException(status_code=401, detail="Unauthorized")
         username = payload.get("sub")
         if not username:
             raise HTTPException(status_code=401, detail="Unauthorized")
-    except JWTError:
+    except jwt.JWTError:
         raise HTTPException(status_code=401, detail="Unauthorized")
     return username
 
@@ -957,24 +1317,17 @@ def _row_to_shared_file(row) -> dict:
         "uploader_username": row["uploader_username"],
         "uploader_display": row["uploader_display"],
         "created_at": row["created_at"],
-        "url": f"/shared-files/{row['id']}",
+        "url": _file_url(f"/shared-files/{row['id']}", row["sha256"]),
     }
 
 
-def _hash_password(password: str) -> str:
-    return pwd_context.hash(password)
-
-
-def _verify_password(password: str, password_hash: str) -> bool:
-    return pwd_context.verify(password, password_hash)
-
-
-def _hash_pin(pin: str) -> str:
-    return pwd_context.hash(pin)
-
-
-def _verify_pin(pin: str, pin_hash: str) -> bool:
-    return pwd_context.verify(pin, pin_hash)
+async def _run_hash(func, *args):
+    try:
+        return await HASH_POOL.run(func, *args)
+    except passwords.HashPoolBusy:
+        raise HTTPException(
+            status_code=503, detail="요청이 많습니다. 잠시 후 다시 시도하세요.", headers={"Retry-After": "1"}
+        )
 
 
 def _get_setting(key: str) -> str | None:
@@ -997,9 +1350,6 @@ def _set_setting(key: str, value: str | None):
     conn.close()
 
 
-_ensure_default_company_pin()
-
-
 def _to_int(value, default=0):
     try:
         if value is None or (isinstance(value, str) and not value.strip()):
@@ -1009,33 +1359,45 @@ def _to_int(value, default=0):
         return default
 
 
-_ensure_bootstrap_admin()
-
-
-def _create_access_token(username: str) -> str:
+def _create_access_token(username: str, role: str | None = None) -> str:
     expire = datetime.now(timezone.utc) + timedelta(minutes=TOKEN_EXPIRE_MINUTES)
-    payload = {"sub": username, "exp": expire, "boot_id": BOOT_ID}
+    payload = {"sub": username, "exp": expire, "epoch": TOKEN_EPOCH}
+    if TOKEN_ROLE_CLAIM and role:
+        payload["role"] = role
     return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALG)
 
 
-def _get_current_user(authorization: str = Header(None)):
+def _get_token_payload(authorization: str = Header(None)) -> dict:
     if not authorization or not authorization.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Unauthorized")
     token = authorization.split(" ", 1)[1].strip()
     try:
         payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALG])
-        if payload.get("boot_id") != BOOT_ID:
+        if payload.get("epoch") != TOKEN_EPOCH:
             raise HTTPException(status_code=401, detail="Unauthorized")
-        username = payload.get("sub")
-        if not username:
+        if not payload.get("sub"):
             raise HTTPException(status_code=401, detail="Unauthorized")
-    except JWTError:
+    except jwt.JWTError:
         raise HTTPException(status_code=401, detail="Unauthorized")
-    return username
+    return payload
+
+
+def _get_current_user(payload: dict = Depends(_get_token_payload)):
+    return payload["sub"]
 
 
-def _require_admin(user: str = Depends(_get_current_user)):
-    if not _is_admin(user):
+def _get_scan_user(user: str = Depends(_get_current_user)):
+    # 공유 상태 저장소를 쓰면 다른 워커가 남긴 스캔 op를 먼저 반영한다
+    STATE_STORE.sync()
+    return user
+
+
+def _require_admin(payload: dict = Depends(_get_token_payload)):
+    user = payload["sub"]
+    # TOKEN_ROLE_CLAIM을 켜면 토큰의 role만 보고 DB를 조회하지 않는다
+    role = payload.get("role") if TOKEN_ROLE_CLAIM else None
+    is_admin = role == "admin" if role else _is_admin(user)
+    if not is_admin:
         raise HTTPException(status_code=403, detail="admin required")
     return user
 
@@ -1046,30 +1408,73 @@ app.include_router(
 )
 
 
+def _user_scratch_upload(user: str = Depends(_get_current_user)) -> dict:
+    return _scratch_upload(user)
+
+
+# 합배 업로드도 사용자 scratch에 받는다 (quota/청소 대상)
+app.dependency_overrides[amood_hapbae_upload_target] = _user_scratch_upload
+
+
 @app.get("/ping")
 def ping():
     return {"status": "ok"}
 
 
+@app.get("/events")
+async def event_stream(
+    request: Request,
+    authorization: str | None = Header(None),
+    token: str | None = None,
+):
+    # EventSource는 헤더를 못 붙이므로 ?token= 도 받는다
+    user = _get_current_user_optional(authorization, token)
+    sub = EVENT_BUS.subscribe(user)
+
+    async def stream():
+        try:
+            yield format_sse((0, "ready", {"username": user}))
+            while True:
+                if await request.is_disconnected():
+                    break
+                try:
+                    event = await asyncio.wait_for(sub.queue.get(), SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                yield format_sse(event)
+        finally:
+            EVENT_BUS.unsubscribe(sub)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.post("/auth/register")
-def register(payload: dict = Body(...)):
+async def register(payload: dict = Body(...)):
     username = (payload.get("username") or "").strip()
     password = (payload.get("password") or "").strip()
     display_name = (payload.get("display_name") or "").strip()
     if not username or not password or not display_name:
         raise HTTPException(status_code=400, detail="username/password/display_name required")
 
+    password_hash = await _run_hash(passwords.hash_password, password)
     conn = _get_db()
     try:
         conn.execute(
             "INSERT INTO users (username, password_hash, display_name, role, created_at) VALUES (?, ?, ?, ?, ?)",
-            (username, _hash_password(password), display_name, "user", datetime.now(timezone.utc).isoformat()),
+            (username, password_hash, display_name, "user", datetime.now(timezone.utc).isoformat()),
         )
+        _bump_resource_version(conn, "users")
         conn.commit()
     except sqlite3.IntegrityError:
         raise HTTPException(status_code=400, detail="username already exists")
     finally:
         conn.close()
+    _invalidate_user_profile(username)
 
     return {"ok": True}
 
@@ -1080,7 +1485,7 @@ def register_options():
 
 
 @app.post("/auth/login")
-def login(payload: dict = Body(...)):
+async def login(payload: dict = Body(...)):
     username = (payload.get("username") or "").strip()
     password = (payload.get("password") or "").strip()
     if not username or not password:
@@ -1089,11 +1494,23 @@ def login(payload: dict = Body(...)):
     conn = _get_db()
     row = conn.execute("SELECT * FROM users WHERE username = ?", (username,)).fetchone()
     conn.close()
-    if not row or not _verify_password(password, row["password_hash"]):
+    if not row:
+        raise HTTPException(status_code=401, detail="invalid credentials")
+    ok, new_hash = await _run_hash(passwords.verify_password, password, row["password_hash"])
+    if not ok:
         raise HTTPException(status_code=401, detail="invalid credentials")
+    if new_hash:
+        # 반복 횟수가 바뀐 예전 해시는 맞힌 김에 새 설정으로 다시 저장한다 (그사이 비밀번호가 바뀌었으면 그대로 둔다)
+        conn = _get_db()
+        conn.execute(
+            "UPDATE users SET password_hash = ? WHERE username = ? AND password_hash = ?",
+            (new_hash, username, row["password_hash"]),
+        )
+        conn.commit()
+        conn.close()
 
-    token = _create_access_token(username)
     role = row["role"] if row["role"] else "user"
+    token = _create_access_token(username, role)
     return {
         "ok": True,
         "token": token,
@@ -1111,11 +1528,9 @@ def login_options():
 
 @app.get("/auth/me")
 def me(user: str = Depends(_get_current_user)):
-    conn = _get_db()
-    row = conn.execute("SELECT display_name, role FROM users WHERE username = ?", (user,)).fetchone()
-    conn.close()
-    display_name = row["display_name"] if row else ""
-    role = row["role"] if row and row["role"] else "user"
+    profile = _get_user_profile(user)
+    display_name = profile["display_name"] if profile else ""
+    role = profile["role"] if profile else "user"
     return {"ok": True, "username": user, "display_name": display_name, "role": role, "is_admin": role == "admin"}
 
 
@@ -1131,43 +1546,42 @@ def update_profile(payload: dict = Body(...), user: str = Depends(_get_current_u
         raise HTTPException(status_code=400, detail="display_name required")
     conn = _get_db()
     conn.execute("UPDATE users SET display_name = ? WHERE username = ?", (display_name, user))
+    _bump_resource_version(conn, "users")
     conn.commit()
     conn.close()
+    _invalidate_user_profile(user)
     return {"ok": True, "username": user, "display_name": display_name}
 
 
 @app.post("/barcode/upload")
-async def barcode_upload(file: UploadFile = File(...), user: str = Depends(_get_current_user)):
+async def barcode_upload(file: UploadFile = File(...), user: str = Depends(_get_scan_user)):
     name = (file.filename or "").lower()
     if not (name.endswith(".xls") or name.endswith(".xlsx")):
         raise HTTPException(status_code=400, detail="xls/xlsx만 업로드 가능")
 
     suffix = ".xlsx" if name.endswith(".xlsx") else ".xls"
 
-    # 파일명 충돌 방지
-    tmp_path = Path(tempfile.gettempdir()) / f"yusaek_upload_{uuid.uuid4().hex}{suffix}"
-    data = await file.read()
-    tmp_path.write_bytes(data)
+    async with ingest_upload(file, "yusaek_upload", suffix, **_scratch_upload(user)) as upload:
+        try:
+            result = process_and_load_any(upload.path)
 
-    try:
-        result = process_and_load_any(tmp_path)
-        print("process_and_load_any return len =", len(result))
-
-        if len(result) == 7:
-            processed_path, mapping, details, runs, invoice_order, invoice_seq, code_o_text = result
-        elif len(result) == 6:
-            mapping, details, runs, invoice_order, invoice_seq, code_o_text = result
-            processed_path = None
-        else:
-            raise Exception(f"unexpected return count: {len(result)}")
+            if len(result) == 7:
+                processed_path, mapping, details, runs, invoice_order, invoice_seq, code_o_text = result
+            elif len(result) == 6:
+                mapping, details, runs, invoice_order, invoice_seq, code_o_text = result
+                processed_path = None
+            else:
+                raise Exception(f"unexpected return count: {len(result)}")
 
-    except Exception as e:
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"가공 실패: {e}")
+        except Exception as e:
+            traceback.print_exc()
+            raise HTTPException(status_code=500, detail=f"가공 실패: {e}")
 
-    STATE.update(
+    _commit_scan_op(
+        "barcode",
+        "",
+        "load",
         {
-            "loaded": True,
             "processed_path": str(processed_path) if processed_path else None,
             "mapping": mapping,
             "details": details,
@@ -1175,10 +1589,7 @@ async def barcode_upload(file: UploadFile = File(...), user: str = Depends(_get_
             "invoice_order": invoice_order,
             "invoice_seq": invoice_seq,
             "code_o_text": code_o_text,
-            "current_invoice": None,
-            "last_scanned_code": None,
-            "defect_counts": {},
-        }
+        },
     )
 
     return {
@@ -1189,52 +1600,44 @@ async def barcode_upload(file: UploadFile = File(...), user: str = Depends(_get_
 
 
 @app.post("/barcode/incoming/upload")
-async def incoming_upload(file: UploadFile = File(...), user: str = Depends(_get_current_user)):
+async def incoming_upload(file: UploadFile = File(...), user: str = Depends(_get_scan_user)):
     name = (file.filename or "").lower()
     if not (name.endswith(".xls") or name.endswith(".xlsx")):
         raise HTTPException(status_code=400, detail="xls/xlsx files only")
 
     suffix = ".xlsx" if name.endswith(".xlsx") else ".xls"
-    tmp_path = Path(tempfile.gettempdir()) / f"yusaek_incoming_{uuid.uuid4().hex}{suffix}"
-    data = await file.read()
-    tmp_path.write_bytes(data)
-
-    try:
-        wb, ws = load_excel_any(tmp_path)
-        counts = Counter()
-        for r in range(1, ws.max_row + 1):
-            code_raw = ws.cell(r, 1).value
-            qty_raw = ws.cell(r, 2).value
-            code = normalize_to_yusas(code_raw)
-            if not code:
-                continue
-            qty = _to_int(qty_raw, default=0)
-            if qty > 0:
-                counts[code] += qty
-    except Exception as e:
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"incoming load failed: {e}")
+    async with ingest_upload(file, "yusaek_incoming", suffix, **_scratch_upload(user)) as upload:
+        try:
+            sheet = readers.read_sheet(upload.path, "incoming")
+            counts = Counter()
+            for code_raw, qty_raw in sheet.iter_rows(max_col=2):
+                code = normalize_to_yusas(code_raw)
+                if not code:
+                    continue
+                qty = _to_int(qty_raw, default=0)
+                if qty > 0:
+                    counts[code] += qty
+        except Exception as e:
+            traceback.print_exc()
+            raise HTTPException(status_code=500, detail=f"incoming load failed: {e}")
 
-    STATE["incoming_counts"] = dict(counts)
+    _commit_scan_op("barcode", "", "incoming", {"counts": dict(counts)})
     return {"ok": True, "codes": len(counts), "total_qty": sum(counts.values())}
 
 
 @app.post("/barcode/product/upload")
-async def easyadmin_product_upload(file: UploadFile = File(...), user: str = Depends(_get_current_user)):
+async def easyadmin_product_upload(file: UploadFile = File(...), user: str = Depends(_get_scan_user)):
     name = (file.filename or "").lower()
     if not (name.endswith(".xls") or name.endswith(".xlsx") or name.endswith(".csv")):
         raise HTTPException(status_code=400, detail="xls/xlsx/csv만 업로드 가능")
 
     suffix = Path(name).suffix or ".xlsx"
-    tmp_path = Path(tempfile.gettempdir()) / f"yusaek_easyadmin_{uuid.uuid4().hex}{suffix}"
-    data = await file.read()
-    tmp_path.write_bytes(data)
-
-    try:
-        xls_bytes = _process_easyadmin_product_upload(tmp_path)
-    except Exception as e:
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"가공 실패: {e}")
+    async with ingest_upload(file, "yusaek_easyadmin", suffix, **_scratch_upload(user)) as upload:
+        try:
+            xls_bytes = _process_easyadmin_product_upload(upload.path)
+        except Exception as e:
+            traceback.print_exc()
+            raise HTTPException(status_code=500, detail=f"가공 실패: {e}")
 
     filename = f"easyadmin_products_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xls"
     headers = {"Content-Disposition": _content_disposition(filename)}
@@ -1242,7 +1645,10 @@ async def easyadmin_product_upload(file: UploadFile = File(...), user: str = Dep
 
 
 @app.get("/barcode/status")
-def barcode_status(user: str = Depends(_get_current_user)):
+def barcode_status(request: Request, response: Response, user: str = Depends(_get_scan_user)):
+    not_modified = _conditional(request, response, _scan_etag("barcode", ""))
+    if not_modified:
+        return not_modified
     if not STATE["loaded"]:
         return {"loaded": False}
     return {
@@ -1385,7 +1791,7 @@ def _build_defect_csv() -> str:
 
 
 @app.post("/barcode/scan/invoice")
-def scan_invoice(payload: dict = Body(...), user: str = Depends(_get_current_user)):
+def scan_invoice(payload: dict = Body(...), user: str = Depends(_get_scan_user)):
     if not STATE["loaded"]:
         raise HTTPException(status_code=400, detail="먼저 엑셀을 업로드해주세요")
 
@@ -1396,11 +1802,13 @@ def scan_invoice(payload: dict = Body(...), user: str = Depends(_get_current_use
     if invoice not in STATE["mapping"]:
         return {"ok": False, "type": "invoice", "result": "NOT_FOUND", "invoice": invoice}
 
-    STATE["current_invoice"] = invoice
-
     first_item = _get_first_remaining_item(invoice)
-    if first_item:
-        STATE["last_scanned_code"] = first_item.get("code")
+    _commit_scan_op(
+        "barcode",
+        "",
+        "invoice",
+        {"invoice": invoice, "last_code": first_item.get("code") if first_item else None},
+    )
 
     items = _get_all_items(invoice)
 
@@ -1418,7 +1826,7 @@ def scan_invoice(payload: dict = Body(...), user: str = Depends(_get_current_use
 
 
 @app.post("/barcode/scan/item")
-def scan_item(payload: dict = Body(...), user: str = Depends(_get_current_user)):
+def scan_item(payload: dict = Body(...), user: str = Depends(_get_scan_user)):
     if not STATE["loaded"]:
         raise HTTPException(status_code=400, detail="먼저 엑셀을 업로드해주세요")
 
@@ -1435,12 +1843,18 @@ def scan_item(payload: dict = Body(...), user: str = Depends(_get_current_user))
     if inv not in STATE["mapping"]:
         return {"ok": False, "type": "item", "result": "BAD_INVOICE", "invoice": inv}
 
-    remain = STATE["mapping"][inv].get(code, 0)
     det = (STATE["details"] or {}).get(inv, {}).get(code, {})
     name = det.get("name", "") or ""
     opt = det.get("option", "") or ""
 
-    if remain <= 0:
+    def decide():
+        # 남은 수량은 잠금 안에서 본다 (여러 스테이션이 마지막 1개를 같이 TRUE로 받지 않게)
+        if (STATE["mapping"] or {}).get(inv, {}).get(code, 0) <= 0:
+            return None
+        return "item", {"invoice": inv, "code": code}
+
+    # TRUE 처리: -1
+    if _commit_scan_op("barcode", "", decide=decide) is None:
         return {
             "ok": True,
             "type": "item",
@@ -1450,17 +1864,13 @@ def scan_item(payload: dict = Body(...), user: str = Depends(_get_current_user))
             "code": code,
             "name": name,
             "option": opt,
-            "remain": remain,
+            "remain": (STATE["mapping"] or {}).get(inv, {}).get(code, 0),
             "items": _get_all_items(inv),
             "current_next": _get_first_remaining_item(inv),
             "next_preview": _get_next_item_preview(inv),
             "defects": _get_defect_list(),
         }
 
-    # TRUE 처리: -1
-    STATE["mapping"][inv][code] = remain - 1
-    STATE["last_scanned_code"] = code
-
     all_done = all(v == 0 for v in STATE["mapping"][inv].values())
 
     return {
@@ -1481,7 +1891,7 @@ def scan_item(payload: dict = Body(...), user: str = Depends(_get_current_user))
 
 
 @app.post("/barcode/defect/add")
-def add_defect(payload: dict = Body(...), user: str = Depends(_get_current_user)):
+def add_defect(payload: dict = Body(...), user: str = Depends(_get_scan_user)):
     if not STATE["loaded"]:
         raise HTTPException(status_code=400, detail="먼저 엑셀을 업로드해주세요")
 
@@ -1490,15 +1900,13 @@ def add_defect(payload: dict = Body(...), user: str = Depends(_get_current_user)
         raise HTTPException(status_code=400, detail="code 값이 비어있음")
 
     code = normalize_to_yusas(raw) or raw
-    defect_counts = STATE.get("defect_counts") or {}
-    defect_counts[code] = defect_counts.get(code, 0) + 1
-    STATE["defect_counts"] = defect_counts
+    _commit_scan_op("barcode", "", "defect_add", {"code": code})
 
     inv = STATE.get("current_invoice")
     return {
         "ok": True,
         "code": code,
-        "defect_count": defect_counts[code],
+        "defect_count": STATE["defect_counts"][code],
         "items": _get_all_items(inv) if inv else [],
         "current_next": _get_first_remaining_item(inv),
         "next_preview": _get_next_item_preview(inv),
@@ -1507,19 +1915,20 @@ def add_defect(payload: dict = Body(...), user: str = Depends(_get_current_user)
 
 
 @app.get("/barcode/defect/list")
-def list_defects(user: str = Depends(_get_current_user)):
+def list_defects(user: str = Depends(_get_scan_user)):
     if not STATE["loaded"]:
         raise HTTPException(status_code=400, detail="먼저 엑셀을 업로드해주세요")
     return {"ok": True, "defects": _get_defect_list()}
 
 
 @app.get("/barcode/defect/export")
-def export_defects(user: str = Depends(_get_current_user)):
+def export_defects(user: str = Depends(_get_scan_user)):
     if not STATE["loaded"]:
         raise HTTPException(status_code=400, detail="먼저 엑셀을 업로드해주세요")
     if not (STATE.get("defect_counts") or {}):
         raise HTTPException(status_code=400, detail="불량 목록이 비어있습니다")
-    csv_text = _build_defect_csv()
+    with metrics.span("export_build", "defects"):
+        csv_text = _build_defect_csv()
     filename = f"defects_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
     headers = {"Content-Disposition": _content_disposition(filename)}
     csv_bytes = csv_text.encode("utf-8-sig")
@@ -1527,19 +1936,14 @@ def export_defects(user: str = Depends(_get_current_user)):
 
 
 @app.post("/barcode/defect/dec")
-def decrement_defect(payload: dict = Body(...), user: str = Depends(_get_current_user)):
+def decrement_defect(payload: dict = Body(...), user: str = Depends(_get_scan_user)):
     if not STATE["loaded"]:
         raise HTTPException(status_code=400, detail="먼저 엑셀을 업로드해주세요")
     raw = (payload.get("code") or "").strip()
     if not raw:
         raise HTTPException(status_code=400, detail="code 값이 비어있음")
     code = normalize_to_yusas(raw) or raw
-    defect_counts = STATE.get("defect_counts") or {}
-    if code in defect_counts:
-        defect_counts[code] -= 1
-        if defect_counts[code] <= 0:
-            del defect_counts[code]
-    STATE["defect_counts"] = defect_counts
+    _commit_scan_op("barcode", "", "defect_dec", {"code": code})
     inv = STATE.get("current_invoice")
     return {
         "ok": True,
@@ -1551,17 +1955,14 @@ def decrement_defect(payload: dict = Body(...), user: str = Depends(_get_current
 
 
 @app.post("/barcode/defect/remove")
-def remove_defect(payload: dict = Body(...), user: str = Depends(_get_current_user)):
+def remove_defect(payload: dict = Body(...), user: str = Depends(_get_scan_user)):
     if not STATE["loaded"]:
         raise HTTPException(status_code=400, detail="먼저 엑셀을 업로드해주세요")
     raw = (payload.get("code") or "").strip()
     if not raw:
         raise HTTPException(status_code=400, detail="code 값이 비어있음")
     code = normalize_to_yusas(raw) or raw
-    defect_counts = STATE.get("defect_counts") or {}
-    if code in defect_counts:
-        del defect_counts[code]
-    STATE["defect_counts"] = defect_counts
+    _commit_scan_op("barcode", "", "defect_remove", {"code": code})
     inv = STATE.get("current_invoice")
     return {
         "ok": True,
@@ -1573,7 +1974,10 @@ def remove_defect(payload: dict = Body(...), user: str = Depends(_get_current_us
 
 
 @app.get("/users")
-def list_users(user: str = Depends(_get_current_user)):
+def list_users(request: Request, response: Response, user: str = Depends(_get_current_user)):
+    not_modified = _conditional(request, response, _resource_etag("users"))
+    if not_modified:
+        return not_modified
     conn = _get_db()
     rows = conn.execute("SELECT username, display_name FROM users ORDER BY username ASC").fetchall()
     conn.close()
@@ -1581,7 +1985,10 @@ def list_users(user: str = Depends(_get_current_user)):
 
 
 @app.get("/admin/users")
-def admin_list_users(admin: str = Depends(_require_admin)):
+def admin_list_users(request: Request, response: Response, admin: str = Depends(_require_admin)):
+    not_modified = _conditional(request, response, _resource_etag("users", "admin"))
+    if not_modified:
+        return not_modified
     conn = _get_db()
     rows = conn.execute(
         "SELECT username, display_name, role, created_at FROM users ORDER BY username ASC"
@@ -1619,8 +2026,10 @@ def admin_set_role(target: str, payload: dict = Body(...), admin: str = Depends(
         raise HTTPException(status_code=400, detail="cannot remove last admin")
 
     conn.execute("UPDATE users SET role = ? WHERE username = ?", (role, target))
+    _bump_resource_version(conn, "users")
     conn.commit()
     conn.close()
+    _invalidate_user_profile(target)
     return {"ok": True, "username": target, "role": role}
 
 
@@ -1640,16 +2049,32 @@ def admin_delete_user(target: str, admin: str = Depends(_require_admin)):
         conn.close()
         raise HTTPException(status_code=400, detail="cannot delete last admin")
 
+    released = _purge_request_attachments(conn, "requester_username = ? OR assignee_username = ?", (target, target))
     conn.execute(
         "DELETE FROM requests WHERE requester_username = ? OR assignee_username = ?",
         (target, target),
     )
     conn.execute("DELETE FROM users WHERE username = ?", (target,))
+    _bump_resource_version(conn, "users")
     conn.commit()
+    _delete_released_files(conn, released)
     conn.close()
+    _invalidate_user_profile(target)
+    SCRATCH.clear_session(target)
     return {"ok": True}
 
 
+def _discard_staged_uploads(staged_paths: list[Path], created_blobs: list[str]):
+    # 롤백 전에(쓰기 잠금을 잡은 채로) 이번 업로드가 새로 만든 blob만 지운다
+    for sha in created_blobs:
+        BLOBS.discard(sha)
+    for path in staged_paths:
+        try:
+            path.unlink(missing_ok=True)
+        except Exception:
+            pass
+
+
 @app.post("/requests")
 def create_request(
     assignee: str = Form(...),
@@ -1676,7 +2101,9 @@ def create_request(
     created_at = datetime.now(timezone.utc).isoformat()
 
     conn = _get_db()
-    saved_paths: list[Path] = []
+    staged_paths: list[Path] = []
+    created_blobs: list[str] = []
+    image_blobs: list[str] = []
     try:
         cursor = conn.execute(
             """
@@ -1690,55 +2117,61 @@ def create_request(
         )
         request_id = cursor.lastrowid
 
-        if files:
-            request_dir = UPLOAD_BASE / str(request_id)
-            request_dir.mkdir(parents=True, exist_ok=True)
-            for f in files:
-                ext = Path(f.filename or "").suffix.lower()
-                stored_name = f"{uuid.uuid4().hex}{ext}"
-                target_path = request_dir / stored_name
-                with target_path.open("wb") as out:
-                    shutil.copyfileobj(f.file, out)
-                saved_paths.append(target_path)
-
-                size = target_path.stat().st_size
-                mime = f.content_type or mimetypes.guess_type(f.filename or "")[0] or "application/octet-stream"
-                conn.execute(
-                    """
-                    INSERT INTO request_attachments (
-                        request_id, original_name, stored_name, mime_type, size, created_at
-                    ) VALUES (?, ?, ?, ?, ?, ?)
-                    """,
-                    (request_id, f.filename or stored_name, stored_name, mime, size, created_at),
-                )
+        for f in files or []:
+            ext = Path(f.filename or "").suffix.lower()
+            upload = save_upload_sync(f, "", ext, directory=BLOBS.staging_dir)
+            staged_paths.append(upload.path)
+            if BLOBS.put(conn, upload.path, upload.sha256, upload.size):
+                created_blobs.append(upload.sha256)
+            stored_name = upload.sha256
+            size = upload.size
+            mime = f.content_type or mimetypes.guess_type(f.filename or "")[0] or "application/octet-stream"
+            if _is_image_mime(mime):
+                image_blobs.append(upload.sha256)
+            conn.execute(
+                """
+                INSERT INTO request_attachments (
+                    request_id, original_name, stored_name, mime_type, size, sha256, created_at
+                ) VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                (request_id, f.filename or f"{stored_name}{ext}", stored_name, mime, size, upload.sha256, created_at),
+            )
 
         conn.commit()
     except HTTPException:
+        _discard_staged_uploads(staged_paths, created_blobs)
         conn.rollback()
-        for path in saved_paths:
-            try:
-                path.unlink(missing_ok=True)
-            except Exception:
-                pass
         raise
     except Exception:
+        _discard_staged_uploads(staged_paths, created_blobs)
         conn.rollback()
-        for path in saved_paths:
-            try:
-                path.unlink(missing_ok=True)
-            except Exception:
-                pass
         raise HTTPException(status_code=500, detail="failed to create request")
     finally:
         conn.close()
 
+    for sha in image_blobs:
+        THUMBNAILS.submit(BLOBS.path_for(sha))
+    EVENT_BUS.publish("request", {"action": "created", "id": request_id}, users={user, assignee})
     return {"ok": True}
 
 
+def _attachment_thumbnail(file_path: Path, size: str) -> Path | None:
+    # 백그라운드 작업이 아직이면(또는 예전 첨부면) 여기서 만든다. 실패하면 원본을 보낸다.
+    if size not in thumbnails.THUMBNAIL_SIZES:
+        raise HTTPException(status_code=400, detail=f"size는 {', '.join(thumbnails.THUMBNAIL_SIZES)} 중 하나")
+    try:
+        return THUMBNAILS.ensure(file_path, size)
+    except Exception as e:
+        print("[thumbnails] failed:", file_path, e)
+        return None
+
+
 @app.get("/requests/{request_id}/attachments/{attachment_id}")
 def get_request_attachment(
+    request: Request,
     request_id: int,
     attachment_id: int,
+    size: str | None = None,
     token: str | None = None,
     authorization: str | None = Header(None),
 ):
@@ -1763,14 +2196,24 @@ def get_request_attachment(
     if not file_row:
         raise HTTPException(status_code=404, detail="attachment not found")
 
-    file_path = UPLOAD_BASE / str(request_id) / file_row["stored_name"]
-    if not file_path.exists():
-        raise HTTPException(status_code=404, detail="file missing")
-
-    return FileResponse(
+    file_path = _stored_file_path(UPLOAD_BASE / str(request_id), file_row)
+    if size and _is_image_mime(file_row["mime_type"]):
+        thumb_path = _attachment_thumbnail(file_path, size)
+        if thumb_path is not None:
+            return _serve_stored_file(
+                request,
+                thumb_path,
+                "image/webp",
+                f"{Path(file_row['original_name']).stem}.webp",
+                file_row["sha256"],
+                variant=size,
+            )
+    return _serve_stored_file(
+        request,
         file_path,
-        media_type=file_row["mime_type"],
-        filename=file_row["original_name"],
+        file_row["mime_type"],
+        file_row["original_name"],
+        file_row["sha256"],
     )
 
 
@@ -1785,47 +2228,51 @@ def upload_shared_file(
 
     created_at = datetime.now(timezone.utc).isoformat()
     uploader_display = _get_user_display(user)
-    stored_name = f"{uuid.uuid4().hex}{ext}"
-    SHARED_UPLOAD_BASE.mkdir(parents=True, exist_ok=True)
-    target_path = SHARED_UPLOAD_BASE / stored_name
+    upload = save_upload_sync(file, "", ext, directory=BLOBS.staging_dir)
+    stored_name = upload.sha256
+    size = upload.size
 
+    conn = _get_db()
+    created_blob = False
     try:
-        with target_path.open("wb") as out:
-            shutil.copyfileobj(file.file, out)
-        size = target_path.stat().st_size
         mime = file.content_type or mimetypes.guess_type(file.filename or "")[0] or "application/octet-stream"
-        conn = _get_db()
+        created_blob = BLOBS.put(conn, upload.path, upload.sha256, upload.size)
         conn.execute(
             """
             INSERT INTO shared_files (
-                original_name, stored_name, mime_type, size,
+                original_name, stored_name, mime_type, size, sha256,
                 uploader_username, uploader_display, created_at
-            ) VALUES (?, ?, ?, ?, ?, ?, ?)
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
             """,
             (
-                file.filename or stored_name,
+                file.filename or f"{stored_name}{ext}",
                 stored_name,
                 mime,
                 size,
+                upload.sha256,
                 user,
                 uploader_display,
                 created_at,
             ),
         )
+        _bump_resource_version(conn, "shared_files")
         conn.commit()
-        conn.close()
     except Exception:
-        try:
-            target_path.unlink(missing_ok=True)
-        except Exception:
-            pass
+        _discard_staged_uploads([upload.path], [upload.sha256] if created_blob else [])
+        conn.rollback()
         raise HTTPException(status_code=500, detail="파일 업로드 실패")
+    finally:
+        conn.close()
 
+    SHARED_PREVIEWS.submit(upload.sha256, BLOBS.path_for(upload.sha256), ext)
     return {"ok": True}
 
 
 @app.get("/shared-files")
-def list_shared_files(user: str = Depends(_get_current_user)):
+def list_shared_files(request: Request, response: Response, user: str = Depends(_get_current_user)):
+    not_modified = _conditional(request, response, _resource_etag("shared_files"))
+    if not_modified:
+        return not_modified
     conn = _get_db()
     rows = conn.execute(
         "SELECT * FROM shared_files ORDER BY created_at DESC"
@@ -1836,6 +2283,7 @@ def list_shared_files(user: str = Depends(_get_current_user)):
 
 @app.get("/shared-files/{file_id}")
 def download_shared_file(
+    request: Request,
     file_id: int,
     token: str | None = None,
     authorization: str | None = Header(None),
@@ -1847,15 +2295,42 @@ def download_shared_file(
     if not row:
         raise HTTPException(status_code=404, detail="file not found")
 
-    file_path = SHARED_UPLOAD_BASE / row["stored_name"]
+    file_path = _stored_file_path(SHARED_UPLOAD_BASE, row)
+    return _serve_stored_file(request, file_path, row["mime_type"], row["original_name"], row["sha256"])
+
+
+def _shared_preview_key(row) -> str:
+    return row["sha256"] or f"id{row['id']}"
+
+
+@app.get("/shared-files/{file_id}/preview")
+def preview_shared_file(
+    file_id: int,
+    sheet: str | None = None,
+    offset: int = 0,
+    limit: int = 100,
+    user: str = Depends(_get_current_user),
+):
+    conn = _get_db()
+    row = conn.execute("SELECT * FROM shared_files WHERE id = ?", (file_id,)).fetchone()
+    conn.close()
+    if not row:
+        raise HTTPException(status_code=404, detail="file not found")
+    file_path = _stored_file_path(SHARED_UPLOAD_BASE, row)
     if not file_path.exists():
         raise HTTPException(status_code=404, detail="file missing")
 
-    return FileResponse(
-        file_path,
-        media_type=row["mime_type"],
-        filename=row["original_name"],
-    )
+    offset = max(0, offset)
+    limit = max(1, min(limit, SHARED_PREVIEW_LIMIT_MAX))
+    ext = Path(row["original_name"]).suffix.lower()
+    try:
+        page = SHARED_PREVIEWS.page(_shared_preview_key(row), file_path, ext, sheet, offset, limit)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"시트를 찾을 수 없습니다: {sheet}")
+    except Exception as e:
+        traceback.print_exc()
+        raise HTTPException(status_code=400, detail=f"미리보기를 만들 수 없습니다: {e}")
+    return {"ok": True, "id": file_id, "limit": limit, **page}
 
 
 @app.delete("/shared-files/{file_id}")
@@ -1866,57 +2341,70 @@ def delete_shared_file(file_id: int, admin: str = Depends(_require_admin)):
         conn.close()
         raise HTTPException(status_code=404, detail="file not found")
     conn.execute("DELETE FROM shared_files WHERE id = ?", (file_id,))
+    released = _release_stored_file(conn, SHARED_UPLOAD_BASE, row)
+    _bump_resource_version(conn, "shared_files")
     conn.commit()
+    removed = released is not None and _delete_released_files(conn, [released]) > 0
     conn.close()
-
-    file_path = SHARED_UPLOAD_BASE / row["stored_name"]
-    try:
-        file_path.unlink(missing_ok=True)
-    except Exception:
-        pass
-
+    if removed:
+        SHARED_PREVIEWS.remove(_shared_preview_key(row))
     return {"ok": True}
 
 
 @app.get("/requests/assigned")
-def get_assigned_requests(user: str = Depends(_get_current_user)):
+def get_assigned_requests(
+    before_id: int | None = None,
+    limit: int | None = None,
+    user: str = Depends(_get_current_user),
+):
     target = user.strip()
     if not target:
         raise HTTPException(status_code=400, detail="assignee required")
+    limit = _request_page_limit(limit)
 
+    sql = f"SELECT * FROM requests WHERE assignee_username = ? AND {_VISIBLE_REQUEST_SQL}"
+    params: list = [target, _today_utc()]
     conn = _get_db()
-    rows = conn.execute(
-        "SELECT * FROM requests WHERE assignee_username = ? ORDER BY created_at DESC",
-        (target,),
-    ).fetchall()
+    if before_id is not None:
+        anchor = _request_page_anchor(conn, before_id)
+        if anchor:
+            sql += " AND (created_at, id) < (?, ?)"
+            params += [anchor["created_at"], anchor["id"]]
+        else:
+            sql += " AND id < ?"
+            params.append(before_id)
+    sql += " ORDER BY created_at DESC, id DESC"
+    if limit:
+        sql += " LIMIT ?"
+        params.append(limit)
+    rows = conn.execute(sql, params).fetchall()
     conn.close()
 
-    visible_rows = [
-        row
-        for row in rows
-        if not (row["status"] == "completed" and not _is_visible_completed(row["completed_at"]))
-    ]
-    attachments_map = _get_request_attachments([row["id"] for row in visible_rows])
+    attachments_map = _get_request_attachments([row["id"] for row in rows])
 
     items = []
-    for row in visible_rows:
+    for row in rows:
         item = _row_to_request(row)
         item["can_complete"] = row["status"] == "open" and row["assignee_username"] == user
         item["attachments"] = attachments_map.get(row["id"], [])
         items.append(item)
 
-    return {"ok": True, "assignee": target, "requests": items}
+    next_before_id = rows[-1]["id"] if limit and len(rows) == limit else None
+    return {"ok": True, "assignee": target, "requests": items, "next_before_id": next_before_id}
 
 
 @app.delete("/requests/assigned/clear")
 def clear_assigned_requests(user: str = Depends(_get_current_user)):
     conn = _get_db()
+    released = _purge_request_attachments(conn, "assignee_username = ? AND status = 'completed'", (user,))
     conn.execute(
         "DELETE FROM requests WHERE assignee_username = ? AND status = 'completed'",
         (user,),
     )
     conn.commit()
+    _delete_released_files(conn, released)
     conn.close()
+    EVENT_BUS.publish("request", {"action": "cleared"}, users={user})
     return {"ok": True}
 
 
@@ -1932,56 +2420,83 @@ def complete_request(request_id: int, user: str = Depends(_get_current_user)):
         raise HTTPException(status_code=403, detail="forbidden")
 
     if row["status"] != "completed":
+        now = datetime.now(timezone.utc)
         conn.execute(
-            "UPDATE requests SET status = ?, completed_at = ? WHERE id = ?",
-            ("completed", datetime.now(timezone.utc).isoformat(), request_id),
+            "UPDATE requests SET status = ?, completed_at = ?, completed_date = ? WHERE id = ?",
+            ("completed", now.isoformat(), now.date().isoformat(), request_id),
         )
         conn.commit()
+        EVENT_BUS.publish(
+            "request",
+            {"action": "completed", "id": request_id},
+            users={row["requester_username"], row["assignee_username"]},
+        )
     conn.close()
     return {"ok": True}
 
 
 @app.get("/requests/resolved")
-def get_resolved_requests(user: str = Depends(_get_current_user)):
+def get_resolved_requests(
+    before_id: int | None = None,
+    limit: int | None = None,
+    user: str = Depends(_get_current_user),
+):
+    limit = _request_page_limit(limit)
+
+    sql = f"SELECT * FROM requests WHERE requester_username = ? AND {_VISIBLE_REQUEST_SQL}"
+    params: list = [user, _today_utc()]
     conn = _get_db()
-    rows = conn.execute(
-        """
-        SELECT * FROM requests
-        WHERE requester_username = ?
+    if before_id is not None:
+        anchor = _request_page_anchor(conn, before_id)
+        if anchor:
+            # 정렬 키 전체를 비교해야 완료/미완료 경계에서도 빠지거나 겹치는 행이 없다
+            sql += " AND ((status = 'completed'), COALESCE(completed_at, ''), created_at, id) < (?, ?, ?, ?)"
+            params += [
+                1 if anchor["status"] == "completed" else 0,
+                anchor["completed_at"] or "",
+                anchor["created_at"],
+                anchor["id"],
+            ]
+        else:
+            sql += " AND id < ?"
+            params.append(before_id)
+    sql += """
         ORDER BY (status = 'completed') DESC,
-                 completed_at DESC,
-                 created_at DESC
-        """,
-        (user,),
-    ).fetchall()
+                 COALESCE(completed_at, '') DESC,
+                 created_at DESC,
+                 id DESC
+    """
+    if limit:
+        sql += " LIMIT ?"
+        params.append(limit)
+    rows = conn.execute(sql, params).fetchall()
     conn.close()
 
-    visible_rows = [
-        row
-        for row in rows
-        if not (row["status"] == "completed" and not _is_visible_completed(row["completed_at"]))
-    ]
-    attachments_map = _get_request_attachments([row["id"] for row in visible_rows])
+    attachments_map = _get_request_attachments([row["id"] for row in rows])
 
     items = []
-    for row in visible_rows:
+    for row in rows:
         item = _row_to_request(row)
         item["can_ack"] = row["status"] == "completed" and row["acknowledged_at"] is None
         item["attachments"] = attachments_map.get(row["id"], [])
         items.append(item)
 
-    return {"ok": True, "requests": items}
+    next_before_id = rows[-1]["id"] if limit and len(rows) == limit else None
+    return {"ok": True, "requests": items, "next_before_id": next_before_id}
 
 
 @app.delete("/requests/sent/clear")
 def clear_sent_requests(user: str = Depends(_get_current_user)):
     conn = _get_db()
+    released = _purge_request_attachments(conn, "requester_username = ? AND status = 'completed'", (user,))
     conn.execute(
         "DELETE FROM requests WHERE requester_username = ? AND status = 'completed'",
         (user,),
     )
     conn.commit()
+    _delete_released_files(conn, released)
     conn.close()
+    EVENT_BUS.publish("request", {"action": "cleared"}, users={user})
     return {"ok": True}
 
 
@@ -2002,13 +2517,23 @@ def acknowledge_request(request_id: int, user: str = Depends(_get_current_user))
     )
     conn.commit()
     conn.close()
+    EVENT_BUS.publish(
+        "request",
+        {"action": "acknowledged", "id": request_id},
+        users={row["requester_username"], row["assignee_username"]},
+    )
     return {"ok": True}
 
 
 # ---------- Company Credentials ----------
 @app.get("/company-credentials")
-def list_company_credentials(user: str = Depends(_get_current_user)):
+def list_company_credentials(request: Request, response: Response, user: str = Depends(_get_current_user)):
     is_admin = _is_admin(user)
+    # 관리자에게는 아이디/비밀번호까지 내려가므로 권한별로 ETag를 나눈다
+    etag = _resource_etag("company_credentials", "admin" if is_admin else "user")
+    not_modified = _conditional(request, response, etag)
+    if not_modified:
+        return not_modified
     conn = _get_db()
     rows = conn.execute(
         "SELECT id, label, username, password, updated_at, created_at FROM company_credentials ORDER BY id DESC"
@@ -2038,11 +2563,12 @@ def get_company_pin_status(user: str = Depends(_get_current_user)):
 
 
 @app.post("/company-credentials/pin")
-def set_company_pin(payload: dict = Body(...), admin: str = Depends(_require_admin)):
+async def set_company_pin(payload: dict = Body(...), admin: str = Depends(_require_admin)):
     pin = (payload.get("pin") or "").strip()
     if not re.fullmatch(r"\d{4}", pin or ""):
         raise HTTPException(status_code=400, detail="4자리 PIN이 필요합니다.")
-    _set_setting("company_pin_hash", _hash_pin(pin))
+    _set_setting("company_pin_hash", await _run_hash(passwords.hash_pin, pin))
+    PIN_CACHE.clear()
     return {"ok": True}
 
 
@@ -2081,6 +2607,7 @@ def upsert_company_credentials(
             """,
             (label, username or None, password or None, now, now),
         )
+    _bump_resource_version(conn, "company_credentials")
     conn.commit()
     conn.close()
     return {"ok": True}
@@ -2090,13 +2617,14 @@ def upsert_company_credentials(
 def delete_company_credentials(cred_id: int, admin: str = Depends(_require_admin)):
     conn = _get_db()
     conn.execute("DELETE FROM company_credentials WHERE id = ?", (cred_id,))
+    _bump_resource_version(conn, "company_credentials")
     conn.commit()
     conn.close()
     return {"ok": True}
 
 
 @app.post("/company-credentials/{cred_id}/view")
-def view_company_credentials(
+async def view_company_credentials(
     cred_id: int,
     payload: dict = Body(...),
     user: str = Depends(_get_current_user),
@@ -2106,8 +2634,22 @@ def view_company_credentials(
         raise HTTPException(status_code=400, detail="4자리 PIN이 필요합니다.")
 
     pin_hash = _get_setting("company_pin_hash")
-    if not pin_hash or not _verify_pin(pin, pin_hash):
+    if not pin_hash:
         raise HTTPException(status_code=403, detail="pin mismatch")
+    # 방금 맞힌 PIN이면 해시 검증을 건너뛴다 (PIN이 바뀌면 pin_hash가 달라서 캐시가 맞지 않는다)
+    if not PIN_CACHE.check(user, pin, pin_hash):
+        ok, new_hash = await _run_hash(passwords.verify_pin, pin, pin_hash)
+        if not ok:
+            raise HTTPException(status_code=403, detail="pin mismatch")
+        if new_hash:
+            conn = _get_db()
+            conn.execute(
+                "UPDATE app_settings SET value = ? WHERE key = 'company_pin_hash' AND value = ?", (new_hash, pin_hash)
+            )
+            conn.commit()
+            conn.close()
+            pin_hash = new_hash
+        PIN_CACHE.remember(user, pin, pin_hash)
 
     conn = _get_db()
     row = conn.execute("SELECT * FROM company_credentials WHERE id = ?", (cred_id,)).fetchone()
@@ -2126,7 +2668,12 @@ def view_company_credentials(
 
 # ---------- Return (반품) API ----------
 @app.get("/returns/state")
-def returns_state(user: str = Depends(_get_current_user)):
+def returns_state(request: Request, response: Response, user: str = Depends(_get_scan_user)):
+    # 상태에 원가베이스 파일 존재/수정시각이 들어가므로 파일 서명도 ETag에 넣는다
+    etag = _scan_etag("returns", user, _file_signature(RETURN_COST_BASE_PATH))
+    not_modified = _conditional(request, response, etag)
+    if not_modified:
+        return not_modified
     state = _get_return_state(user)
     return {
         "ok": True,
@@ -2142,7 +2689,10 @@ def returns_state(user: str = Depends(_get_current_user)):
 
 # ---------- AMOOD Excel API ----------
 @app.get("/amood/status")
-def amood_status(user: str = Depends(_get_current_user)):
+def amood_status(request: Request, response: Response, user: str = Depends(_get_scan_user)):
+    not_modified = _conditional(request, response, _scan_etag("amood", user, "status"))
+    if not_modified:
+        return not_modified
     state = _get_amood_state(user)
     return {
         "ok": True,
@@ -2152,34 +2702,29 @@ def amood_status(user: str = Depends(_get_current_user)):
 
 
 @app.post("/amood/incoming/upload")
-async def amood_incoming_upload(file: UploadFile = File(...), user: str = Depends(_get_current_user)):
+async def amood_incoming_upload(file: UploadFile = File(...), user: str = Depends(_get_scan_user)):
     name = (file.filename or "").lower()
     if not (name.endswith(".xls") or name.endswith(".xlsx")):
         raise HTTPException(status_code=400, detail="xls/xlsx files only")
 
     suffix = ".xlsx" if name.endswith(".xlsx") else ".xls"
-    tmp_path = Path(tempfile.gettempdir()) / f"amood_incoming_{uuid.uuid4().hex}{suffix}"
-    data = await file.read()
-    tmp_path.write_bytes(data)
-
-    try:
-        wb, ws = load_excel_any(tmp_path)
-        counts = Counter()
-        for r in range(1, ws.max_row + 1):
-            code_raw = ws.cell(r, 1).value
-            qty_raw = ws.cell(r, 2).value
-            code = _amood_norm_barcode(code_raw)
-            if not code:
-                continue
-            qty = _amood_to_int_qty(qty_raw)
-            if qty > 0:
-                counts[code] += qty
-    except Exception as e:
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"incoming load failed: {e}")
+    async with ingest_upload(file, "amood_incoming", suffix, **_scratch_upload(user)) as upload:
+        try:
+            sheet = readers.read_sheet(upload.path, "incoming")
+            counts = Counter()
+            for code_raw, qty_raw in sheet.iter_rows(max_col=2):
+                code = _amood_norm_barcode(code_raw)
+                if not code:
+                    continue
+                qty = _amood_to_int_qty(qty_raw)
+                if qty > 0:
+                    counts[code] += qty
+        except Exception as e:
+            traceback.print_exc()
+            raise HTTPException(status_code=500, detail=f"incoming load failed: {e}")
 
+    _commit_scan_op("amood", user, "incoming", {"counts": dict(counts)})
     state = _get_amood_state(user)
-    state.incoming_counts = dict(counts)
     return {
         "ok": True,
         "codes": len(counts),
@@ -2189,51 +2734,31 @@ async def amood_incoming_upload(file: UploadFile = File(...), user: str = Depend
 
 
 @app.post("/amood/excel1")
-def amood_upload_excel1(file: UploadFile = File(...), user: str = Depends(_get_current_user)):
+def amood_upload_excel1(file: UploadFile = File(...), user: str = Depends(_get_scan_user)):
     name = file.filename or ""
     ext = Path(name).suffix.lower()
     if ext not in AMOOD_ALLOWED_EXCEL1:
         raise HTTPException(status_code=400, detail="excel1은 .xlsx/.xlsm만 가능합니다.")
-    tmp_path = Path(tempfile.gettempdir()) / f"amood_excel1_{uuid.uuid4().hex}{ext}"
-    with tmp_path.open("wb") as out:
-        shutil.copyfileobj(file.file, out)
+    upload = save_upload_sync(file, "amood_excel1", ext, **_scratch_upload(user))
+    _commit_scan_op("amood", user, "excel1", {"path": str(upload.path), "name": name or upload.path.name})
     state = _get_amood_state(user)
-    state.file1_path = tmp_path
-    state.file1_name = name or tmp_path.name
-    state.processed1_path = None
-    state.processed2_path = None
-    state.wb1 = None
-    state.ws1 = None
-    state.current_invoice = None
-    state.pending_items = []
-    state.waiting_for_items = False
     return {"ok": True, "status": _amood_status(state)}
 
 
 @app.post("/amood/excel2")
-def amood_upload_excel2(file: UploadFile = File(...), user: str = Depends(_get_current_user)):
+def amood_upload_excel2(file: UploadFile = File(...), user: str = Depends(_get_scan_user)):
     name = file.filename or ""
     ext = Path(name).suffix.lower()
     if ext not in AMOOD_ALLOWED_EXCEL2:
         raise HTTPException(status_code=400, detail="excel2는 .xls/.xlsx/.xlsm/.htm/.html만 가능합니다.")
-    tmp_path = Path(tempfile.gettempdir()) / f"amood_excel2_{uuid.uuid4().hex}{ext}"
-    with tmp_path.open("wb") as out:
-        shutil.copyfileobj(file.file, out)
+    upload = save_upload_sync(file, "amood_excel2", ext, **_scratch_upload(user))
+    _commit_scan_op("amood", user, "excel2", {"path": str(upload.path), "name": name or upload.path.name})
     state = _get_amood_state(user)
-    state.file2_path = tmp_path
-    state.file2_name = name or tmp_path.name
-    state.processed1_path = None
-    state.processed2_path = None
-    state.wb2 = None
-    state.ws2 = None
-    state.current_invoice = None
-    state.pending_items = []
-    state.waiting_for_items = False
     return {"ok": True, "status": _amood_status(state)}
 
 
 @app.post("/amood/preprocess")
-def amood_preprocess(user: str = Depends(_get_current_user)):
+def amood_preprocess(user: str = Depends(_get_scan_user)):
     state = _get_amood_state(user)
     if not state.file1_path or not state.file2_path:
         raise HTTPException(status_code=400, detail="excel1/excel2가 모두 필요합니다.")
@@ -2267,18 +2792,18 @@ def amood_preprocess(user: str = Depends(_get_current_user)):
         out = _amood_build_output_text(name, opt, qty)
         _amood_ws_cell(ws2, AMOOD_COL2_OUTPUT, r).value = out
 
-    out1 = Path(tempfile.gettempdir()) / f"amood_excel1_processed_{uuid.uuid4().hex}.xlsx"
-    out2 = Path(tempfile.gettempdir()) / f"amood_excel2_processed_{uuid.uuid4().hex}.xlsx"
+    out_dir = SCRATCH.session_dir(user)
+    out1 = out_dir / f"amood_excel1_processed_{uuid.uuid4().hex}.xlsx"
+    out2 = out_dir / f"amood_excel2_processed_{uuid.uuid4().hex}.xlsx"
     wb1.save(out1)
-    wb2.save(out2)
+    (wb2 if wb2 is not None else ws2).save(out2)
 
-    state.processed1_path = out1
-    state.processed2_path = out2
+    _commit_scan_op("amood", user, "preprocess", {"processed1": str(out1), "processed2": str(out2)})
     return {"ok": True, "status": _amood_status(state)}
 
 
 @app.get("/amood/download/1")
-def amood_download_excel1(user: str = Depends(_get_current_user)):
+def amood_download_excel1(user: str = Depends(_get_scan_user)):
     state = _get_amood_state(user)
     if not state.processed1_path or not state.processed1_path.exists():
         raise HTTPException(status_code=404, detail="전처리 결과가 없습니다.")
@@ -2288,7 +2813,7 @@ def amood_download_excel1(user: str = Depends(_get_current_user)):
 
 
 @app.get("/amood/download/2")
-def amood_download_excel2(user: str = Depends(_get_current_user)):
+def amood_download_excel2(user: str = Depends(_get_scan_user)):
     state = _get_amood_state(user)
     if not state.processed2_path or not state.processed2_path.exists():
         raise HTTPException(status_code=404, detail="전처리 결과가 없습니다.")
@@ -2332,8 +2857,8 @@ def _amood_first_remaining(state: AmoodState):
 
 
 def _amood_reset_state(state: AmoodState):
-    for path in [state.file1_path, state.file2_path, state.processed1_path, state.processed2_path]:
-        if path and isinstance(path, Path) and path.exists():
+    for path in _amood_files(state):
+        if isinstance(path, Path) and path.exists():
             try:
                 path.unlink(missing_ok=True)
             except Exception:
@@ -2353,10 +2878,14 @@ def _amood_reset_state(state: AmoodState):
     state.waiting_for_items = False
     state.completed_mgmt_numbers = set()
     state.incoming_counts = {}
+    state.qty_overrides = {}
 
 
 @app.get("/amood/scan/status")
-def amood_scan_status(user: str = Depends(_get_current_user)):
+def amood_scan_status(request: Request, response: Response, user: str = Depends(_get_scan_user)):
+    not_modified = _conditional(request, response, _scan_etag("amood", user, "scan"))
+    if not_modified:
+        return not_modified
     state = _get_amood_state(user)
     return {
         "ok": True,
@@ -2367,14 +2896,15 @@ def amood_scan_status(user: str = Depends(_get_current_user)):
 
 
 @app.post("/amood/reset")
-def amood_reset(user: str = Depends(_get_current_user)):
+def amood_reset(user: str = Depends(_get_scan_user)):
+    _commit_scan_op("amood", user, "reset")
+    SCRATCH.clear_session(user)
     state = _get_amood_state(user)
-    _amood_reset_state(state)
     return {"ok": True, "status": _amood_status(state)}
 
 
 @app.post("/amood/scan/invoice")
-def amood_scan_invoice(payload: dict = Body(...), user: str = Depends(_get_current_user)):
+def amood_scan_invoice(payload: dict = Body(...), user: str = Depends(_get_scan_user)):
     state = _get_amood_state(user)
     _amood_load_workbooks(state)
 
@@ -2436,9 +2966,7 @@ def amood_scan_invoice(payload: dict = Body(...), user: str = Depends(_get_curre
     if not pending:
         return {"ok": False, "type": "invoice", "result": "NO_ITEMS", "invoice": invoice}
 
-    state.current_invoice = invoice
-    state.pending_items = pending
-    state.waiting_for_items = True
+    _commit_scan_op("amood", user, "invoice", {"invoice": invoice, "items": pending})
 
     return {
         "ok": True,
@@ -2451,7 +2979,7 @@ def amood_scan_invoice(payload: dict = Body(...), user: str = Depends(_get_curre
 
 
 @app.post("/amood/scan/item")
-def amood_scan_item(payload: dict = Body(...), user: str = Depends(_get_current_user)):
+def amood_scan_item(payload: dict = Body(...), user: str = Depends(_get_scan_user)):
     state = _get_amood_state(user)
     if not state.waiting_for_items or not state.pending_items:
         return {"ok": False, "type": "item", "result": "NO_INVOICE"}
@@ -2461,16 +2989,23 @@ def amood_scan_item(payload: dict = Body(...), user: str = Depends(_get_current_
         raise HTTPException(status_code=400, detail="code 값이 비어있음")
 
     scan = _amood_norm_barcode(raw)
-    matched = None
-    for it in state.pending_items:
-        if it.get("remaining", 0) <= 0:
-            continue
-        target = _amood_norm_barcode(it.get("barcode", ""))
-        if target and (target == scan or scan in target or target in scan):
-            matched = it
-            break
 
-    if matched is None:
+    def decide():
+        # 남은 수량은 잠금 안에서 본다 (같은 계정의 스테이션 여러 대가 마지막 1개를 같이 TRUE로 받지 않게)
+        state = _get_amood_state(user)
+        if not state.waiting_for_items:
+            return None
+        for i, it in enumerate(state.pending_items):
+            if it.get("remaining", 0) <= 0:
+                continue
+            target = _amood_norm_barcode(it.get("barcode", ""))
+            if target and (target == scan or scan in target or target in scan):
+                return "item", {"index": i, "remaining": int(it.get("remaining", 0)) - 1}
+        return None
+
+    committed = _commit_scan_op("amood", user, decide=decide)
+    state = _get_amood_state(user)
+    if committed is None:
         return {
             "ok": True,
             "type": "item",
@@ -2479,16 +3014,8 @@ def amood_scan_item(payload: dict = Body(...), user: str = Depends(_get_current_
             "remain": 0,
             "items": _amood_items_view(state),
         }
-
-    matched["remaining"] = int(matched.get("remaining", 0)) - 1
-    try:
-        _amood_ws_cell(state.ws2, AMOOD_COL2_QTY, matched["row"]).value = matched["remaining"]
-    except Exception:
-        pass
-
+    matched = state.pending_items[committed[1]["index"]]
     all_done = all(it.get("remaining", 0) <= 0 for it in state.pending_items)
-    if all_done:
-        state.waiting_for_items = False
 
     return {
         "ok": True,
@@ -2503,7 +3030,7 @@ def amood_scan_item(payload: dict = Body(...), user: str = Depends(_get_current_
 
 
 @app.post("/amood/export-shipping")
-def amood_export_shipping(user: str = Depends(_get_current_user)):
+def amood_export_shipping(user: str = Depends(_get_scan_user)):
     state = _get_amood_state(user)
     if not state.file1_path or not state.file2_path:
         raise HTTPException(status_code=400, detail="excel1/excel2가 모두 필요합니다.")
@@ -2516,55 +3043,56 @@ def amood_export_shipping(user: str = Depends(_get_current_user)):
     wb1, ws1 = state.wb1, state.ws1
     wb2, ws2 = state.wb2, state.ws2
 
-    _amood_fill_down_merged_column(ws2, AMOOD_COL2_ORDER_KEY, start_row=2)
+    with metrics.span("export_build", "amood_shipping"):
+        _amood_fill_down_merged_column(ws2, AMOOD_COL2_ORDER_KEY, start_row=2)
 
-    rows: list[dict] = []
-    seen_codes: set[str] = set()
-    for r in range(2, ws1.max_row + 1):
-        order_key = _amood_ws_cell(ws1, AMOOD_COL1_ORDER_KEY, r).value
-        if not order_key:
-            continue
-        order_key = str(order_key).strip()
-        matched_rows = _amood_collect_rows_by_value(ws2, AMOOD_COL2_ORDER_KEY, order_key, start_row=2)
-        if not matched_rows:
-            continue
-        outputs: list[str] = []
-        for r2 in matched_rows:
-            out_val = _amood_ws_cell(ws2, AMOOD_COL2_OUTPUT, r2).value
-            if out_val is None or str(out_val).strip() == "":
-                name = _amood_ws_cell(ws2, AMOOD_COL2_NAME, r2).value
-                option = _amood_ws_cell(ws2, AMOOD_COL2_OPTION, r2).value
-                qty = _amood_ws_cell(ws2, AMOOD_COL2_QTY, r2).value
-                out_val = _amood_build_output_text(name, option, qty)
-            out_text = str(out_val).strip() if out_val is not None else ""
-            if out_text and out_text not in outputs:
-                outputs.append(out_text)
-        description = " / ".join(outputs)
-        code = _amood_ws_cell(ws1, AMOOD_COL1_SCAN_BARCODE, r).value
-        code = str(code).strip() if code else ""
-        if not code:
-            continue
-        if code in seen_codes:
-            continue
-        seen_codes.add(code)
-        b_val = _amood_ws_cell(ws1, AMOOD_COL1_NUM_B, r).value
-        c_val = _amood_ws_cell(ws1, AMOOD_COL1_NUM_C, r).value
-        try:
-            b_val = int(b_val)
-            c_val = int(c_val)
-        except Exception:
-            continue
-        title = f"{c_val}-{b_val}"
-        rows.append({"Title": title, "Description": description, "Code": code})
+        rows: list[dict] = []
+        seen_codes: set[str] = set()
+        for r in range(2, ws1.max_row + 1):
+            order_key = _amood_ws_cell(ws1, AMOOD_COL1_ORDER_KEY, r).value
+            if not order_key:
+                continue
+            order_key = str(order_key).strip()
+            matched_rows = _amood_collect_rows_by_value(ws2, AMOOD_COL2_ORDER_KEY, order_key, start_row=2)
+            if not matched_rows:
+                continue
+            outputs: list[str] = []
+            for r2 in matched_rows:
+                out_val = _amood_ws_cell(ws2, AMOOD_COL2_OUTPUT, r2).value
+                if out_val is None or str(out_val).strip() == "":
+                    name = _amood_ws_cell(ws2, AMOOD_COL2_NAME, r2).value
+                    option = _amood_ws_cell(ws2, AMOOD_COL2_OPTION, r2).value
+                    qty = _amood_ws_cell(ws2, AMOOD_COL2_QTY, r2).value
+                    out_val = _amood_build_output_text(name, option, qty)
+                out_text = str(out_val).strip() if out_val is not None else ""
+                if out_text and out_text not in outputs:
+                    outputs.append(out_text)
+            description = " / ".join(outputs)
+            code = _amood_ws_cell(ws1, AMOOD_COL1_SCAN_BARCODE, r).value
+            code = str(code).strip() if code else ""
+            if not code:
+                continue
+            if code in seen_codes:
+                continue
+            seen_codes.add(code)
+            b_val = _amood_ws_cell(ws1, AMOOD_COL1_NUM_B, r).value
+            c_val = _amood_ws_cell(ws1, AMOOD_COL1_NUM_C, r).value
+            try:
+                b_val = int(b_val)
+                c_val = int(c_val)
+            except Exception:
+                continue
+            title = f"{c_val}-{b_val}"
+            rows.append({"Title": title, "Description": description, "Code": code})
 
-    if not rows:
-        raise HTTPException(status_code=400, detail="추출할 데이터가 없습니다.")
+        if not rows:
+            raise HTTPException(status_code=400, detail="추출할 데이터가 없습니다.")
 
-    df = pd.DataFrame(rows, columns=["Title", "Description", "Code"])
-    buf = io.BytesIO()
-    with pd.ExcelWriter(buf, engine="openpyxl") as writer:
-        df.to_excel(writer, index=False)
-    buf.seek(0)
+        df = pd.DataFrame(rows, columns=["Title", "Description", "Code"])
+        buf = io.BytesIO()
+        with pd.ExcelWriter(buf, engine="openpyxl") as writer:
+            df.to_excel(writer, index=False)
+        buf.seek(0)
     filename = "선적바코드_추출.xlsx"
     headers = {"Content-Disposition": _content_disposition(filename)}
     return Response(
@@ -2577,23 +3105,14 @@ def amood_export_shipping(user: str = Depends(_get_current_user)):
 @app.post("/returns/excel1")
 def returns_upload_excel1(
     file: UploadFile = File(...),
-    user: str = Depends(_get_current_user),
+    user: str = Depends(_get_scan_user),
 ):
     ext = Path(file.filename or "").suffix.lower()
     if ext not in RETURN_ALLOWED_EXTS:
         raise HTTPException(status_code=400, detail="xls/xlsx/xlsm만 업로드 가능")
 
-    tmp_path = Path(tempfile.gettempdir()) / f"returns_excel1_{uuid.uuid4().hex}{ext}"
-    with tmp_path.open("wb") as out:
-        shutil.copyfileobj(file.file, out)
-
-    try:
-        df = _read_return_excel(tmp_path)
-    finally:
-        try:
-            tmp_path.unlink(missing_ok=True)
-        except Exception:
-            pass
+    with ingest_upload_sync(file, "returns_excel1", ext, **_scratch_upload(user)) as upload:
+        df = _read_return_excel(upload.path)
 
     if df.shape[1] < 5:
         raise HTTPException(status_code=400, detail="1번 엑셀에 D/E열이 없습니다. (열 개수가 부족)")
@@ -2608,32 +3127,22 @@ def returns_upload_excel1(
         if d and d not in mapping:
             mapping[d] = e
 
+    _commit_scan_op("returns", user, "excel1", {"map": mapping})
     state = _get_return_state(user)
-    state.df1 = df
-    state.map_d_to_e = mapping
     return {"ok": True, "map_count": len(mapping), "status": _return_status(state)}
 
 
 @app.post("/returns/excel2")
 def returns_upload_excel2(
     file: UploadFile = File(...),
-    user: str = Depends(_get_current_user),
+    user: str = Depends(_get_scan_user),
 ):
     ext = Path(file.filename or "").suffix.lower()
     if ext not in RETURN_ALLOWED_EXTS:
         raise HTTPException(status_code=400, detail="xls/xlsx/xlsm만 업로드 가능")
 
-    tmp_path = Path(tempfile.gettempdir()) / f"returns_excel2_{uuid.uuid4().hex}{ext}"
-    with tmp_path.open("wb") as out:
-        shutil.copyfileobj(file.file, out)
-
-    try:
-        df = _read_return_excel(tmp_path)
-    finally:
-        try:
-            tmp_path.unlink(missing_ok=True)
-        except Exception:
-            pass
+    with ingest_upload_sync(file, "returns_excel2", ext, **_scratch_upload(user)) as upload:
+        df = _read_return_excel(upload.path)
 
     if df.shape[1] < 13:
         raise HTTPException(status_code=400, detail="2번 엑셀에 필요한 열(F,G,H,K,M)이 없습니다. (열 개수가 부족)")
@@ -2651,21 +3160,21 @@ def returns_upload_excel2(
             continue
         idx.setdefault(v, []).append(i)
 
+    rows = df[["ITEM_TEXT", "QTY", "REASON_TYPE"]].values.tolist()
+    _commit_scan_op("returns", user, "excel2", {"rows": rows, "index": idx})
     state = _get_return_state(user)
-    state.df2 = df
-    state.df2_index = idx
     return {"ok": True, "index_count": len(idx), "status": _return_status(state)}
 
 
 @app.post("/returns/cost-base/reload")
-def returns_cost_base_reload(user: str = Depends(_get_current_user)):
-    state = _get_return_state(user)
+def returns_cost_base_reload(user: str = Depends(_get_scan_user)):
     try:
-        _load_return_cost_base(state)
+        _commit_scan_op("returns", user, "cost")
     except FileNotFoundError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"원가베이스 로드 실패: {e}")
+    state = _get_return_state(user)
     return {"ok": True, "cost_count": len(state.cost_map), "status": _return_status(state)}
 
 
@@ -2679,25 +3188,15 @@ def returns_cost_base_upload(
         raise HTTPException(status_code=400, detail="xls/xlsx/xlsm만 업로드 가능")
 
     RETURN_COST_BASE_PATH.parent.mkdir(parents=True, exist_ok=True)
-    tmp_path = Path(tempfile.gettempdir()) / f"returns_cost_base_{uuid.uuid4().hex}{ext}"
-    with tmp_path.open("wb") as out:
-        shutil.copyfileobj(file.file, out)
-
-    try:
-        df = _read_return_excel(tmp_path)
+    with ingest_upload_sync(file, "returns_cost_base", ext, **_scratch_upload(admin)) as upload:
+        df = _read_return_excel(upload.path)
         if df.shape[1] < 2:
             raise HTTPException(status_code=400, detail="원가베이스는 최소 A,B열이 필요합니다.")
-        shutil.move(str(tmp_path), str(RETURN_COST_BASE_PATH))
-    finally:
-        try:
-            tmp_path.unlink(missing_ok=True)
-        except Exception:
-            pass
+        shutil.move(str(upload.path), str(RETURN_COST_BASE_PATH))
 
     # 업데이트된 파일로 다시 로드
+    _commit_scan_op("returns", admin, "cost")
     state = _get_return_state(admin)
-    state.cost_base_path = RETURN_COST_BASE_PATH
-    _load_return_cost_base(state)
 
     return {"ok": True, "status": _return_status(state)}
 
@@ -2712,13 +3211,22 @@ def returns_cost_base_download(admin: str = Depends(_require_admin)):
 
 @app.get("/returns/cost-base/preview")
 def returns_cost_base_preview(
+    request: Request,
+    response: Response,
     offset: int = 0,
     limit: int = 50,
     q: str | None = None,
-    user: str = Depends(_get_current_user),
+    user: str = Depends(_get_scan_user),
 ):
     if offset < 0 or limit <= 0 or limit > 200:
         raise HTTPException(status_code=400, detail="offset/limit 값이 올바르지 않습니다.")
+    sig = _file_signature(RETURN_COST_BASE_PATH)
+    if sig != "none":
+        q_key = hashlib.sha1((q or "").strip().encode("utf-8")).hexdigest()[:12]
+        etag = f'W/"cost-base-{sig}-{offset}-{limit}-{q_key}"'
+        not_modified = _conditional(request, response, etag)
+        if not_modified:
+            return not_modified
     try:
         df = _load_cost_base_df()
     except FileNotFoundError as e:
@@ -2755,7 +3263,7 @@ def returns_cost_base_preview(
 
 
 @app.post("/returns/cost-base/edit")
-def returns_cost_base_edit(payload: dict = Body(...), user: str = Depends(_get_current_user)):
+def returns_cost_base_edit(payload: dict = Body(...), user: str = Depends(_get_scan_user)):
     row_index = payload.get("row_index")
     column = payload.get("column")
     value = payload.get("value")
@@ -2794,7 +3302,7 @@ def returns_cost_base_edit(payload: dict = Body(...), user: str = Depends(_get_c
 
 
 @app.post("/returns/cost-base/edit-batch")
-def returns_cost_base_edit_batch(payload: dict = Body(...), user: str = Depends(_get_current_user)):
+def returns_cost_base_edit_batch(payload: dict = Body(...), user: str = Depends(_get_scan_user)):
     edits = payload.get("edits")
     if not isinstance(edits, list) or not edits:
         raise HTTPException(status_code=400, detail="edits 값이 올바르지 않습니다.")
@@ -2833,22 +3341,28 @@ def returns_cost_base_edit_batch(payload: dict = Body(...), user: str = Depends(
 
 
 @app.post("/returns/scan")
-def returns_scan(payload: dict = Body(...), user: str = Depends(_get_current_user)):
+def returns_scan(payload: dict = Body(...), user: str = Depends(_get_scan_user)):
     barcode_raw = (payload.get("barcode") or "").strip()
     barcode = _clean_invoice(barcode_raw)
     if not barcode:
         raise HTTPException(status_code=400, detail="barcode 값이 비어있음")
 
+    # 중복 확인과 항목 id(next_id)는 잠금 안에서 정한다 (같은 계정의 스테이션 여러 대가 같은 id를 받지 않게)
+    op, _ = _commit_scan_op("returns", user, decide=lambda: _returns_scan_decision(_get_return_state(user), barcode))
     state = _get_return_state(user)
-
-    if barcode in state.scanned_barcodes:
-        state.last_type = "중복"
+    if op == "duplicate":
         return {
             "ok": True,
             "duplicate": True,
             "last_type": state.last_type,
             "queues": _return_queue_payload(state),
         }
+    return {"ok": True, "last_type": state.last_type, "queues": _return_queue_payload(state)}
+
+
+def _returns_scan_decision(state: ReturnState, barcode: str) -> tuple[str, dict]:
+    if barcode in state.scanned_barcodes:
+        return "duplicate", {}
 
     if not state.map_d_to_e:
         raise HTTPException(status_code=400, detail="먼저 1번 엑셀을 불러오세요.")
@@ -2858,25 +3372,18 @@ def returns_scan(payload: dict = Body(...), user: str = Depends(_get_current_use
     e_val = state.map_d_to_e.get(barcode, "")
     if not e_val:
         msg = f"[미매칭] 스캔:{barcode} → 1번(D)에서 찾지 못함"
-        state.queue_unmatched.append(
-            {"id": state.next_id, "scan": barcode, "match": "", "item_text": msg, "qty": "", "type": "미매칭"}
-        )
-        state.next_id += 1
-        state.last_type = "미매칭"
-        return {"ok": True, "last_type": state.last_type, "queues": _return_queue_payload(state)}
+        item = {"id": state.next_id, "scan": barcode, "match": "", "item_text": msg, "qty": "", "type": "미매칭"}
+        return "unmatched", {"item": item}
 
     row_indexes = state.df2_index.get(e_val, [])
     if not row_indexes:
         msg = f"[미매칭] 스캔:{barcode} → 1번(E):{e_val} → 2번(M)에서 찾지 못함"
-        state.queue_unmatched.append(
-            {"id": state.next_id, "scan": barcode, "match": e_val, "item_text": msg, "qty": "", "type": "미매칭"}
-        )
-        state.next_id += 1
-        state.last_type = "미매칭"
-        return {"ok": True, "last_type": state.last_type, "queues": _return_queue_payload(state)}
+        item = {"id": state.next_id, "scan": barcode, "match": e_val, "item_text": msg, "qty": "", "type": "미매칭"}
+        return "unmatched", {"item": item}
 
-    state.last_added_ids = []
+    items = []
     last_types = set()
+    next_id = state.next_id
 
     for row_i in row_indexes:
         row = state.df2.iloc[row_i]
@@ -2886,69 +3393,45 @@ def returns_scan(payload: dict = Body(...), user: str = Depends(_get_current_use
         if rtype not in ("판매자", "고객"):
             rtype = "미매칭"
 
-        item = {
-            "id": state.next_id,
-            "scan": barcode,
-            "match": e_val,
-            "item_text": item_text,
-            "qty": qty,
-            "type": rtype,
-        }
-        state.next_id += 1
-        state.last_added_ids.append(item["id"])
-
-        if rtype == "판매자":
-            state.queue_seller.append(item)
-        elif rtype == "고객":
-            state.queue_customer.append(item)
-        else:
-            state.queue_unmatched.append(item)
-
-        state.all_items.append(item)
+        items.append(
+            {
+                "id": next_id,
+                "scan": barcode,
+                "match": e_val,
+                "item_text": item_text,
+                "qty": qty,
+                "type": rtype,
+            }
+        )
+        next_id += 1
         last_types.add(rtype)
 
     if len(last_types) == 1:
-        state.last_type = next(iter(last_types))
+        last_type = next(iter(last_types))
     else:
-        state.last_type = "혼합(" + ",".join(sorted(last_types)) + ")"
+        last_type = "혼합(" + ",".join(sorted(last_types)) + ")"
 
-    state.scanned_barcodes.add(barcode)
-
-    return {"ok": True, "last_type": state.last_type, "queues": _return_queue_payload(state)}
+    return "scan", {"barcode": barcode, "items": items, "last_type": last_type}
 
 
 @app.post("/returns/undo")
-def returns_undo(user: str = Depends(_get_current_user)):
+def returns_undo(user: str = Depends(_get_scan_user)):
     state = _get_return_state(user)
     if not state.last_added_ids:
         raise HTTPException(status_code=400, detail="삭제할 최근 스캔 기록이 없습니다.")
 
-    remove_ids = set(state.last_added_ids)
-    state.queue_seller = [it for it in state.queue_seller if it.get("id") not in remove_ids]
-    state.queue_customer = [it for it in state.queue_customer if it.get("id") not in remove_ids]
-    state.queue_unmatched = [it for it in state.queue_unmatched if it.get("id") not in remove_ids]
-    state.all_items = [it for it in state.all_items if it.get("id") not in remove_ids]
-    state.last_added_ids = []
-    state.last_type = "-"
+    _commit_scan_op("returns", user, "undo")
     return {"ok": True, "queues": _return_queue_payload(state), "last_type": state.last_type}
 
 
 @app.post("/returns/reset")
-def returns_reset(user: str = Depends(_get_current_user)):
-    state = _get_return_state(user)
-    state.queue_seller.clear()
-    state.queue_customer.clear()
-    state.queue_unmatched.clear()
-    state.all_items.clear()
-    state.last_added_ids.clear()
-    state.scanned_barcodes.clear()
-    state.customer_export_df = pd.DataFrame()
-    state.last_type = "-"
+def returns_reset(user: str = Depends(_get_scan_user)):
+    _commit_scan_op("returns", user, "reset")
     return {"ok": True}
 
 
 @app.post("/returns/onebe/build")
-def returns_build_onebe(payload: dict = Body(None), user: str = Depends(_get_current_user)):
+def returns_build_onebe(payload: dict = Body(None), user: str = Depends(_get_scan_user)):
     state = _get_return_state(user)
     source = (payload or {}).get("source", "customer")
     if source == "all":
@@ -2962,7 +3445,7 @@ def returns_build_onebe(payload: dict = Body(None), user: str = Depends(_get_cur
 
     if not state.cost_map:
         try:
-            _load_return_cost_base(state)
+            _commit_scan_op("returns", user, "cost")
         except Exception:
             raise HTTPException(status_code=400, detail="원가베이스를 먼저 불러오세요.")
 
@@ -2986,12 +3469,12 @@ def returns_build_onebe(payload: dict = Body(None), user: str = Depends(_get_cur
             }
         )
 
-    state.customer_export_df = pd.DataFrame(rows)
+    _commit_scan_op("returns", user, "onebe", _onebe_payload(pd.DataFrame(rows)))
     return {"ok": True, "onebe": {"rows": _return_rows(state.customer_export_df)}}
 
 
 @app.post("/returns/onebe/consolidate")
-def returns_consolidate_onebe(user: str = Depends(_get_current_user)):
+def returns_consolidate_onebe(user: str = Depends(_get_scan_user)):
     state = _get_return_state(user)
     if state.customer_export_df is None or state.customer_export_df.empty:
         raise HTTPException(status_code=400, detail="먼저 '고객대기 → 원베양식 생성'을 실행하세요.")
@@ -3048,12 +3531,12 @@ def returns_consolidate_onebe(user: str = Depends(_get_current_user)):
     agg.rename(columns={"매칭송장": "요청메모"}, inplace=True)
 
     new_df = pd.concat([agg, df_empty], ignore_index=True)
-    state.customer_export_df = new_df
+    _commit_scan_op("returns", user, "onebe", _onebe_payload(new_df))
     return {"ok": True, "onebe": {"rows": _return_rows(state.customer_export_df)}}
 
 
 @app.post("/returns/onebe/edit")
-def returns_edit_onebe(payload: dict = Body(...), user: str = Depends(_get_current_user)):
+def returns_edit_onebe(payload: dict = Body(...), user: str = Depends(_get_scan_user)):
     state = _get_return_state(user)
     if state.customer_export_df is None or state.customer_export_df.empty:
         raise HTTPException(status_code=400, detail="원베양식 데이터가 없습니다.")
@@ -3077,12 +3560,12 @@ def returns_edit_onebe(payload: dict = Body(...), user: str = Depends(_get_curre
         except Exception:
             raise HTTPException(status_code=400, detail="수량은 숫자여야 합니다.")
 
-    state.customer_export_df.at[row_index, column] = value
+    _commit_scan_op("returns", user, "onebe_edit", {"row_index": row_index, "column": column, "value": value})
     return {"ok": True}
 
 
 @app.post("/returns/download/onebe")
-def returns_download_onebe(payload: dict = Body(...), user: str = Depends(_get_current_user)):
+def returns_download_onebe(payload: dict = Body(...), user: str = Depends(_get_scan_user)):
     state = _get_return_state(user)
     if state.customer_export_df is None or state.customer_export_df.empty:
         raise HTTPException(status_code=400, detail="원베양식 데이터가 없습니다.")
@@ -3111,27 +3594,28 @@ def returns_download_onebe(payload: dict = Body(...), user: str = Depends(_get_c
             rename_map[c] = val.strip()
     if rename_map:
         out.rename(columns=rename_map, inplace=True)
-    buf = io.BytesIO()
-    if fmt == "xlsx":
-        with pd.ExcelWriter(buf, engine="openpyxl") as writer:
-            out.to_excel(writer, index=False, sheet_name="원베양식")
-        filename = "원베_고객대기_추출.xlsx"
-        media_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    else:
-        try:
-            import xlwt  # noqa: F401
-        except Exception:
-            raise HTTPException(status_code=400, detail="xls 저장을 위해 xlwt 설치가 필요합니다.")
-        with pd.ExcelWriter(buf, engine="xlwt") as writer:
-            out.to_excel(writer, index=False, sheet_name="원베양식")
-        filename = "원베_고객대기_추출.xls"
-        media_type = "application/vnd.ms-excel"
+    with metrics.span("export_build", "returns_onebe"):
+        buf = io.BytesIO()
+        if fmt == "xlsx":
+            with pd.ExcelWriter(buf, engine="openpyxl") as writer:
+                out.to_excel(writer, index=False, sheet_name="원베양식")
+            filename = "원베_고객대기_추출.xlsx"
+            media_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        else:
+            try:
+                import xlwt  # noqa: F401
+            except Exception:
+                raise HTTPException(status_code=400, detail="xls 저장을 위해 xlwt 설치가 필요합니다.")
+            with pd.ExcelWriter(buf, engine="xlwt") as writer:
+                out.to_excel(writer, index=False, sheet_name="원베양식")
+            filename = "원베_고객대기_추출.xls"
+            media_type = "application/vnd.ms-excel"
     headers = {"Content-Disposition": _content_disposition(filename)}
     return Response(content=buf.getvalue(), media_type=media_type, headers=headers)
 
 
 @app.post("/returns/download/queues")
-def returns_download_queues(payload: dict = Body(...), user: str = Depends(_get_current_user)):
+def returns_download_queues(payload: dict = Body(...), user: str = Depends(_get_scan_user)):
     state = _get_return_state(user)
     if (not state.queue_seller) and (not state.queue_customer) and (not state.queue_unmatched):
         raise HTTPException(status_code=400, detail="추출할 대기 데이터가 없습니다.")
@@ -3158,25 +3642,158 @@ def returns_download_queues(payload: dict = Body(...), user: str = Depends(_get_
                 inplace=True,
             )
 
-    buf = io.BytesIO()
-    if fmt == "xlsx":
-        with pd.ExcelWriter(buf, engine="openpyxl") as writer:
-            df_seller.to_excel(writer, index=False, sheet_name="판매자")
-            df_customer.to_excel(writer, index=False, sheet_name="고객")
-            df_unmatched.to_excel(writer, index=False, sheet_name="미매칭")
-        filename = "반품대기_추출.xlsx"
-        media_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    else:
-        try:
-            import xlwt  # noqa: F401
-        except Exception:
-            raise HTTPException(status_code=400, detail="xls 저장을 위해 xlwt 설치가 필요합니다.")
-        with pd.ExcelWriter(buf, engine="xlwt") as writer:
-            df_seller.to_excel(writer, index=False, sheet_name="판매자")
-            df_customer.to_excel(writer, index=False, sheet_name="고객")
-            df_unmatched.to_excel(writer, index=False, sheet_name="미매칭")
-        filename = "반품대기_추출.xls"
-        media_type = "application/vnd.ms-excel"
-
+    with metrics.span("export_build", "returns_queues"):
+        buf = io.BytesIO()
+        if fmt == "xlsx":
+            with pd.ExcelWriter(buf, engine="openpyxl") as writer:
+                df_seller.to_excel(writer, index=False, sheet_name="판매자")
+                df_customer.to_excel(writer, index=False, sheet_name="고객")
+                df_unmatched.to_excel(writer, index=False, sheet_name="미매칭")
+            filename = "반품대기_추출.xlsx"
+            media_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        else:
+            try:
+                import xlwt  # noqa: F401
+            except Exception:
+                raise HTTPException(status_code=400, detail="xls 저장을 위해 xlwt 설치가 필요합니다.")
+            with pd.ExcelWriter(buf, engine="xlwt") as writer:
+                df_seller.to_excel(writer, index=False, sheet_name="판매자")
+                df_customer.to_excel(writer, index=False, sheet_name="고객")
+                df_unmatched.to_excel(writer, index=False, sheet_name="미매칭")
+            filename = "반품대기_추출.xls"
+            media_type = "application/vnd.ms-excel"
     headers = {"Content-Disposition": _content_disposition(filename)}
     return Response(content=buf.getvalue(), media_type=media_type, headers=headers)
+
+
+@app.get("/admin/scratch")
+def admin_scratch_stats(admin: str = Depends(_require_admin)):
+    return SCRATCH.stats()
+
+
+@app.get("/metrics")
+def metrics_export(authorization: str | None = Header(None)):
+    # 스크레이퍼는 METRICS_TOKEN, 그 밖에는 관리자 로그인 토큰이 있어야 한다. 익명 공개는 METRICS_PUBLIC=1일 때만
+    scraper = bool(metrics.METRICS_TOKEN) and hmac.compare_digest(authorization or "", f"Bearer {metrics.METRICS_TOKEN}")
+    if not (metrics.METRICS_PUBLIC or scraper):
+        _require_admin(_get_token_payload(authorization))
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+@app.get("/admin/metrics/samples")
+def admin_metrics_samples(admin: str = Depends(_require_admin)):
+    # 느린 요청 + 샘플링된 요청의 구간별 시간 (최신이 앞)
+    return {"ok": True, "slow_ms": metrics.METRICS_SLOW_MS, "sample_rate": metrics.METRICS_SAMPLE_RATE,
+            "samples": metrics.samples()[::-1]}
+
+
+PROFILE_KEEP = max(1, int(os.environ.get("PROFILE_KEEP", "50")))
+
+
+def _save_profile(record: dict):
+    conn = _get_db()
+    try:
+        conn.execute(
+            """
+            INSERT INTO profiles (created_at, armed_by, method, route, path, status, duration_ms, samples,
+                                  interval_ms, top, collapsed)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                record["created_at"], record["armed_by"], record["method"], record["route"], record["path"],
+                record["status"], record["duration_ms"], record["samples"], record["interval_ms"],
+                json.dumps(record["top"], ensure_ascii=False), record["collapsed"],
+            ),
+        )
+        conn.execute(
+            "DELETE FROM profiles WHERE id NOT IN (SELECT id FROM profiles ORDER BY id DESC LIMIT ?)", (PROFILE_KEEP,)
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    print(f"[profiler] saved {record['method']} {record['path']} {record['duration_ms']:.0f}ms {record['samples']} samples")
+
+
+PROFILER = Profiler(save=_save_profile)
+# 무장된 라우트의 다음 N개 요청을 샘플링 프로파일러로 잰다 (POST /admin/profiler/arm)
+app.add_middleware(ProfilerMiddleware, profiler=PROFILER)
+
+
+@app.post("/admin/profiler/arm")
+def admin_profiler_arm(payload: dict = Body(...), admin: str = Depends(_require_admin)):
+    route = (payload.get("route") or "").strip()
+    method = (payload.get("method") or "POST").strip().upper()
+    try:
+        count = int(payload.get("count") or 1)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="count must be an integer")
+    target = next(
+        (r for r in app.routes if getattr(r, "path", None) == route and method in (getattr(r, "methods", None) or ())),
+        None,
+    )
+    if target is None:
+        raise HTTPException(status_code=404, detail=f"라우트를 찾을 수 없습니다: {method} {route}")
+    return {"ok": True, "arm": PROFILER.arm(method, route, target.path_regex, count, admin)}
+
+
+@app.delete("/admin/profiler/arm")
+def admin_profiler_disarm(route: str, method: str = "POST", admin: str = Depends(_require_admin)):
+    return {"ok": True, "removed": PROFILER.disarm(method.strip().upper(), route.strip())}
+
+
+@app.get("/admin/profiler")
+def admin_profiler_list(admin: str = Depends(_require_admin)):
+    conn = _get_db()
+    rows = conn.execute(
+        """
+        SELECT id, created_at, armed_by, method, route, path, status, duration_ms, samples, interval_ms, top
+        FROM profiles ORDER BY id DESC
+        """
+    ).fetchall()
+    conn.close()
+    profiles = []
+    for r in rows:
+        item = dict(r)
+        item["top"] = json.loads(r["top"])[:5]
+        profiles.append(item)
+    return {"ok": True, "interval_ms": PROFILER_INTERVAL_MS, "arms": PROFILER.arms(), "profiles": profiles}
+
+
+@app.get("/admin/profiler/{profile_id}")
+def admin_profiler_download(profile_id: int, format: str = "collapsed", admin: str = Depends(_require_admin)):
+    conn = _get_db()
+    row = conn.execute("SELECT * FROM profiles WHERE id = ?", (profile_id,)).fetchone()
+    conn.close()
+    if not row:
+        raise HTTPException(status_code=404, detail="profile not found")
+    if format == "json":
+        item = dict(row)
+        item["top"] = json.loads(row["top"])
+        return {"ok": True, "profile": item}
+    # flamegraph.pl / speedscope에 그대로 넣을 수 있는 collapsed stack
+    filename = f"profile_{profile_id}.collapsed.txt"
+    headers = {"Content-Disposition": _content_disposition(filename)}
+    return Response(content=row["collapsed"].encode("utf-8"), media_type="text/plain; charset=utf-8", headers=headers)
+
+
+def _bootstrap():
+    """lifespan에서 워커마다 한 번. 스키마 마이그레이션, 토큰 epoch, 기본 PIN/관리자 계정을 한 트랜잭션으로 처리하고
+    스캔 상태 저장소를 열어 저널을 재생한다."""
+    global TOKEN_EPOCH, STATE_STORE
+    conn = _get_db()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        apply_migrations(conn)
+        TOKEN_EPOCH = _load_token_epoch(conn)
+        _ensure_default_company_pin(conn)
+        _ensure_bootstrap_admin(conn)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    if STATE_STORE is None:
+        STATE_STORE = create_state_store(STATE_STORE_BACKEND, _SCAN_APPLIERS, SCAN_JOURNAL_PATH, _SCAN_RESETTERS)
+    STATE_STORE.replay()
+    SCRATCH.start_sweeper(SCRATCH_SWEEP_INTERVAL)
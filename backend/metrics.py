@@ -0,0 +1,229 @@
+# backend/metrics.py
+# 요청/구간 계측과 /metrics(Prometheus 텍스트 형식).
+#   - 외부 라이브러리 없이 카운터/히스토그램만 직접 들고 있다. 값은 프로세스(워커)마다 따로 쌓인다.
+#   - MetricsMiddleware: 라우트(경로 템플릿)별 요청 수, 지연, 요청/응답 크기.
+#     매칭되지 않은 경로는 "<unmatched>" 하나로 묶어서 라벨 개수가 늘어나지 않게 한다.
+#   - span(stage, detail): 엑셀 로드, 정규화, 정렬, 연속 스캔 계산, 내보내기 같은 구간 시간.
+#     observe_query(): db.py 커넥션 풀이 부르는 SQLite 쿼리 시간 (execute 호출 기준, fetch는 빠진다).
+#   - 샘플링: METRICS_SAMPLE_RATE 비율의 요청과 METRICS_SLOW_MS를 넘긴 요청은 구간별 시간까지 남긴다 (최근 METRICS_SAMPLE_KEEP개).
+#     느린 요청은 한 줄 로그도 찍는다.
+import contextvars
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") == "1"
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+METRICS_PUBLIC = os.environ.get("METRICS_PUBLIC", "0") == "1"
+METRICS_SAMPLE_RATE = min(1.0, max(0.0, float(os.environ.get("METRICS_SAMPLE_RATE", "0"))))
+METRICS_SLOW_MS = max(0.0, float(os.environ.get("METRICS_SLOW_MS", "1000")))
+METRICS_SAMPLE_KEEP = max(1, int(os.environ.get("METRICS_SAMPLE_KEEP", "200")))
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+SQL_OPS = {"SELECT", "INSERT", "UPDATE", "DELETE", "REPLACE", "WITH", "PRAGMA", "CREATE", "BEGIN", "COMMIT"}
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _num(v: float) -> str:
+    return str(int(v)) if float(v).is_integer() else repr(float(v))
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: tuple):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: tuple, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        out += [f"{self.name}{_labels(self.labelnames, k)} {_num(v)}" for k, v in items]
+        return out
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: tuple, buckets: tuple):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # 라벨 → [칸별 개수..., 합계, 개수]
+        self._values: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: tuple, value: float):
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for i, edge in enumerate(self.buckets):
+                if value <= edge:
+                    state[i] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._values.items())
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, state in items:
+            running = 0
+            for edge, n in zip(self.buckets, state):
+                running += n
+                le = 'le="%s"' % _num(edge)
+                out.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {running}")
+            le = 'le="+Inf"'
+            out.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {state[-1]}")
+            out.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {repr(state[-2])}")
+            out.append(f"{self.name}_count{_labels(self.labelnames, labels)} {state[-1]}")
+        return out
+
+
+REQUESTS = Counter("http_requests_total", "HTTP requests by route and status", ("method", "route", "status"))
+LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ("method", "route"), LATENCY_BUCKETS
+)
+REQUEST_SIZE = Histogram("http_request_size_bytes", "HTTP request body size", ("method", "route"), SIZE_BUCKETS)
+RESPONSE_SIZE = Histogram("http_response_size_bytes", "HTTP response body size", ("method", "route"), SIZE_BUCKETS)
+STAGES = Histogram("stage_duration_seconds", "Time spent in hot stages", ("stage", "detail"), LATENCY_BUCKETS)
+QUERIES = Histogram("sqlite_query_duration_seconds", "app.db execute time", ("op",), LATENCY_BUCKETS)
+FAMILIES = (REQUESTS, LATENCY, REQUEST_SIZE, RESPONSE_SIZE, STAGES, QUERIES)
+
+SAMPLES: deque = deque(maxlen=METRICS_SAMPLE_KEEP)
+# 요청 하나 동안의 구간 시간: 이름 → [횟수, 초]. 동기 엔드포인트는 스레드풀에서 같은 컨텍스트를 복사해 쓴다.
+_TRACE: contextvars.ContextVar[dict | None] = contextvars.ContextVar("metrics_trace", default=None)
+
+
+def _trace_add(name: str, seconds: float):
+    trace = _TRACE.get()
+    if trace is not None:
+        entry = trace.setdefault(name, [0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+
+
+@contextmanager
+def span(stage: str, detail: str = ""):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - t0
+        if METRICS_ENABLED:
+            STAGES.observe((stage, detail), seconds)
+            _trace_add(f"{stage}:{detail}" if detail else stage, seconds)
+
+
+def observe_query(sql: str, seconds: float):
+    if not METRICS_ENABLED:
+        return
+    words = sql.split(None, 1)
+    op = words[0].upper() if words else ""
+    op = op if op in SQL_OPS else "OTHER"
+    QUERIES.observe((op,), seconds)
+    _trace_add(f"sqlite:{op}", seconds)
+
+
+def render() -> str:
+    lines = []
+    for family in FAMILIES:
+        lines += family.render()
+    return "\n".join(lines) + "\n"
+
+
+def samples() -> list[dict]:
+    return list(SAMPLES)
+
+
+def _record(scope, status: int, received: int, sent: int, seconds: float, trace: dict):
+    method = scope.get("method", "")
+    route = getattr(scope.get("route"), "path", None) or "<unmatched>"
+    REQUESTS.inc((method, route, str(status)))
+    LATENCY.observe((method, route), seconds)
+    REQUEST_SIZE.observe((method, route), received)
+    RESPONSE_SIZE.observe((method, route), sent)
+
+    ms = seconds * 1000
+    slow = METRICS_SLOW_MS > 0 and ms >= METRICS_SLOW_MS
+    if not slow and not (METRICS_SAMPLE_RATE > 0 and random.random() < METRICS_SAMPLE_RATE):
+        return
+    spans = {name: {"count": n, "ms": round(s * 1000, 2)} for name, (n, s) in trace.items()}
+    SAMPLES.append({
+        "at": datetime.now(timezone.utc).isoformat(),
+        "method": method,
+        "route": route,
+        "path": scope.get("path", ""),
+        "status": status,
+        "ms": round(ms, 2),
+        "slow": slow,
+        "request_bytes": received,
+        "response_bytes": sent,
+        "spans": spans,
+    })
+    if slow:
+        detail = " ".join(f"{name}={v['ms']:.0f}ms" for name, v in spans.items())
+        print(f"[metrics] slow {method} {scope.get('path', '')} {status} {ms:.0f}ms {detail}".rstrip())
+
+
+class MetricsMiddleware:
+    """순수 ASGI 미들웨어. 스트리밍 응답(SSE)도 그대로 흘려보내고 끝날 때 한 번 기록한다."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        t0 = time.perf_counter()
+        status = 500
+        received = 0
+        sent = 0
+
+        async def receive_wrapper():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+            return message
+
+        async def send_wrapper(message):
+            nonlocal status, sent
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                sent += len(message.get("body", b""))
+            await send(message)
+
+        trace: dict = {}
+        token = _TRACE.set(trace)
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        finally:
+            _TRACE.reset(token)
+            _record(scope, status, received, sent, time.perf_counter() - t0, trace)
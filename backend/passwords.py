@@ -0,0 +1,149 @@
+# backend/passwords.py
+# 비밀번호/PIN 해시 (pbkdf2_sha256).
+#   - 해시/검증은 일부러 느리다(100ms 안팎). 요청 스레드풀에서 돌리면 출근 시간 로그인 몰림에 스캔 요청이 같이 밀리므로
+#     전용 스레드풀(PASSWORD_HASH_WORKERS개)에서 돌린다. hashlib의 pbkdf2는 GIL을 놓아서 스레드 수만큼 병렬로 돈다.
+#   - 대기 중인 작업이 PASSWORD_HASH_QUEUE개를 넘으면 HashPoolBusy를 낸다 (main.py가 503 + Retry-After로 돌려준다).
+#   - 반복 횟수는 PASSWORD_PBKDF2_ROUNDS / PIN_PBKDF2_ROUNDS. 저장된 해시의 횟수가 설정과 다르면
+#     검증에 성공한 김에 새 해시를 돌려주고, 호출한 쪽이 DB에 다시 저장한다.
+#   - PinCache: PIN을 한 번 맞힌 사용자는 COMPANY_PIN_CACHE_SECONDS 동안 같은 PIN을 다시 해시 검증하지 않는다.
+import asyncio
+import contextvars
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import metrics
+from profiler import call_in_request_thread
+
+PASSWORD_HASH_WORKERS = max(1, int(os.environ.get("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1)))))
+PASSWORD_HASH_QUEUE = max(1, int(os.environ.get("PASSWORD_HASH_QUEUE", "64")))
+PASSWORD_PBKDF2_ROUNDS = max(1000, int(os.environ.get("PASSWORD_PBKDF2_ROUNDS", "29000")))
+PIN_PBKDF2_ROUNDS = max(1000, int(os.environ.get("PIN_PBKDF2_ROUNDS", "29000")))
+COMPANY_PIN_CACHE_SECONDS = max(0.0, float(os.environ.get("COMPANY_PIN_CACHE_SECONDS", "300")))
+
+
+class HashPoolBusy(Exception):
+    pass
+
+
+@lru_cache(maxsize=None)
+def _context(rounds: int):
+    # passlib은 처음 해시/검증할 때 불러온다. min/max를 설정값에 맞춰 두면 횟수가 다른 해시는 needs_update가 된다.
+    from passlib.context import CryptContext
+
+    return CryptContext(
+        schemes=["pbkdf2_sha256"],
+        deprecated="auto",
+        pbkdf2_sha256__default_rounds=rounds,
+        pbkdf2_sha256__min_rounds=rounds,
+        pbkdf2_sha256__max_rounds=rounds,
+    )
+
+
+def hash_password(password: str) -> str:
+    with metrics.span("password_hash", "hash"):
+        return _context(PASSWORD_PBKDF2_ROUNDS).hash(password)
+
+
+def verify_password(password: str, password_hash: str) -> tuple[bool, str | None]:
+    """(맞는지, 다시 저장할 새 해시 또는 None)."""
+    with metrics.span("password_hash", "verify"):
+        return _context(PASSWORD_PBKDF2_ROUNDS).verify_and_update(password, password_hash)
+
+
+def hash_pin(pin: str) -> str:
+    with metrics.span("password_hash", "hash_pin"):
+        return _context(PIN_PBKDF2_ROUNDS).hash(pin)
+
+
+def verify_pin(pin: str, pin_hash: str) -> tuple[bool, str | None]:
+    with metrics.span("password_hash", "verify_pin"):
+        return _context(PIN_PBKDF2_ROUNDS).verify_and_update(pin, pin_hash)
+
+
+class HashPool:
+    """해시 전용 스레드풀. 대기열 길이를 제한한다."""
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, max_pending: int = PASSWORD_HASH_QUEUE):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor: ThreadPoolExecutor | None = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+            return self._executor
+
+    async def run(self, func, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise HashPoolBusy()
+            self._pending += 1
+        try:
+            # 요청 컨텍스트(metrics 구간 기록, 프로파일러 대상 스레드)를 작업 스레드로 넘긴다
+            ctx = contextvars.copy_context()
+            return await asyncio.get_running_loop().run_in_executor(
+                self._get_executor(), ctx.run, call_in_request_thread, func, *args
+            )
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+class PinCache:
+    """사용자별로 마지막에 맞힌 PIN을 기억한다 (워커 메모리).
+
+    PIN 원문 대신 프로세스마다 새로 만드는 키로 HMAC한 값만 들고 있고, 저장된 PIN 해시가 바뀌면(PIN 변경) 맞지 않는다.
+    """
+
+    def __init__(self, ttl: float = COMPANY_PIN_CACHE_SECONDS):
+        self.ttl = ttl
+        self._key = secrets.token_bytes(32)
+        self._entries: dict[str, tuple[str, bytes, float]] = {}
+        self._lock = threading.Lock()
+
+    def _digest(self, pin: str) -> bytes:
+        return hmac.new(self._key, pin.encode("utf-8"), hashlib.sha256).digest()
+
+    def check(self, user: str, pin: str, pin_hash: str) -> bool:
+        if self.ttl <= 0:
+            return False
+        with self._lock:
+            entry = self._entries.get(user)
+        if entry is None:
+            return False
+        cached_hash, digest, expires = entry
+        if time.monotonic() >= expires or cached_hash != pin_hash:
+            with self._lock:
+                if self._entries.get(user) is entry:
+                    del self._entries[user]
+            return False
+        return hmac.compare_digest(digest, self._digest(pin))
+
+    def remember(self, user: str, pin: str, pin_hash: str):
+        if self.ttl <= 0:
+            return
+        now = time.monotonic()
+        with self._lock:
+            # 만료된 항목은 넣을 때 같이 치운다
+            for key in [k for k, (_, _, exp) in self._entries.items() if exp <= now]:
+                del self._entries[key]
+            self._entries[user] = (pin_hash, self._digest(pin), now + self.ttl)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
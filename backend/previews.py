@@ -0,0 +1,183 @@
+# backend/previews.py
+# 공유 파일(xlsx/xls/csv) 미리보기 캐시.
+#   - 파일을 한 번만 읽어서 시트별로 열 단위(columnar) 캐시를 <root>/<key>/ 에 저장하고, 이후에는 캐시에서 페이지만 잘라 준다.
+#   - Arrow IPC 파일로 저장하고 읽을 때는 memory map한다. 캐시 디렉터리를 여러 워커가 같이 읽으므로
+#     임의 코드를 실행할 수 있는 pickle 같은 형식은 쓰지 않는다.
+#   - 셀 값은 모두 문자열로 저장한다 (빈 칸은 ""). 헤더 행도 데이터 첫 행으로 그대로 둔다.
+#   - 형식은 확장자가 아니라 내용으로 판단한다 (sheets.sniff_format). 쇼핑몰이 내려주는 .xls는 HTML 표인 경우가 많아서
+#     xlsx/BIFF만 pandas로 읽고, HTML/CSV/TSV는 다른 화면과 같은 sheets 행 리더로 읽는다.
+#   - 업로드 직후 submit()으로 백그라운드 스레드에서 만들고, 아직 없으면 요청에서 ensure()가 만든다.
+import json
+import os
+import queue
+import shutil
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import sheets
+from lazy import lazy_module
+
+pd = lazy_module("pandas")
+# pyarrow는 처음 캐시를 만들거나 읽을 때 import한다
+pa = lazy_module("pyarrow")
+pa_ipc = lazy_module("pyarrow.ipc")
+
+# 2: pickle 저장을 없앴다 (예전 pickle 캐시는 다시 만든다)
+PREVIEW_FORMAT_VERSION = 2
+
+
+def _column_names(count: int) -> list[str]:
+    # 엑셀처럼 A, B, ..., Z, AA, ...
+    names = []
+    for i in range(count):
+        name = ""
+        n = i + 1
+        while n:
+            n, r = divmod(n - 1, 26)
+            name = chr(65 + r) + name
+        names.append(name)
+    return names
+
+
+def _rows_frame(rows: list[list]) -> "pd.DataFrame":
+    # 행마다 칸 수가 다를 수 있어서 가장 긴 행에 맞춰 ""로 채운다
+    width = max((len(row) for row in rows), default=0)
+    return pd.DataFrame([["" if v is None else str(v) for v in row] + [""] * (width - len(row)) for row in rows])
+
+
+def _read_sheets(path: Path, ext: str) -> "list[tuple[str, pd.DataFrame]]":
+    with open(path, "rb") as f:
+        head = f.read(4096)
+    fmt = sheets.sniff_format(head, ext)
+    if fmt in ("xlsx", "xls"):
+        frames = pd.read_excel(path, sheet_name=None, header=None, dtype=str)
+        return [(str(name), df) for name, df in frames.items()]
+    if fmt == "html":
+        return [("Sheet1", _rows_frame(sheets.read_html_rows(path, head)))]
+    return [(fmt, _rows_frame(sheets.read_delimited_rows(path, "\t" if fmt == "tsv" else ",")))]
+
+
+class PreviewCache:
+    def __init__(self, root: Path, max_open: int = 16):
+        self.root = Path(root)
+        self.max_open = max_open
+        self._open: OrderedDict = OrderedDict()  # (key, sheet_index) -> pyarrow Table
+        self._lock = threading.Lock()
+        self._building: dict[str, threading.Lock] = {}
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: threading.Thread | None = None
+
+    def _dir(self, key: str) -> Path:
+        return self.root / key
+
+    def _meta(self, key: str) -> dict | None:
+        try:
+            meta = json.loads((self._dir(key) / "meta.json").read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if meta.get("version") != PREVIEW_FORMAT_VERSION:
+            return None
+        return meta
+
+    def _build(self, key: str, path: Path, ext: str) -> dict:
+        sheets = _read_sheets(path, ext)
+        tmp_dir = self.root / f".{key}.{os.getpid()}.{threading.get_ident()}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        tmp_dir.mkdir(parents=True)
+        meta_sheets = []
+        for index, (name, df) in enumerate(sheets):
+            df = df.fillna("").astype(str)
+            columns = _column_names(df.shape[1])
+            table = pa.table({col: pa.array(df.iloc[:, i].tolist(), type=pa.string()) for i, col in enumerate(columns)})
+            with pa.OSFile(str(tmp_dir / f"{index}.arrow"), "wb") as sink:
+                with pa_ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+            meta_sheets.append({"name": name, "rows": int(df.shape[0]), "columns": columns})
+        meta = {"version": PREVIEW_FORMAT_VERSION, "sheets": meta_sheets}
+        (tmp_dir / "meta.json").write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+        target = self._dir(key)
+        shutil.rmtree(target, ignore_errors=True)
+        os.replace(tmp_dir, target)
+        return meta
+
+    def ensure(self, key: str, path: Path, ext: str) -> dict:
+        meta = self._meta(key)
+        if meta is not None:
+            return meta
+        with self._lock:
+            build_lock = self._building.setdefault(key, threading.Lock())
+        try:
+            with build_lock:
+                meta = self._meta(key)
+                if meta is None:
+                    self._drop_open(key)
+                    meta = self._build(key, path, ext)
+                return meta
+        finally:
+            with self._lock:
+                self._building.pop(key, None)
+
+    def _load_sheet(self, key: str, index: int):
+        cache_key = (key, index)
+        with self._lock:
+            if cache_key in self._open:
+                self._open.move_to_end(cache_key)
+                return self._open[cache_key]
+        source = pa.memory_map(str(self._dir(key) / f"{index}.arrow"), "r")
+        loaded = pa_ipc.open_file(source).read_all()
+        with self._lock:
+            self._open[cache_key] = loaded
+            while len(self._open) > self.max_open:
+                self._open.popitem(last=False)
+        return loaded
+
+    def page(self, key: str, path: Path, ext: str, sheet: str | None, offset: int, limit: int) -> dict:
+        meta = self.ensure(key, path, ext)
+        sheets = meta["sheets"]
+        index = 0
+        if sheet:
+            names = [s["name"] for s in sheets]
+            if sheet in names:
+                index = names.index(sheet)
+            elif sheet.isdigit() and int(sheet) < len(sheets):
+                index = int(sheet)
+            else:
+                raise KeyError(sheet)
+        info = sheets[index]
+        loaded = self._load_sheet(key, index)
+        count = max(0, min(info["rows"], offset + limit) - offset)
+        columns = [loaded.column(c).slice(offset, count).to_pylist() for c in info["columns"]]
+        rows = [list(r) for r in zip(*columns)]
+        return {
+            "sheets": [s["name"] for s in sheets],
+            "sheet": info["name"],
+            "columns": info["columns"],
+            "total_rows": info["rows"],
+            "offset": offset,
+            "rows": rows,
+        }
+
+    def _drop_open(self, key: str):
+        with self._lock:
+            for cache_key in [k for k in self._open if k[0] == key]:
+                self._open.pop(cache_key, None)
+
+    def remove(self, key: str):
+        self._drop_open(key)
+        shutil.rmtree(self._dir(key), ignore_errors=True)
+
+    def submit(self, key: str, path: Path, ext: str):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="previews", daemon=True)
+                self._thread.start()
+        self._queue.put((key, path, ext))
+
+    def _loop(self):
+        while True:
+            key, path, ext = self._queue.get()
+            try:
+                self.ensure(key, path, ext)
+            except Exception as e:
+                print("[previews] failed:", path, e)
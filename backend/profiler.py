@@ -0,0 +1,235 @@
+# backend/profiler.py
+# 관리자용 요청 프로파일러 (샘플링).
+#   - arm(method, route, count): 그 라우트로 오는 다음 count개 요청을 잰다. 무장 상태는 워커 메모리에만 있다
+#     (여러 워커로 띄웠다면 요청이 다른 워커로 가면 잡히지 않는다).
+#   - 동기 엔드포인트는 스레드풀 스레드에서 돌아서 cProfile(켠 스레드 하나만 잰다)로는 보이지 않는다.
+#     그래서 요청이 도는 동안 샘플러 스레드가 PROFILER_INTERVAL_MS마다 그 요청의 스레드 스택만 찍는다.
+#     요청의 스레드 = 이벤트 루프 스레드(미들웨어/async 엔드포인트) + request_thread() 안에서 일하는 스레드
+#     (ProfiledRoute가 감싼 동기 엔드포인트, HashPool처럼 요청이 일을 넘긴 스레드). 다른 요청이 쓰는 스레드는 안 찍힌다.
+#     대기 함수(Condition.wait, selector.select, queue.get)에서 멈춘 스레드는 쉬는 중이라 뺀다.
+#     한 번에 한 요청만 잰다 (재는 중에 온 요청은 그냥 지나가고 무장은 남는다).
+#   - 결과는 collapsed stack 텍스트("a;b;c 12" 줄). flamegraph.pl이나 speedscope에 그대로 넣으면 된다.
+#     저장은 main.py가 넘긴 save(record) 콜백이 한다 (app.db profiles 테이블).
+import contextvars
+import functools
+import inspect
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+from fastapi.routing import APIRoute
+
+PROFILER_INTERVAL_MS = max(1.0, float(os.environ.get("PROFILER_INTERVAL_MS", "5")))
+MAX_ARM_COUNT = 20
+MAX_DEPTH = 200
+TOP_FUNCTIONS = 20
+# (파일 이름, 함수) - 스택 맨 위가 이거면 쉬는 스레드
+_IDLE_LEAVES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+}
+# 재는 요청의 스레드 ident 집합. 스레드풀로 넘긴 일도 컨텍스트를 복사해 가므로 같은 집합을 본다.
+_REQUEST_THREADS: contextvars.ContextVar[set | None] = contextvars.ContextVar("profiler_threads", default=None)
+
+
+@contextmanager
+def request_thread():
+    """재는 요청의 일을 하는 동안 지금 스레드를 샘플 대상에 넣는다. 재는 중이 아니면 아무것도 하지 않는다."""
+    threads = _REQUEST_THREADS.get()
+    if threads is None:
+        yield
+        return
+    tid = threading.get_ident()
+    threads.add(tid)
+    try:
+        yield
+    finally:
+        threads.discard(tid)
+
+
+def call_in_request_thread(func, *args):
+    # 요청이 일을 넘기는 스레드풀에서 func 대신 부른다 (ctx.run(call_in_request_thread, func, ...))
+    with request_thread():
+        return func(*args)
+
+
+class ProfiledRoute(APIRoute):
+    """동기 엔드포인트를 request_thread() 안에서 돌린다. app.router.route_class / APIRouter(route_class=)로 쓴다."""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        if inspect.isfunction(endpoint) and not inspect.iscoroutinefunction(endpoint):
+            func = endpoint
+
+            # FastAPI는 __wrapped__를 따라가서 원래 함수의 시그니처로 인자를 푼다
+            @functools.wraps(func)
+            def endpoint(*args, **kw):
+                with request_thread():
+                    return func(*args, **kw)
+
+        super().__init__(path, endpoint, **kwargs)
+
+
+def _frame_label(code) -> str:
+    return f"{Path(code.co_filename).name}:{code.co_name}"
+
+
+def _collapse(frame) -> str | None:
+    if (Path(frame.f_code.co_filename).name, frame.f_code.co_name) in _IDLE_LEAVES:
+        return None
+    labels = []
+    while frame is not None and len(labels) < MAX_DEPTH:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class Sampler(threading.Thread):
+    """멈출 때까지 interval마다 threads에 든 스레드의 스택을 센다."""
+
+    def __init__(self, interval: float, threads: set):
+        super().__init__(name="request-profiler", daemon=True)
+        self.interval = interval
+        self.threads = threads
+        self.stacks: Counter = Counter()
+        self.ticks = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.ticks += 1
+            threads = self.threads.copy()
+            for tid, frame in sys._current_frames().items():
+                if tid not in threads:
+                    continue
+                stack = _collapse(frame)
+                if stack:
+                    self.stacks[stack] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def _top_functions(stacks: Counter) -> list[dict]:
+    # 스택 맨 위(self) 기준 상위 함수
+    total = sum(stacks.values()) or 1
+    leaves: Counter = Counter()
+    for stack, n in stacks.items():
+        leaves[stack.rsplit(";", 1)[-1]] += n
+    return [{"function": f, "samples": n, "pct": round(100 * n / total, 1)} for f, n in leaves.most_common(TOP_FUNCTIONS)]
+
+
+class _Arm:
+    __slots__ = ("method", "route", "regex", "remaining", "armed_by", "armed_at")
+
+    def __init__(self, method: str, route: str, regex, count: int, armed_by: str):
+        self.method = method
+        self.route = route
+        self.regex = regex
+        self.remaining = count
+        self.armed_by = armed_by
+        self.armed_at = datetime.now(timezone.utc).isoformat()
+
+    def as_dict(self) -> dict:
+        return {"method": self.method, "route": self.route, "remaining": self.remaining,
+                "armed_by": self.armed_by, "armed_at": self.armed_at}
+
+
+class Profiler:
+    def __init__(self, save, interval_ms: float = PROFILER_INTERVAL_MS):
+        self.save = save
+        self.interval = interval_ms / 1000
+        self._arms: dict[tuple[str, str], _Arm] = {}
+        self._lock = threading.Lock()
+        self._busy = False
+
+    def arm(self, method: str, route: str, regex, count: int, armed_by: str) -> dict:
+        arm = _Arm(method, route, regex, max(1, min(count, MAX_ARM_COUNT)), armed_by)
+        with self._lock:
+            self._arms[(method, route)] = arm
+        return arm.as_dict()
+
+    def disarm(self, method: str, route: str) -> bool:
+        with self._lock:
+            return self._arms.pop((method, route), None) is not None
+
+    def arms(self) -> list[dict]:
+        with self._lock:
+            return [a.as_dict() for a in self._arms.values()]
+
+    def _take(self, method: str, path: str) -> _Arm | None:
+        if not self._arms:
+            return None
+        with self._lock:
+            if self._busy:
+                return None
+            for key, arm in self._arms.items():
+                if arm.method == method and arm.regex.match(path):
+                    arm.remaining -= 1
+                    if arm.remaining <= 0:
+                        del self._arms[key]
+                    self._busy = True
+                    return arm
+        return None
+
+    def _finish(self, arm: _Arm, scope, status: int, seconds: float, sampler: Sampler):
+        with self._lock:
+            self._busy = False
+        record = {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "armed_by": arm.armed_by,
+            "method": arm.method,
+            "route": arm.route,
+            "path": scope.get("path", ""),
+            "status": status,
+            "duration_ms": round(seconds * 1000, 2),
+            "samples": sum(sampler.stacks.values()),
+            "interval_ms": self.interval * 1000,
+            "top": _top_functions(sampler.stacks),
+            "collapsed": "".join(f"{stack} {n}\n" for stack, n in sampler.stacks.most_common()),
+        }
+        try:
+            self.save(record)
+        except Exception as e:
+            print(f"[profiler] save failed: {e}")
+
+
+class ProfilerMiddleware:
+    """무장된 라우트로 온 요청이면 샘플러를 켜고 응답이 끝날 때 저장한다."""
+
+    def __init__(self, app, profiler: Profiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        arm = self.profiler._take(scope.get("method", ""), scope.get("path", "")) if scope["type"] == "http" else None
+        if arm is None:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        threads = {threading.get_ident()}
+        token = _REQUEST_THREADS.set(threads)
+        sampler = Sampler(self.profiler.interval, threads)
+        t0 = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            sampler.stop()
+            _REQUEST_THREADS.reset(token)
+            self.profiler._finish(arm, scope, status, time.perf_counter() - t0, sampler)
@@ -0,0 +1,149 @@
+# backend/readers.py
+# 엑셀 읽기 엔진 선택.
+#   - calamine(python-calamine, Rust 파서)이 설치돼 있으면 그걸로 읽고, 없거나 읽다 실패하면 기존 openpyxl/xlrd로 되돌아간다.
+#   - 엔드포인트마다 READER_ENGINE_<이름> 환경 변수로 따로 고를 수 있다. 없으면 READER_ENGINE(기본 auto)을 따른다.
+#     이름: ORDERS, INCOMING, RETURNS, COST_BASE, AMOOD_HAPBAE, EASYADMIN
+#   - read_frame: pd.read_excel 대신 (DataFrame), read_sheet: 행 단위로 읽는 곳용 (sheets.Sheet).
+#   - calamine 값은 openpyxl과 맞춘다: 빈 칸 "" → None, 정수로 떨어지는 float → int.
+#     calamine은 수식 대신 저장된 계산값을 주고, 활성 시트를 모르므로 sheet_index=None이면 첫 시트를 읽는다.
+#   - read_frame/read_sheet 시간은 metrics의 workbook_load 구간으로 남는다 (detail=엔드포인트).
+import os
+from pathlib import Path
+
+import metrics
+from lazy import lazy_module
+from sheets import ListSheet, Sheet, load_sheet, sniff_format
+
+try:
+    from python_calamine import CalamineWorkbook
+except ImportError:  # python-calamine 미설치 → openpyxl
+    CalamineWorkbook = None
+
+pd = lazy_module("pandas")
+
+ENGINES = ("auto", "calamine", "openpyxl")
+READER_ENDPOINTS = ("orders", "incoming", "returns", "cost_base", "amood_hapbae", "easyadmin")
+# calamine이 읽을 수 있는 형식 (HTML/CSV로 된 가짜 .xls는 sheets.py가 읽는다)
+CALAMINE_FORMATS = ("xlsx", "xls")
+
+
+def calamine_available() -> bool:
+    return CalamineWorkbook is not None
+
+
+def _configured(endpoint: str) -> str:
+    value = os.environ.get(f"READER_ENGINE_{endpoint.upper()}") or os.environ.get("READER_ENGINE", "auto")
+    value = value.strip().lower()
+    if value not in ENGINES:
+        print(f"[readers] unknown engine {value!r} for {endpoint}, using auto")
+        return "auto"
+    return value
+
+
+def engine_for(endpoint: str) -> str:
+    """실제로 쓸 엔진: 'calamine' 또는 'openpyxl'."""
+    value = _configured(endpoint)
+    if value == "openpyxl" or not calamine_available():
+        return "openpyxl"
+    return "calamine"
+
+
+def engines() -> dict:
+    return {
+        "calamine_available": calamine_available(),
+        "endpoints": {name: engine_for(name) for name in READER_ENDPOINTS},
+    }
+
+
+def read_frame(path: Path, endpoint: str, **kwargs) -> "pd.DataFrame":
+    """pd.read_excel(path, **kwargs)와 같다. calamine을 쓰는 엔드포인트면 engine만 바꿔서 먼저 읽어 본다."""
+    with metrics.span("workbook_load", endpoint):
+        return _read_frame(path, endpoint, **kwargs)
+
+
+def _read_frame(path: Path, endpoint: str, **kwargs) -> "pd.DataFrame":
+    if engine_for(endpoint) == "calamine":
+        try:
+            return pd.read_excel(path, **{**kwargs, "engine": "calamine"})
+        except Exception as e:
+            print(f"[readers] calamine failed for {endpoint} ({e}), falling back")
+    return pd.read_excel(path, **kwargs)
+
+
+def _calamine_value(v):
+    if v == "":
+        return None
+    if isinstance(v, float) and v.is_integer():
+        return int(v)
+    return v
+
+
+def _read_calamine_sheet(path: Path, sheet_index: int | None, merged: bool) -> ListSheet:
+    book = CalamineWorkbook.from_path(str(path))
+    index = sheet_index or 0
+    if index >= len(book.sheet_names):
+        raise IndexError(index)
+    sheet = book.get_sheet_by_index(index)
+    # skip_empty_area=False: A1부터 채워서 행/열 번호가 openpyxl과 같게
+    rows = [[_calamine_value(v) for v in values] for values in sheet.to_python(skip_empty_area=False)]
+    ranges = []
+    if merged:
+        for (r0, c0), (r1, c1) in sheet.merged_cell_ranges or ():
+            ranges.append((r0 + 1, c0 + 1, r1 + 1, c1 + 1))
+    return ListSheet(rows, title=sheet.name, merged_ranges=ranges)
+
+
+def read_sheet(
+    path: Path, endpoint: str, sheet_index: int | None = None, merged: bool = False, data_only: bool = False
+) -> Sheet:
+    """시트 하나를 읽기 전용 Sheet로. sheet_index=None이면 활성(첫) 시트, 없는 번호면 IndexError."""
+    with metrics.span("workbook_load", endpoint):
+        return _read_sheet(path, endpoint, sheet_index, merged, data_only)
+
+
+def _read_sheet(path: Path, endpoint: str, sheet_index: int | None, merged: bool, data_only: bool) -> Sheet:
+    if engine_for(endpoint) == "calamine":
+        with open(path, "rb") as f:
+            head = f.read(4096)
+        if sniff_format(head, Path(path).suffix) in CALAMINE_FORMATS:
+            try:
+                return _read_calamine_sheet(path, sheet_index, merged)
+            except IndexError:
+                raise
+            except Exception as e:
+                print(f"[readers] calamine failed for {endpoint} ({e}), falling back")
+    return load_sheet(path, merged=merged, sheet_index=sheet_index, data_only=data_only)
+
+
+def _iter_openpyxl_rows(wb, ws):
+    try:
+        yield from ws.iter_rows(values_only=True)
+    finally:
+        wb.close()
+
+
+def iter_sheet_rows(path: Path, endpoint: str, sheet_index: int | None = None, data_only: bool = False):
+    """(시트 이름, 값 튜플 이터레이터). 한 번 훑고 끝나는 곳용.
+    openpyxl은 read_only로 그 시트만 한 행씩 읽는다 (다른 시트는 파싱하지 않는다)."""
+    with open(path, "rb") as f:
+        head = f.read(4096)
+    if sniff_format(head, Path(path).suffix) != "xlsx":
+        sheet = read_sheet(path, endpoint, sheet_index=sheet_index, data_only=data_only)
+        return sheet.title, sheet.iter_rows()
+    if engine_for(endpoint) == "calamine":
+        try:
+            sheet = _read_calamine_sheet(path, sheet_index, merged=False)
+            return sheet.title, sheet.iter_rows()
+        except IndexError:
+            raise
+        except Exception as e:
+            print(f"[readers] calamine failed for {endpoint} ({e}), falling back")
+    import openpyxl
+
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=data_only)
+    try:
+        ws = wb.active if sheet_index is None else wb.worksheets[sheet_index]
+    except IndexError:
+        wb.close()
+        raise
+    return ws.title, _iter_openpyxl_rows(wb, ws)
@@ -0,0 +1,141 @@
+# backend/scan_journal.py
+# 스캔 진행 상황(송장/상품 스캔, 불량, 반품 대기열 등)을 append-only로 기록해 두었다가
+# 서버 재시작 시 그대로 재생하기 위한 저널.
+import atexit
+import json
+import sqlite3
+import threading
+import time
+import traceback
+from pathlib import Path
+
+
+def init_schema(conn: sqlite3.Connection):
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS scan_journal (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            ts REAL NOT NULL,
+            workflow TEXT NOT NULL,
+            owner TEXT NOT NULL,
+            op TEXT NOT NULL,
+            payload TEXT
+        )
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_scan_journal_key ON scan_journal (workflow, owner, seq)")
+
+
+def encode_payload(payload) -> str:
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def insert_record(conn: sqlite3.Connection, ts: float, workflow: str, owner: str, op: str, payload: str, replaces=()) -> int:
+    cur = conn.execute(
+        "INSERT INTO scan_journal (ts, workflow, owner, op, payload) VALUES (?, ?, ?, ?, ?)",
+        (ts, workflow, owner, op, payload),
+    )
+    if replaces:
+        # 새 스냅샷/리셋이 덮어쓰는 이전 기록은 정리해서 재생 길이를 줄인다
+        placeholders = ",".join(["?"] * len(replaces))
+        conn.execute(
+            f"DELETE FROM scan_journal WHERE workflow = ? AND owner = ? AND seq < ? AND op IN ({placeholders})",
+            (workflow, owner, cur.lastrowid, *replaces),
+        )
+    return cur.lastrowid
+
+
+def read_entries(conn: sqlite3.Connection, after_seq: int = 0, workflow: str | None = None, owner: str | None = None):
+    sql = "SELECT seq, workflow, owner, op, payload FROM scan_journal WHERE seq > ?"
+    params: list = [after_seq]
+    if workflow is not None:
+        sql += " AND workflow = ?"
+        params.append(workflow)
+    if owner is not None:
+        sql += " AND owner = ?"
+        params.append(owner)
+    sql += " ORDER BY seq ASC"
+    rows = conn.execute(sql, params).fetchall()
+    return [(seq, wf, own, op, json.loads(payload) if payload else None) for seq, wf, own, op, payload in rows]
+
+
+class ScanJournal:
+    def __init__(self, path: Path, flush_interval: float = 0.05, max_batch: int = 256):
+        self.path = Path(path)
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._pending: list[tuple] = []
+        self._pending_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # 배치 단위로 커밋하므로 FULL이어도 fsync는 배치당 1회
+        self._conn.execute("PRAGMA synchronous=FULL")
+        init_schema(self._conn)
+
+        self._thread = threading.Thread(target=self._run, name="scan-journal", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def append(self, workflow: str, owner: str, op: str, payload=None, replaces: tuple[str, ...] = ()):
+        """스캔 요청 경로에서 호출된다. 직렬화 후 메모리 버퍼에만 넣고 바로 반환한다."""
+        record = (
+            time.time(),
+            workflow,
+            owner or "",
+            op,
+            encode_payload(payload),
+            tuple(replaces),
+        )
+        with self._pending_lock:
+            self._pending.append(record)
+            full = len(self._pending) >= self.max_batch
+        if full:
+            self._wake.set()
+
+    def flush(self):
+        with self._write_lock:
+            with self._pending_lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return
+            try:
+                self._conn.execute("BEGIN")
+                for record in batch:
+                    insert_record(self._conn, *record)
+                self._conn.execute("COMMIT")
+            except Exception:
+                if self._conn.in_transaction:
+                    self._conn.execute("ROLLBACK")
+                with self._pending_lock:
+                    self._pending[:0] = batch
+                raise
+
+    def entries(self, workflow: str | None = None, owner: str | None = None, after_seq: int = 0):
+        self.flush()
+        with self._write_lock:
+            return read_entries(self._conn, after_seq, workflow, owner)
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                traceback.print_exc()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        self._thread.join(timeout=5)
+        try:
+            self.flush()
+        finally:
+            self._conn.close()
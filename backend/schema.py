@@ -0,0 +1,318 @@
+# backend/schema.py
+# app.db 스키마 마이그레이션.
+#   - PRAGMA user_version에 적용된 마지막 버전을 기록하고, 그 이후 마이그레이션만 순서대로 실행한다.
+#   - 이미 배포된 DB(user_version = 0)도 1번이 CREATE IF NOT EXISTS + 빠진 컬럼 추가라서 그대로 올라간다.
+#   - 새 변경은 MIGRATIONS 끝에 함수를 추가한다. 이미 추가된 함수는 고치지 않는다.
+#
+# 인덱스 점검: python schema.py [app.db 경로]
+#   QUERY_PLAN_CHECKS의 쿼리가 인덱스 없이 풀스캔(SCAN 테이블)하면 실패(종료 코드 1)한다.
+import sqlite3
+import sys
+
+
+def _add_column_if_missing(conn: sqlite3.Connection, table: str, column: str, ddl: str):
+    cols = [r[1] for r in conn.execute(f"PRAGMA table_info({table})").fetchall()]
+    if column not in cols:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {ddl}")
+
+
+def _m001_base_tables(conn: sqlite3.Connection):
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            display_name TEXT NOT NULL DEFAULT '',
+            role TEXT NOT NULL DEFAULT 'user',
+            created_at TEXT NOT NULL
+        )
+        """
+    )
+    _add_column_if_missing(conn, "users", "display_name", "display_name TEXT NOT NULL DEFAULT ''")
+    _add_column_if_missing(conn, "users", "role", "role TEXT NOT NULL DEFAULT 'user'")
+
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS requests (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            requester_username TEXT NOT NULL,
+            requester_display TEXT NOT NULL DEFAULT '',
+            assignee_username TEXT NOT NULL,
+            assignee_display TEXT NOT NULL DEFAULT '',
+            text TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'open',
+            created_at TEXT NOT NULL,
+            completed_at TEXT,
+            acknowledged_at TEXT
+        )
+        """
+    )
+    _add_column_if_missing(conn, "requests", "requester_display", "requester_display TEXT NOT NULL DEFAULT ''")
+    _add_column_if_missing(conn, "requests", "assignee_display", "assignee_display TEXT NOT NULL DEFAULT ''")
+    _add_column_if_missing(conn, "requests", "acknowledged_at", "acknowledged_at TEXT")
+
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS company_credentials (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            label TEXT NOT NULL,
+            username TEXT,
+            password TEXT,
+            created_at TEXT NOT NULL,
+            updated_at TEXT
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS app_settings (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS request_attachments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            request_id INTEGER NOT NULL,
+            original_name TEXT NOT NULL,
+            stored_name TEXT NOT NULL,
+            mime_type TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            created_at TEXT NOT NULL
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS shared_files (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            original_name TEXT NOT NULL,
+            stored_name TEXT NOT NULL,
+            mime_type TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            uploader_username TEXT NOT NULL,
+            uploader_display TEXT NOT NULL DEFAULT '',
+            created_at TEXT NOT NULL
+        )
+        """
+    )
+
+
+def _m002_request_indexes(conn: sqlite3.Connection):
+    # 받은 요청: assignee_username = ? ORDER BY created_at DESC
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_requests_assignee_created ON requests (assignee_username, created_at)"
+    )
+    # 보낸 요청: requester_username = ? (+ 완료 목록 정리)
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_requests_requester_created ON requests (requester_username, created_at)"
+    )
+    # 첨부: request_id IN (...) ORDER BY id
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_request_attachments_request ON request_attachments (request_id, id)"
+    )
+    # 공유 파일 목록: ORDER BY created_at DESC
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_shared_files_created ON shared_files (created_at)")
+
+
+def _m003_request_completed_date(conn: sqlite3.Connection):
+    # 완료 요청 노출 기준(완료일 >= 오늘)을 WHERE 절에서 바로 비교하기 위한 날짜(YYYY-MM-DD, UTC)
+    _add_column_if_missing(conn, "requests", "completed_date", "completed_date TEXT")
+    conn.execute(
+        """
+        UPDATE requests
+        SET completed_date = substr(completed_at, 1, 10)
+        WHERE completed_at IS NOT NULL
+          AND date(substr(completed_at, 1, 10)) IS NOT NULL
+        """
+    )
+
+
+def _m004_resource_versions(conn: sqlite3.Connection):
+    # 목록 API의 ETag용 버전. 해당 테이블을 바꾸는 트랜잭션 안에서 같이 올린다.
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS resource_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+        """
+    )
+
+
+def _m005_file_hashes(conn: sqlite3.Connection):
+    # 다운로드 ETag용 내용 해시(sha256 hex). 이전에 올라온 파일은 NULL (크기/수정시각으로 대신한다)
+    _add_column_if_missing(conn, "shared_files", "sha256", "sha256 TEXT")
+    _add_column_if_missing(conn, "request_attachments", "sha256", "sha256 TEXT")
+
+
+def _m006_blobs(conn: sqlite3.Connection):
+    # 내용 주소 저장소(blobs.py) 참조 수. stored_name = sha256인 행이 blob을 하나씩 참조한다.
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS blobs (
+            sha256 TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            refcount INTEGER NOT NULL DEFAULT 0,
+            created_at TEXT NOT NULL
+        )
+        """
+    )
+
+
+def _m007_profiles(conn: sqlite3.Connection):
+    # 관리자 프로파일러(profiler.py) 결과. collapsed = flamegraph용 "a;b;c 개수" 줄, top = 상위 함수 JSON
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS profiles (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            created_at TEXT NOT NULL,
+            armed_by TEXT NOT NULL,
+            method TEXT NOT NULL,
+            route TEXT NOT NULL,
+            path TEXT NOT NULL,
+            status INTEGER NOT NULL,
+            duration_ms REAL NOT NULL,
+            samples INTEGER NOT NULL,
+            interval_ms REAL NOT NULL,
+            top TEXT NOT NULL,
+            collapsed TEXT NOT NULL
+        )
+        """
+    )
+
+
+MIGRATIONS = [
+    _m001_base_tables,
+    _m002_request_indexes,
+    _m003_request_completed_date,
+    _m004_resource_versions,
+    _m005_file_hashes,
+    _m006_blobs,
+    _m007_profiles,
+]
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def apply_pending(conn: sqlite3.Connection) -> int:
+    """호출한 쪽이 연 쓰기 트랜잭션(BEGIN IMMEDIATE) 안에서 남은 마이그레이션을 모두 실행한다. 커밋은 호출한 쪽이 한다."""
+    # 잠금을 잡은 뒤에 읽으므로 여러 워커가 동시에 떠도 한 번만 적용된다
+    version = schema_version(conn)
+    for migration in MIGRATIONS[version:]:
+        migration(conn)
+    if version < len(MIGRATIONS):
+        conn.execute(f"PRAGMA user_version = {len(MIGRATIONS)}")
+    return len(MIGRATIONS)
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """적용되지 않은 마이그레이션을 한 트랜잭션으로 실행하고 최종 버전을 돌려준다."""
+    if schema_version(conn) >= len(MIGRATIONS):
+        return schema_version(conn)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        apply_pending(conn)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return schema_version(conn)
+
+
+# (이름, 쿼리, 파라미터) - 여기 있는 쿼리는 인덱스를 타야 한다
+QUERY_PLAN_CHECKS = [
+    (
+        "assigned requests",
+        """
+        SELECT * FROM requests
+        WHERE assignee_username = ?
+          AND (status != 'completed' OR completed_date IS NULL OR completed_date >= ?)
+          AND (created_at, id) < (?, ?)
+        ORDER BY created_at DESC, id DESC
+        LIMIT ?
+        """,
+        ("u", "2000-01-01", "9999", 1 << 62, 200),
+    ),
+    (
+        "resolved requests",
+        """
+        SELECT * FROM requests
+        WHERE requester_username = ?
+          AND (status != 'completed' OR completed_date IS NULL OR completed_date >= ?)
+          AND ((status = 'completed'), COALESCE(completed_at, ''), created_at, id) < (?, ?, ?, ?)
+        ORDER BY (status = 'completed') DESC,
+                 COALESCE(completed_at, '') DESC,
+                 created_at DESC,
+                 id DESC
+        LIMIT ?
+        """,
+        ("u", "2000-01-01", 2, "", "", 0, 200),
+    ),
+    (
+        "clear sent requests",
+        "DELETE FROM requests WHERE requester_username = ? AND status = 'completed'",
+        ("u",),
+    ),
+    (
+        "clear assigned requests",
+        "DELETE FROM requests WHERE assignee_username = ? AND status = 'completed'",
+        ("u",),
+    ),
+    (
+        "delete user requests",
+        "DELETE FROM requests WHERE requester_username = ? OR assignee_username = ?",
+        ("u", "u"),
+    ),
+    (
+        "request attachments",
+        "SELECT * FROM request_attachments WHERE request_id IN (?, ?, ?) ORDER BY id ASC",
+        (1, 2, 3),
+    ),
+    (
+        "shared files",
+        "SELECT * FROM shared_files ORDER BY created_at DESC",
+        (),
+    ),
+]
+
+
+def explain(conn: sqlite3.Connection, sql: str, params=()) -> list[str]:
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()]
+
+
+def check_query_plans(conn: sqlite3.Connection) -> list[str]:
+    """인덱스 없이 테이블 전체를 읽는 쿼리를 찾아 돌려준다. (결과 정렬용 임시 B-tree는 허용)"""
+    problems = []
+    for name, sql, params in QUERY_PLAN_CHECKS:
+        for detail in explain(conn, sql, params):
+            if detail.startswith("SCAN ") and " USING " not in detail:
+                problems.append(f"{name}: {detail}")
+    return problems
+
+
+def main(argv: list[str]) -> int:
+    if len(argv) > 1:
+        conn = sqlite3.connect(argv[1])
+    else:
+        conn = sqlite3.connect(":memory:")
+        migrate(conn)
+    print(f"schema version: {schema_version(conn)} / {len(MIGRATIONS)}")
+    for name, sql, params in QUERY_PLAN_CHECKS:
+        print(f"[{name}]")
+        for detail in explain(conn, sql, params):
+            print(f"  {detail}")
+    problems = check_query_plans(conn)
+    conn.close()
+    for p in problems:
+        print(f"FULL SCAN - {p}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
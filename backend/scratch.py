@@ -0,0 +1,191 @@
+# backend/scratch.py
+# 업로드/가공 임시 파일 관리.
+#   - 시스템 임시 폴더에 바로 쓰지 않고 SCRATCH_DIR 아래 세션(사용자)별 폴더에 둔다.
+#   - 세션 폴더 크기가 quota를 넘으면 새 업로드를 받지 않는다 (remaining()이 0).
+#   - 스위퍼 스레드가 주기적으로 오래된 파일(max_age)을 지우고, 전체 크기가 max_bytes를 넘으면 오래된 것부터 지운다.
+#     세션 상태가 아직 쓰는 파일(AMOOD 원본/전처리 결과)은 pin()으로 등록해 두고, 스위퍼는 이 파일을 건너뛴다.
+#     pin은 워커 메모리에만 있으므로 다른 워커가 쓰는 파일은 touch()로 mtime을 갱신해 나이 기준 삭제를 피한다.
+#   - 세션이 끝나면(초기화, 사용자 삭제) clear_session으로 폴더째 지운다.
+import hashlib
+import os
+import re
+import shutil
+import threading
+import time
+from pathlib import Path
+
+_SAFE_NAME_RE = re.compile(r"^[A-Za-z0-9_.-]{1,64}$")
+
+
+def _session_name(session: str) -> str:
+    if session and _SAFE_NAME_RE.match(session) and session not in (".", ".."):
+        return session
+    # 한글/특수문자 아이디는 해시로
+    return "u_" + hashlib.sha1((session or "").encode("utf-8")).hexdigest()[:16]
+
+
+def _scan_files(path: Path) -> list[tuple[float, int, Path]]:
+    """(mtime, size, path) 목록. 하위 폴더까지 본다."""
+    out = []
+    try:
+        entries = list(os.scandir(path))
+    except FileNotFoundError:
+        return out
+    for entry in entries:
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                out.extend(_scan_files(Path(entry.path)))
+            elif entry.is_file(follow_symlinks=False):
+                st = entry.stat(follow_symlinks=False)
+                out.append((st.st_mtime, st.st_size, Path(entry.path)))
+        except FileNotFoundError:
+            continue
+    return out
+
+
+class ScratchSpace:
+    def __init__(self, root: Path, session_quota: int, max_bytes: int, max_age: float):
+        self.root = Path(root)
+        self.session_quota = session_quota
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._last_sweep = {"at": None, "files": 0, "bytes": 0}
+        self._swept_total = {"files": 0, "bytes": 0}
+        # 세션 → 지우면 안 되는 파일 경로(절대 경로 문자열)
+        self._pinned: dict[str, set[str]] = {}
+        self._pin_lock = threading.Lock()
+
+    def session_dir(self, session: str) -> Path:
+        path = self.root / _session_name(session)
+        path.mkdir(parents=True, exist_ok=True)
+        return path
+
+    def session_usage(self, session: str) -> int:
+        return sum(size for _, size, _ in _scan_files(self.root / _session_name(session)))
+
+    def remaining(self, session: str) -> int:
+        return max(0, self.session_quota - self.session_usage(session))
+
+    def clear_session(self, session: str):
+        self.pin(session, [])
+        shutil.rmtree(self.root / _session_name(session), ignore_errors=True)
+
+    def pin(self, session: str, paths):
+        """세션이 쓰는 파일 목록을 paths로 바꾼다 (빈 목록이면 해제)."""
+        pinned = {os.path.abspath(p) for p in paths if p}
+        with self._pin_lock:
+            if pinned:
+                self._pinned[session] = pinned
+            else:
+                self._pinned.pop(session, None)
+
+    def pinned(self) -> set[str]:
+        with self._pin_lock:
+            return set().union(*self._pinned.values())
+
+    def touch(self, paths):
+        for path in paths:
+            if not path:
+                continue
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+
+    def sweep(self, now: float | None = None) -> dict:
+        """오래된 파일 → 전체 용량 초과분 순서로 지운다. 지운 개수/바이트를 돌려준다."""
+        now = time.time() if now is None else now
+        removed_files = 0
+        removed_bytes = 0
+        with self._lock:
+            pinned = self.pinned()
+            files = sorted(_scan_files(self.root), key=lambda f: f[0])
+            total = sum(size for _, size, _ in files)
+            for mtime, size, path in files:
+                expired = self.max_age > 0 and now - mtime > self.max_age
+                if not expired and total <= self.max_bytes:
+                    # 정렬돼 있으므로 이후 파일은 더 최근 것
+                    break
+                if os.path.abspath(path) in pinned:
+                    # 아직 쓰는 파일. 용량에는 계속 들어가므로 그다음 오래된 파일을 지운다
+                    continue
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+                except OSError:
+                    continue
+                total -= size
+                removed_files += 1
+                removed_bytes += size
+            self._remove_stale_dirs(now)
+            self._last_sweep = {"at": now, "files": removed_files, "bytes": removed_bytes}
+            self._swept_total["files"] += removed_files
+            self._swept_total["bytes"] += removed_bytes
+        return dict(self._last_sweep)
+
+    def _remove_stale_dirs(self, now: float):
+        # 방금 만든 세션 폴더에 업로드가 들어오는 중일 수 있으므로 오래된 빈 폴더만 지운다
+        try:
+            entries = list(os.scandir(self.root))
+        except FileNotFoundError:
+            return
+        for entry in entries:
+            try:
+                if not entry.is_dir(follow_symlinks=False):
+                    continue
+                if now - entry.stat().st_mtime > max(self.max_age, 60):
+                    os.rmdir(entry.path)
+            except OSError:
+                continue
+
+    def stats(self) -> dict:
+        files = _scan_files(self.root)
+        sessions: dict[str, dict] = {}
+        for _, size, path in files:
+            name = path.relative_to(self.root).parts[0] if path.parent != self.root else ""
+            s = sessions.setdefault(name, {"files": 0, "bytes": 0})
+            s["files"] += 1
+            s["bytes"] += size
+        try:
+            disk = shutil.disk_usage(self.root)
+            disk_info = {"total": disk.total, "used": disk.used, "free": disk.free}
+        except OSError:
+            disk_info = None
+        return {
+            "root": str(self.root),
+            "files": len(files),
+            "bytes": sum(size for _, size, _ in files),
+            "max_bytes": self.max_bytes,
+            "session_quota": self.session_quota,
+            "max_age": self.max_age,
+            "sessions": sessions,
+            "pinned": len(self.pinned()),
+            "last_sweep": dict(self._last_sweep),
+            "swept_total": dict(self._swept_total),
+            "disk": disk_info,
+        }
+
+    def start_sweeper(self, interval: float):
+        if interval <= 0 or self._thread is not None:
+            return
+        self._stop.clear()
+
+        def _loop():
+            while not self._stop.wait(interval):
+                try:
+                    self.sweep()
+                except Exception as e:
+                    print("[scratch] sweep failed:", e)
+
+        self._thread = threading.Thread(target=_loop, name="scratch-sweeper", daemon=True)
+        self._thread.start()
+
+    def stop_sweeper(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
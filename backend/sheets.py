@@ -0,0 +1,342 @@
+# backend/sheets.py
+# 엑셀이 아닌(또는 BIFF) 업로드를 openpyxl 워크북 없이 읽는다.
+#   - sniff_format: 확장자보다 파일 앞부분(magic bytes)을 먼저 본다. 쇼핑몰 "엑셀 다운로드"는 .xls 이름의 HTML/CSV인 경우가 많다.
+#   - HTML은 lxml iterparse로 첫 번째 <table>의 <tr>만 순서대로 읽고 바로 버린다 (colspan/rowspan은 같은 값으로 채운다).
+#   - CSV/TSV는 첫 줄의 구분자 개수로 고르고, utf-8 → cp949 순서로 디코딩한다.
+#   - 읽기만 하는 곳은 Sheet(max_row/max_column/value/iter_rows/column)를 쓴다. 워크북에 셀을 하나씩 복사하지 않는다.
+#   - 값을 고쳐서 저장해야 하는 곳(AMOOD excel2)은 openpyxl Worksheet 흉내를 내는 RowSheet를 쓴다.
+import csv
+import io
+import re
+from pathlib import Path
+
+HTML_ENCODING_RE = re.compile(rb"""charset\s*=\s*["']?([A-Za-z0-9_-]+)""", re.IGNORECASE)
+TEXT_ENCODINGS = ("utf-8-sig", "cp949")
+# openpyxl.utils.cell을 import하면 openpyxl 전체가 올라오므로 좌표 변환은 여기서 한다
+_COORDINATE_RE = re.compile(r"^\$?([A-Za-z]{1,3})\$?(\d+)$")
+
+
+def column_index(letters: str) -> int:
+    """"A" → 1, "AA" → 27 (openpyxl column_index_from_string과 같다)."""
+    letters = letters.strip().upper()
+    if not letters or len(letters) > 3 or not all("A" <= ch <= "Z" for ch in letters):
+        raise ValueError(f"invalid column letters: {letters!r}")
+    index = 0
+    for ch in letters:
+        index = index * 26 + ord(ch) - 64
+    return index
+
+
+def split_coordinate(coordinate: str) -> tuple[str, int]:
+    """"B12" → ("B", 12)."""
+    m = _COORDINATE_RE.match(coordinate.strip())
+    if not m or int(m.group(2)) < 1:
+        raise ValueError(f"invalid cell coordinate: {coordinate!r}")
+    return m.group(1).upper(), int(m.group(2))
+
+
+def sniff_format(head: bytes, suffix: str = "") -> str:
+    """'xlsx' / 'xls'(BIFF) / 'html' / 'csv' / 'tsv' 중 하나."""
+    if head[:2] == b"PK":
+        return "xlsx"
+    if head.startswith(b"\xD0\xCF\x11\xE0"):
+        return "xls"
+    text = head.lstrip(b"\xef\xbb\xbf").lstrip().lower()
+    if text.startswith((b"<html", b"<!doctype html", b"<table", b"<meta", b"<head", b"<body")) or b"<table" in text:
+        return "html"
+    if suffix.lower() == ".xlsx":
+        # 텍스트로 보이지 않으면 openpyxl이 에러를 내게 둔다
+        return "xlsx"
+    first_line = text.split(b"\n", 1)[0]
+    return "tsv" if first_line.count(b"\t") > first_line.count(b",") else "csv"
+
+
+def _html_encoding(head: bytes) -> str:
+    m = HTML_ENCODING_RE.search(head)
+    if m:
+        return m.group(1).decode("ascii")
+    try:
+        head.decode("utf-8")
+        return "utf-8"
+    except UnicodeDecodeError as e:
+        # 잘린 마지막 글자 때문이면 utf-8
+        return "utf-8" if e.start >= len(head) - 3 else "cp949"
+
+
+def _cell_text(el) -> str:
+    return " ".join("".join(el.itertext()).split())
+
+
+def _span(el, name: str) -> int:
+    try:
+        return max(1, int(el.get(name, 1)))
+    except (TypeError, ValueError):
+        return 1
+
+
+def read_html_rows(path: Path, head: bytes | None = None) -> list[list]:
+    from lxml import etree
+
+    if head is None:
+        with open(path, "rb") as f:
+            head = f.read(4096)
+    rows: list[list] = []
+    pending: dict[int, list] = {}  # 열 → [남은 rowspan, 값]
+    depth = 0
+    done = False
+    with open(path, "rb") as f:
+        for event, el in etree.iterparse(
+            f, events=("start", "end"), tag=("table", "tr"), html=True, encoding=_html_encoding(head), recover=True
+        ):
+            if done:
+                # 첫 표 이후는 읽기만 하고 버린다
+                if event == "end":
+                    el.clear()
+                continue
+            if el.tag == "table":
+                depth += 1 if event == "start" else -1
+                if event == "end" and depth == 0:
+                    done = True
+                continue
+            if event != "end" or depth != 1:
+                continue
+            row: list = []
+            col = 0
+            for cell in el:
+                if cell.tag not in ("td", "th"):
+                    continue
+                while col in pending:
+                    row.append(pending[col][1])
+                    pending[col][0] -= 1
+                    if pending[col][0] <= 0:
+                        del pending[col]
+                    col += 1
+                value = _cell_text(cell)
+                rowspan = _span(cell, "rowspan")
+                for _ in range(_span(cell, "colspan")):
+                    row.append(value)
+                    if rowspan > 1:
+                        pending[col] = [rowspan - 1, value]
+                    col += 1
+            while col in pending:
+                row.append(pending[col][1])
+                pending[col][0] -= 1
+                if pending[col][0] <= 0:
+                    del pending[col]
+                col += 1
+            rows.append(row)
+            el.clear()
+    return rows
+
+
+def _decode_text(data: bytes) -> str:
+    for encoding in TEXT_ENCODINGS:
+        try:
+            return data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return data.decode(TEXT_ENCODINGS[0], errors="replace")
+
+
+def read_delimited_rows(path: Path, delimiter: str = ",") -> list[list]:
+    text = _decode_text(Path(path).read_bytes())
+    return [row for row in csv.reader(io.StringIO(text, newline=""), delimiter=delimiter)]
+
+
+def _xlrd_value(cell, datemode):
+    import xlrd
+
+    # pandas(xlrd 엔진)와 같은 변환: 정수 숫자는 int, 날짜는 datetime, 빈 칸은 ""
+    if cell.ctype == xlrd.XL_CELL_NUMBER:
+        return int(cell.value) if float(cell.value).is_integer() else cell.value
+    if cell.ctype == xlrd.XL_CELL_DATE:
+        try:
+            return xlrd.xldate.xldate_as_datetime(cell.value, datemode)
+        except Exception:
+            return cell.value
+    if cell.ctype == xlrd.XL_CELL_BOOLEAN:
+        return bool(cell.value)
+    if cell.ctype in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK, xlrd.XL_CELL_ERROR):
+        return ""
+    return cell.value
+
+
+def read_xls_rows(path: Path, sheet_index: int = 0) -> list[list]:
+    import xlrd
+
+    book = xlrd.open_workbook(str(path), on_demand=True)
+    try:
+        if sheet_index >= book.nsheets:
+            raise IndexError(sheet_index)
+        sh = book.sheet_by_index(sheet_index)
+        return [[_xlrd_value(c, book.datemode) for c in sh.row(r)] for r in range(sh.nrows)]
+    finally:
+        book.release_resources()
+
+
+class Sheet:
+    """읽기 전용 시트. 행/열 번호는 openpyxl처럼 1부터.
+    merged_ranges: (min_row, min_col, max_row, max_col) 목록 (원본이 xlsx일 때만 채워진다)."""
+
+    title = "Sheet1"
+    merged_ranges: list[tuple[int, int, int, int]] = []
+
+    @property
+    def max_row(self) -> int:
+        raise NotImplementedError
+
+    @property
+    def max_column(self) -> int:
+        raise NotImplementedError
+
+    def value(self, row: int, column: int):
+        raise NotImplementedError
+
+    def iter_rows(self, min_row=1, max_row=None, min_col=1, max_col=None):
+        """값 튜플을 행 단위로. 짧은 행은 None으로 채운다."""
+        max_row = max_row or self.max_row
+        max_col = max_col or self.max_column
+        for r in range(min_row, max_row + 1):
+            yield tuple(self.value(r, c) for c in range(min_col, max_col + 1))
+
+    def column(self, column: int, min_row: int = 1) -> list:
+        return [self.value(r, column) for r in range(min_row, self.max_row + 1)]
+
+
+class ListSheet(Sheet):
+    """행 리스트(list[list])로 된 시트. xlrd/lxml/csv 결과나 openpyxl에서 값만 뽑은 것."""
+
+    def __init__(self, rows: list[list], title: str = "Sheet1", merged_ranges=None):
+        self.rows = [list(r) for r in rows]
+        self.title = title
+        self.merged_ranges = list(merged_ranges or [])
+
+    @classmethod
+    def from_worksheet(cls, ws) -> "ListSheet":
+        merged = getattr(ws, "merged_cells", None)
+        ranges = [(m.min_row, m.min_col, m.max_row, m.max_col) for m in merged.ranges] if merged else []
+        return cls(list(ws.iter_rows(values_only=True)), title=ws.title, merged_ranges=ranges)
+
+    @property
+    def max_row(self) -> int:
+        return max(len(self.rows), 1)
+
+    @property
+    def max_column(self) -> int:
+        return max((len(r) for r in self.rows), default=0) or 1
+
+    def value(self, row: int, column: int):
+        if row < 1 or column < 1 or row > len(self.rows):
+            return None
+        values = self.rows[row - 1]
+        return values[column - 1] if column <= len(values) else None
+
+    def iter_rows(self, min_row=1, max_row=None, min_col=1, max_col=None):
+        max_row = max_row or self.max_row
+        max_col = max_col or self.max_column
+        width = max_col - min_col + 1
+        for values in self.rows[min_row - 1:max_row]:
+            part = values[min_col - 1:max_col]
+            if len(part) < width:
+                part = part + [None] * (width - len(part))
+            yield tuple(part)
+        # openpyxl처럼 max_row까지는 빈 행도 돌려준다
+        for _ in range(max(len(self.rows), min_row - 1), max_row):
+            yield (None,) * width
+
+
+class _RowCell:
+    __slots__ = ("_sheet", "row", "column")
+
+    def __init__(self, sheet: "RowSheet", row: int, column: int):
+        self._sheet = sheet
+        self.row = row
+        self.column = column
+
+    @property
+    def value(self):
+        return self._sheet.value(self.row, self.column)
+
+    @value.setter
+    def value(self, v):
+        self._sheet.set(self.row, self.column, v)
+
+
+class _NoMergedCells:
+    ranges: tuple = ()
+
+
+class RowSheet(ListSheet):
+    """값을 고쳐 쓰고 xlsx로 저장해야 하는 곳(AMOOD excel2)용. openpyxl Worksheet의 cell()/ws["A1"]을 흉내 낸다."""
+
+    merged_cells = _NoMergedCells()
+
+    def set(self, row: int, column: int, value):
+        while len(self.rows) < row:
+            self.rows.append([])
+        values = self.rows[row - 1]
+        if len(values) < column:
+            values.extend([None] * (column - len(values)))
+        values[column - 1] = value
+
+    def cell(self, row: int, column: int, value=None) -> _RowCell:
+        c = _RowCell(self, row, column)
+        if value is not None:
+            c.value = value
+        return c
+
+    def __getitem__(self, coordinate: str) -> _RowCell:
+        letters, row = split_coordinate(coordinate)
+        return _RowCell(self, row, column_index(letters))
+
+    def unmerge_cells(self, ref: str):
+        pass
+
+    def save(self, path: Path):
+        """가공 결과를 xlsx로 저장한다 (write-only 워크북이라 빠르다)."""
+        from openpyxl import Workbook
+
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet(self.title)
+        for values in self.rows:
+            ws.append(values)
+        wb.save(path)
+
+
+def _read_rows(path: Path, head: bytes, sheet_index: int = 0) -> list[list]:
+    fmt = sniff_format(head, Path(path).suffix)
+    if fmt == "xls":
+        return read_xls_rows(path, sheet_index)
+    if sheet_index:
+        # HTML/CSV/TSV는 시트가 하나뿐
+        raise IndexError(sheet_index)
+    if fmt == "html":
+        return read_html_rows(path, head)
+    if fmt == "tsv":
+        return read_delimited_rows(path, "\t")
+    if fmt == "csv":
+        return read_delimited_rows(path, ",")
+    raise ValueError(f"지원하지 않는 형식: {fmt}")
+
+
+def load_rows_any(path: Path, head: bytes) -> RowSheet:
+    """xlsx가 아닌 입력(BIFF/HTML/CSV/TSV)을 고쳐 쓸 수 있는 RowSheet로 읽는다."""
+    return RowSheet(_read_rows(path, head))
+
+
+def load_sheet(path: Path, merged: bool = False, sheet_index: int | None = None, data_only: bool = False) -> Sheet:
+    """시트 하나를 읽기 전용 Sheet로 읽는다. sheet_index=None이면 활성(첫) 시트, 없는 번호면 IndexError.
+    xlsx는 merged=False면 openpyxl read_only 모드로 값만 읽고, 병합 정보가 필요하면 전체 로드 후 값만 옮긴다."""
+    import openpyxl
+
+    with open(path, "rb") as f:
+        head = f.read(4096)
+    if sniff_format(head, Path(path).suffix) != "xlsx":
+        return ListSheet(_read_rows(path, head, sheet_index or 0))
+    wb = openpyxl.load_workbook(path, read_only=not merged, data_only=data_only)
+    try:
+        ws = wb.active if sheet_index is None else wb.worksheets[sheet_index]
+        return ListSheet.from_worksheet(ws)
+    finally:
+        if not merged:
+            wb.close()
@@ -0,0 +1,151 @@
+# backend/state_store.py
+# 바코드/반품/AMOOD 스캔 상태 저장소.
+#   memory: 상태는 프로세스 메모리에 두고 저널은 비동기 배치로 남긴다 (단일 워커, 기본값)
+#   sqlite: 여러 워커가 같은 저널 파일을 공유한다. 커밋은 동기식이고,
+#           각 워커는 요청 처리 전에 다른 워커가 남긴 op를 따라잡는다.
+#   commit_decided(workflow, owner, decide): 남은 수량/다음 id처럼 현재 상태를 보고 정하는 op는
+#           decide()를 잠금 안(sqlite는 다른 워커 op를 따라잡은 뒤)에서 불러 (op, payload, replaces)를 받아 적용한다.
+#           None이면 아무것도 남기지 않는다. 잠금 밖에서 정하면 두 스테이션이 마지막 1개를 같이 TRUE로 받는다.
+#   메모리 상태는 저널에 남긴 뒤에 바꾼다 (sqlite는 COMMIT 뒤). 저널 쓰기가 실패하면 메모리도 그대로다.
+#   적용 함수가 도중에 실패하면 resetters[workflow](owner)로 그 사용자 상태를 비우고 저널에서 다시 쌓는다.
+import sqlite3
+import threading
+import time
+import traceback
+from pathlib import Path
+
+from scan_journal import ScanJournal, encode_payload, init_schema, insert_record, read_entries
+
+
+def _apply_entries(appliers: dict, entries):
+    for _, workflow, owner, op, payload in entries:
+        applier = appliers.get(workflow)
+        if applier is None:
+            continue
+        try:
+            applier(owner, op, payload or {})
+        except Exception:
+            traceback.print_exc()
+
+
+def _apply_or_rebuild(store, workflow: str, owner: str, op: str, payload: dict):
+    try:
+        store.appliers[workflow](owner, op, payload)
+    except Exception:
+        # 반쯤 적용된 상태를 남기지 않도록 저널 기준으로 다시 만든다 (이번 op도 저널에 있다)
+        traceback.print_exc()
+        store._rebuild(workflow, owner)
+        raise
+
+
+class MemoryStateStore:
+    shared = False
+
+    def __init__(self, appliers: dict, journal: ScanJournal | None = None, resetters: dict | None = None):
+        self.appliers = appliers
+        self.journal = journal
+        self.resetters = resetters or {}
+        self._lock = threading.RLock()
+
+    def commit(self, workflow: str, owner: str, op: str, payload: dict, replaces: tuple[str, ...] = ()):
+        self.commit_decided(workflow, owner, lambda: (op, payload, replaces))
+
+    def commit_decided(self, workflow: str, owner: str, decide):
+        with self._lock:
+            decision = decide()
+            if decision is None:
+                return None
+            op, payload, replaces = decision
+            if self.journal is not None:
+                self.journal.append(workflow, owner, op, payload, replaces=replaces)
+            _apply_or_rebuild(self, workflow, owner, op, payload)
+            return decision
+
+    def _rebuild(self, workflow: str, owner: str):
+        resetter = self.resetters.get(workflow)
+        if resetter is None or self.journal is None:
+            return
+        resetter(owner)
+        _apply_entries(self.appliers, self.journal.entries(workflow, owner or ""))
+
+    def sync(self):
+        pass
+
+    def replay(self):
+        if self.journal is not None:
+            _apply_entries(self.appliers, self.journal.entries())
+
+
+class SqliteStateStore:
+    shared = True
+
+    def __init__(self, appliers: dict, path: Path, resetters: dict | None = None):
+        self.appliers = appliers
+        self.resetters = resetters or {}
+        self.path = Path(path)
+        self._lock = threading.RLock()
+        self._last_seq = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        init_schema(self._conn)
+
+    def commit(self, workflow: str, owner: str, op: str, payload: dict, replaces: tuple[str, ...] = ()):
+        self.commit_decided(workflow, owner, lambda: (op, payload, replaces))
+
+    def commit_decided(self, workflow: str, owner: str, decide):
+        with self._lock:
+            # BEGIN IMMEDIATE로 워커 간 쓰기를 직렬화해서 모든 워커가 같은 순서로 op를 적용하게 한다
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._catch_up()
+                decision = decide()
+                if decision is None:
+                    self._conn.execute("ROLLBACK")
+                    return None
+                op, payload, replaces = decision
+                seq = insert_record(
+                    self._conn, time.time(), workflow, owner or "", op, encode_payload(payload), replaces
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                if self._conn.in_transaction:
+                    self._conn.execute("ROLLBACK")
+                raise
+            self._last_seq = seq
+            _apply_or_rebuild(self, workflow, owner, op, payload)
+            return decision
+
+    def sync(self):
+        with self._lock:
+            self._catch_up()
+
+    def replay(self):
+        self.sync()
+
+    def _rebuild(self, workflow: str, owner: str):
+        resetter = self.resetters.get(workflow)
+        if resetter is None:
+            return
+        resetter(owner)
+        entries = read_entries(self._conn, 0, workflow, owner or "")
+        _apply_entries(self.appliers, [e for e in entries if e[0] <= self._last_seq])
+
+    def _catch_up(self):
+        entries = read_entries(self._conn, after_seq=self._last_seq)
+        if entries:
+            _apply_entries(self.appliers, entries)
+            self._last_seq = entries[-1][0]
+
+
+def create_state_store(backend: str, appliers: dict, journal_path: str | None, resetters: dict | None = None):
+    backend = (backend or "memory").strip().lower()
+    if backend == "memory":
+        journal = ScanJournal(Path(journal_path)) if journal_path else None
+        return MemoryStateStore(appliers, journal, resetters)
+    if backend == "sqlite":
+        if not journal_path:
+            raise ValueError("STATE_STORE_BACKEND=sqlite 에는 SCAN_JOURNAL_PATH가 필요합니다.")
+        return SqliteStateStore(appliers, Path(journal_path), resetters)
+    raise ValueError(f"지원하지 않는 STATE_STORE_BACKEND: {backend}")
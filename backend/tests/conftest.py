@@ -0,0 +1,6 @@
+# backend/tests/conftest.py
+# backend 모듈(schema, db, ...)을 바로 import할 수 있게 한다.
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,29 @@
+# backend/tests/test_query_plans.py
+# 마이그레이션을 끝까지 돌린 빈 DB에서 QUERY_PLAN_CHECKS 쿼리가 풀스캔하지 않는지 본다 (python schema.py와 같은 검사).
+import sqlite3
+
+import pytest
+
+import schema
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    schema.migrate(conn)
+    yield conn
+    conn.close()
+
+
+def test_migrate_reaches_latest_version(conn):
+    assert schema.schema_version(conn) == len(schema.MIGRATIONS)
+
+
+@pytest.mark.parametrize("name, sql, params", schema.QUERY_PLAN_CHECKS, ids=[c[0] for c in schema.QUERY_PLAN_CHECKS])
+def test_query_uses_index(conn, monkeypatch, name, sql, params):
+    monkeypatch.setattr(schema, "QUERY_PLAN_CHECKS", [(name, sql, params)])
+    assert schema.check_query_plans(conn) == []
+
+
+def test_check_query_plans(conn):
+    assert schema.check_query_plans(conn) == []
@@ -0,0 +1,89 @@
+# backend/text_norm.py
+# 상품명/옵션 문자열 정리 (반품, AMOOD, 합배가 같이 쓴다).
+#   - 정규식은 불러올 때 한 번만 컴파일한다. 결과가 같을 때만 여러 패턴을 하나로 합쳤다.
+#     (대괄호→소괄호 순서로 지우는 곳은 "(a [b) c]" 같은 입력에서 결과가 달라지므로 순서를 그대로 둔다)
+#   - 같은 상품명이 계속 반복되므로 입력 문자열 기준 LRU로 결과를 기억한다. 크기: TEXT_NORM_CACHE_SIZE
+#   - 여기 함수들은 str만 받는다. None/숫자 처리는 호출하는 쪽 래퍼가 한다.
+import os
+import re
+from functools import lru_cache
+
+TEXT_NORM_CACHE_SIZE = max(0, int(os.environ.get("TEXT_NORM_CACHE_SIZE", "50000")))
+
+_SPACES = re.compile(r"\s+")
+_SQUARE = re.compile(r"\[[^\]]*\]")
+_PAREN = re.compile(r"\([^)]*\)")
+_CURLY = re.compile(r"\{[^}]*\}")
+# 앞/뒤 태그: 그룹 번호 1=[ ] 2=( ) 3={ }. 첫 글자/마지막 글자로 어느 쪽인지 정해지므로 하나만 맞는다.
+_LEAD_TAG = re.compile(r"^(?:(\[[^\]]*\])|(\([^\)]*\))|(\{[^}]*\}))\s*")
+_TAIL_TAG = re.compile(r"\s*(?:(\[[^\]]*\])|(\([^\)]*\))|(\{[^}]*\}))$")
+SIZE_WORDS = ("FREE", "XS", "S", "M", "L", "XL", "XXL", "XXXL", "SHORT", "LONG")
+_SIZE_WORD = re.compile(r"\b(?:" + "|".join(SIZE_WORDS) + r")\b", re.IGNORECASE)
+
+
+def _cached(func):
+    return lru_cache(maxsize=TEXT_NORM_CACHE_SIZE)(func)
+
+
+def _strip_tag_pass(pattern: re.Pattern, s: str) -> tuple[str, bool]:
+    # 예전 코드처럼 한 바퀴에 [ ] → ( ) → { } 순서로 한 번씩만 지운다
+    last = 0
+    changed = False
+    while True:
+        m = pattern.search(s)
+        if m is None or m.lastindex <= last:
+            return s, changed
+        last = m.lastindex
+        s = (s[:m.start()] + s[m.end():]).strip()
+        changed = True
+
+
+@_cached
+def strip_edge_tags(s: str) -> str:
+    """앞뒤에 붙은 [태그]/(태그)/{태그}를 더 없을 때까지 지운다. 가운데 괄호는 그대로."""
+    s = s.strip()
+    changed = True
+    while changed and s:
+        s, lead = _strip_tag_pass(_LEAD_TAG, s)
+        s, tail = _strip_tag_pass(_TAIL_TAG, s)
+        changed = lead or tail
+    return s
+
+
+@_cached
+def merge_slash_parts(s: str) -> str:
+    """"빨강 / L" → "빨강 L". 조각 안의 공백은 없앤다."""
+    parts = ["".join(p.split()) for p in s.split("/") if p.strip() != ""]
+    return " ".join(parts).strip()
+
+
+@_cached
+def strip_brackets(s: str) -> str:
+    """모든 [..], (..), {..}를 지우고 공백을 하나로."""
+    s = _CURLY.sub("", _PAREN.sub("", _SQUARE.sub("", s)))
+    return _SPACES.sub(" ", s).strip()
+
+
+@_cached
+def clean_product_name(s: str) -> str:
+    """[..], (..)를 공백으로 바꾸고 공백을 하나로."""
+    s = _PAREN.sub(" ", _SQUARE.sub(" ", s))
+    return _SPACES.sub(" ", s).strip()
+
+
+@_cached
+def lowercase_size_words(s: str) -> str:
+    """단어로 떨어진 사이즈 표기(FREE, XL, SHORT ...)만 소문자로."""
+    return _SIZE_WORD.sub(lambda m: m.group().lower(), s)
+
+
+CACHED_FUNCTIONS = (strip_edge_tags, merge_slash_parts, strip_brackets, clean_product_name, lowercase_size_words)
+
+
+def cache_info() -> dict:
+    return {f.__name__: f.cache_info()._asdict() for f in CACHED_FUNCTIONS}
+
+
+def clear_caches():
+    for f in CACHED_FUNCTIONS:
+        f.cache_clear()
@@ -0,0 +1,99 @@
+# backend/thumbnails.py
+# 이미지 첨부 축소본(WebP).
+#   - 원본 옆에 <원본 파일명>.<size>.webp 로 저장한다. (blob이면 <sha>.thumb.webp)
+#   - 업로드 직후 submit()으로 백그라운드 스레드에 넘기고, 아직 없을 때 요청이 오면 ensure()가 그 자리에서 만든다.
+#   - Pillow가 없거나 이미지가 아니면 None을 돌려주고, 호출한 쪽은 원본을 그대로 보낸다.
+import importlib.util
+import os
+import queue
+import threading
+from pathlib import Path
+
+from lazy import lazy_module
+
+# Pillow는 처음 축소본을 만들 때 불러온다
+if importlib.util.find_spec("PIL") is not None:
+    Image = lazy_module("PIL.Image")
+    ImageOps = lazy_module("PIL.ImageOps")
+else:  # Pillow 미설치
+    Image = None
+    ImageOps = None
+
+# 이름: 긴 변 최대 픽셀
+THUMBNAIL_SIZES = {"thumb": 320, "preview": 1280}
+WEBP_QUALITY = 80
+
+
+def available() -> bool:
+    return Image is not None
+
+
+def thumbnail_path(original: Path, size: str) -> Path:
+    return original.with_name(f"{original.name}.{size}.webp")
+
+
+def derived_files(original: Path) -> list[Path]:
+    return [thumbnail_path(original, size) for size in THUMBNAIL_SIZES]
+
+
+def _render(original: Path, size: str) -> Path | None:
+    target = thumbnail_path(original, size)
+    edge = THUMBNAIL_SIZES[size]
+    with Image.open(original) as img:
+        # JPEG는 디코딩 단계에서 미리 줄여서 읽는다
+        img.draft("RGB", (edge, edge))
+        img = ImageOps.exif_transpose(img)
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+        img.thumbnail((edge, edge))
+        tmp = target.with_name(f"{target.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        img.save(tmp, "WEBP", quality=WEBP_QUALITY, method=4)
+    os.replace(tmp, target)
+    return target
+
+
+class ThumbnailWorker:
+    def __init__(self):
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        # 같은 파일을 백그라운드와 요청에서 동시에 만들지 않도록
+        self._busy: dict[Path, threading.Lock] = {}
+
+    def submit(self, original: Path):
+        if not available():
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="thumbnails", daemon=True)
+                self._thread.start()
+        self._queue.put(original)
+
+    def _loop(self):
+        while True:
+            original = self._queue.get()
+            for size in THUMBNAIL_SIZES:
+                try:
+                    self.ensure(original, size)
+                except Exception as e:
+                    print("[thumbnails] failed:", original, e)
+                    break
+
+    def ensure(self, original: Path, size: str) -> Path | None:
+        if not available() or size not in THUMBNAIL_SIZES:
+            return None
+        target = thumbnail_path(original, size)
+        if target.exists():
+            return target
+        with self._lock:
+            file_lock = self._busy.setdefault(original, threading.Lock())
+        try:
+            with file_lock:
+                if target.exists():
+                    return target
+                if not original.exists():
+                    return None
+                return _render(original, size)
+        finally:
+            with self._lock:
+                self._busy.pop(original, None)
@@ -0,0 +1,109 @@
+# backend/uploads.py
+# 업로드 파일 수신 헬퍼.
+#   - multipart 본문을 고정 크기 청크로 임시 파일에 바로 쓰고(메모리에 전부 올리지 않음) 동시에 sha256을 계산한다.
+#   - UPLOAD_MAX_BYTES를 넘으면 413으로 끊는다.
+#   - ingest_upload*는 with 블록을 벗어나면(예외 포함) 임시 파일을 지우고, save_upload*는 파일을 남긴다.
+#   - 실제 저장은 동기 함수 하나(save_upload_sync)가 하고, async 쪽은 그걸 스레드풀에서 부른다.
+import hashlib
+import os
+import tempfile
+import uuid
+from contextlib import asynccontextmanager, contextmanager
+from pathlib import Path
+
+from fastapi import HTTPException, UploadFile
+from starlette.concurrency import run_in_threadpool
+
+from profiler import call_in_request_thread
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+UPLOAD_MAX_BYTES = int(os.environ.get("UPLOAD_MAX_BYTES", str(50 * 1024 * 1024)))
+
+
+class IngestedUpload:
+    def __init__(self, path: Path, filename: str):
+        self.path = path
+        self.filename = filename
+        self.size = 0
+        self.sha256 = ""
+
+
+def _target_path(prefix: str, suffix: str, directory: Path | None) -> Path:
+    base = Path(directory) if directory else Path(tempfile.gettempdir())
+    base.mkdir(parents=True, exist_ok=True)
+    name = f"{prefix}_{uuid.uuid4().hex}" if prefix else uuid.uuid4().hex
+    return base / f"{name}{suffix}"
+
+
+def _too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"업로드 파일이 너무 큽니다. (최대 {max_bytes / (1024 * 1024):.1f}MB)",
+    )
+
+
+def _discard(path: Path):
+    try:
+        path.unlink(missing_ok=True)
+    except Exception:
+        pass
+
+
+def save_upload_sync(
+    file: UploadFile,
+    prefix: str,
+    suffix: str = "",
+    directory: Path | None = None,
+    max_bytes: int | None = None,
+) -> IngestedUpload:
+    """청크 단위로 저장하고 IngestedUpload를 돌려준다. 파일 정리는 호출한 쪽 책임.
+    UploadFile.file을 직접 읽으므로 동기 엔드포인트(스레드풀)에서 부른다. async 쪽은 save_upload."""
+    limit = max_bytes or UPLOAD_MAX_BYTES
+    upload = IngestedUpload(_target_path(prefix, suffix, directory), file.filename or "")
+    hasher = hashlib.sha256()
+    try:
+        with upload.path.open("wb") as out:
+            while True:
+                chunk = file.file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                upload.size += len(chunk)
+                if upload.size > limit:
+                    raise _too_large(limit)
+                hasher.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        _discard(upload.path)
+        raise
+    upload.sha256 = hasher.hexdigest()
+    return upload
+
+
+async def save_upload(
+    file: UploadFile,
+    prefix: str,
+    suffix: str = "",
+    directory: Path | None = None,
+    max_bytes: int | None = None,
+) -> IngestedUpload:
+    """async 엔드포인트용 save_upload_sync. 디스크 쓰기/해시를 스레드풀에서 한다."""
+    return await run_in_threadpool(call_in_request_thread, save_upload_sync, file, prefix, suffix, directory, max_bytes)
+
+
+@asynccontextmanager
+async def ingest_upload(file: UploadFile, prefix: str, suffix: str = "", **kwargs):
+    """`async with ingest_upload(file, "yusaek_upload", ".xlsx") as up:` - 블록을 벗어나면 파일을 지운다."""
+    upload = await save_upload(file, prefix, suffix, **kwargs)
+    try:
+        yield upload
+    finally:
+        _discard(upload.path)
+
+
+@contextmanager
+def ingest_upload_sync(file: UploadFile, prefix: str, suffix: str = "", **kwargs):
+    upload = save_upload_sync(file, prefix, suffix, **kwargs)
+    try:
+        yield upload
+    finally:
+        _discard(upload.path)
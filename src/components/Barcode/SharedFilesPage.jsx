@@ -18,7 +18,8 @@ const SharedFilesPage = () => {
 
     const getDownloadUrl = (item) => {
         const token = localStorage.getItem('token');
-        const suffix = token ? `?token=${encodeURIComponent(token)}` : '';
+        const sep = item.url.includes('?') ? '&' : '?';
+        const suffix = token ? `${sep}token=${encodeURIComponent(token)}` : '';
         return `${API}${item.url}${suffix}`;
     };
 
@@ -148,6 +148,20 @@ const Overview = ({ currentUser }) => {
         // eslint-disable-next-line react-hooks/exhaustive-deps
     }, [currentUser]);
 
+    useEffect(() => {
+        const token = localStorage.getItem('token');
+        if (!token || typeof EventSource === 'undefined') return undefined;
+        const source = new EventSource(`${API}/events?token=${encodeURIComponent(token)}`);
+        const refresh = () => {
+            fetchActivity();
+            fetchResolved();
+        };
+        source.addEventListener('request', refresh);
+        source.addEventListener('resync', refresh);
+        return () => source.close();
+        // eslint-disable-next-line react-hooks/exhaustive-deps
+    }, [currentUser]);
+
     const fetchCompanyCreds = async () => {
         try {
             setLoadingCreds(true);
@@ -313,10 +327,12 @@ const Overview = ({ currentUser }) => {
         });
     };
 
-    const getAttachmentUrl = (file) => {
+    const getAttachmentUrl = (file, variant = 'url') => {
         const token = localStorage.getItem('token');
-        const suffix = token ? `?token=${encodeURIComponent(token)}` : '';
-        return `${API}${file.url}${suffix}`;
+        const url = file[variant] || file.url;
+        const sep = url.includes('?') ? '&' : '?';
+        const suffix = token ? `${sep}token=${encodeURIComponent(token)}` : '';
+        return `${API}${url}${suffix}`;
     };
 
     const renderAttachments = (item) => {
@@ -328,12 +344,13 @@ const Overview = ({ currentUser }) => {
                         {file.is_image ? (
                             <img
                                 className={styles.attachmentThumb}
-                                src={getAttachmentUrl(file)}
+                                src={getAttachmentUrl(file, 'thumb_url')}
                                 alt={file.filename}
+                                loading="lazy"
                                 onClick={() => {
                                     setPreviewScale(1);
                                     setPreviewImage({
-                                        url: getAttachmentUrl(file),
+                                        url: getAttachmentUrl(file, 'preview_url'),
                                         name: file.filename,
                                     });
                                 }}